@@ -1,15 +1,22 @@
 import matplotlib.pyplot as plt
 import seaborn; seaborn.set_theme()
 import numpy as np
+import queue
+import threading
+import time as timer
+from collections import deque
 
 from matplotlib import animation
+from matplotlib.collections import LineCollection
 
 from simulator import PendulumSimulator
 from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
 from pendulum import Pendulum
 from pendulum import DoublePendulum
 
 from integrations import RungeKuttaIntegrator
+from storage import TrajectoryFile
 
 class PendulumAnimation():
     '''
@@ -108,14 +115,35 @@ class DoublePendulumAnimation():
 
         self.double_pendulum = double_pendulum
 
-    def initialize_animation(self):
+    @classmethod
+    def from_file(cls, path: str, member: int = 0):
+        '''
+            Opens a trajectory file lazily, animating one of its members.
+            Frames are read from the memory-mapped file as they are drawn.
+        '''
+        trajectory = TrajectoryFile(path)
+        mass1, mass2, length1, length2 = trajectory.properties[member]
+        pendulum1 = Pendulum(mass=mass1, length=length1
+                             , origin=trajectory.member_origin(member))
+        pendulum2 = Pendulum(mass=mass2, length=length2)
+        double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+        return cls(simulation=trajectory.member(member)
+                   , double_pendulum=double_pendulum)
+
+    def initialize_animation(self, ax=None):
         '''
             Initializes the animation of the projectile
+            :param ax: optional axes to draw into, cleared first, e.g. to
+                       reuse one figure across clips. A new figure otherwise.
         '''
         # name variables for brevity
         t, x1, y1, x2, y2 = self.t, self.x1, self.y1, self.x2, self.y2
 
-        self._fig, self._ax = plt.subplots()
+        if ax is None:
+            self._fig, self._ax = plt.subplots()
+        else:
+            ax.clear()
+            self._fig, self._ax = ax.figure, ax
 
         # set axis limits
         x0, y0 = self.double_pendulum.pendulum1.origin
@@ -179,6 +207,489 @@ class DoublePendulumAnimation():
         plt.show()
 
 
+class BlittedDoublePendulumAnimation(DoublePendulumAnimation):
+    '''
+        A double pendulum animation rendered at a fixed frame rate,
+        independent of the timestep of the simulation. The trajectory is
+        resampled once, frames are blitted, and the trace tail is kept in a
+        preallocated ring buffer.
+    '''
+    def __init__(self, simulation: DoublePendulumSimulation
+                 , double_pendulum: DoublePendulum
+                 , fps: float|int = 30
+                 , tail_fraction: float = 0.1):
+        '''
+            Initializes the animation object, given the results of a projectile simulation
+
+            Parameters:
+            -------------------------
+            simulation:      the simulation, or e.g. a TrajectoryMember
+            double_pendulum: the simulated double pendulum
+            fps:             frames per second of simulated time
+            tail_fraction:   length of the trace tail as a fraction of the run
+        '''
+        super().__init__(simulation=simulation, double_pendulum=double_pendulum)
+        self.fps = fps
+        # resample all channels to the frame times
+        time = np.asarray(self.t, dtype=np.float64)
+        frame_times = np.arange(time[0], time[-1], 1/fps)
+        self.x1, self.y1, self.x2, self.y2 = [
+            np.interp(frame_times, time, np.asarray(channel, dtype=np.float64))
+            for channel in [self.x1, self.y1, self.x2, self.y2]]
+        self.t = frame_times
+
+        # ring buffer holding the tail twice, so the last tail_length
+        # positions are always one contiguous slice
+        self.tail_length = max(int(len(frame_times) * tail_fraction), 1)
+        self._tail = np.empty((2, 2*self.tail_length))
+        self._last_frame = -1
+
+    def _push_tail(self, x: float, y: float):
+        '''
+            Adds a position to the ring buffer.
+        '''
+        index = self._tail_count % self.tail_length
+        self._tail[:, index] = self._tail[:, index+self.tail_length] = x, y
+        self._tail_count += 1
+
+    def _tail_view(self) -> np.ndarray:
+        '''
+            The positions in the ring buffer, oldest first.
+        '''
+        if self._tail_count <= self.tail_length:
+            return self._tail[:, :self._tail_count]
+        start = self._tail_count % self.tail_length
+        return self._tail[:, start:start+self.tail_length]
+
+    def initialize_animation(self, ax=None):
+        '''
+            Initializes the animation of the projectile
+        '''
+        super().initialize_animation(ax=ax)
+        self._tail_count = 0
+        self._last_frame = -1
+
+    def _init_blit(self):
+        '''
+            Returns the animated artists, drawn over the cached background.
+        '''
+        self._tail_count = 0
+        self._last_frame = -1
+        self._trace_artist.set_data([], [])
+        return (self._pendulum_artist, self._trace_artist, self._text_artist)
+
+    def update_frame(self, frame):
+        '''
+            updates the frames for the projectile animation
+            :param frame: the present frame
+        '''
+        x0, y0 = self.double_pendulum.pendulum1.origin
+        self._pendulum_artist.set_data([x0, self.x1[frame], self.x2[frame]]
+                                       , [y0, self.y1[frame], self.y2[frame]])
+
+        # refill the tail when frames are not consecutive, e.g. on repeat
+        if frame != self._last_frame + 1:
+            self._tail_count = 0
+            for i in range(max(frame - self.tail_length, 0), frame):
+                self._push_tail(self.x2[i], self.y2[i])
+        tail = self._tail_view()
+        self._trace_artist.set_data(tail[0], tail[1])
+        self._push_tail(self.x2[frame], self.y2[frame])
+        self._last_frame = frame
+
+        self._text_artist.set_text(f"t = {self.t[frame]:.1f} s")
+
+        return (self._pendulum_artist, self._trace_artist, self._text_artist)
+
+    def show_projectile_animation(self):
+        '''
+            shows the projectile animation in real time
+        '''
+        # initialize animation
+        self.initialize_animation()
+
+        # instantiate animation
+        ani = animation.FuncAnimation(fig=self._fig, func=self.update_frame
+                                      , init_func=self._init_blit
+                                      , frames=len(self.t), interval=1000/self.fps
+                                      , blit=True, repeat_delay=1000)
+        plt.show()
+
+
+class StreamingDoublePendulumAnimation(DoublePendulumAnimation):
+    '''
+        A double pendulum animation consuming a stream of TrajectoryChunks,
+        e.g. from DoublePendulumSimulation.iter_simulation, so an unbounded
+        run is rendered while it is integrated. Only the trace tail is kept.
+    '''
+    def __init__(self, chunks, double_pendulum: DoublePendulum
+                 , tail_length: int = 100):
+        '''
+            Initializes the animation object, given an iterable of chunks
+        '''
+        self.chunks = chunks
+        self.double_pendulum = double_pendulum
+        self._tail_x = deque(maxlen=tail_length)
+        self._tail_y = deque(maxlen=tail_length)
+
+    def iter_frames(self):
+        '''
+            Yields one (time, x1, y1, x2, y2) frame per step of the stream.
+        '''
+        for chunk in self.chunks:
+            for i in range(len(chunk.time)):
+                yield (chunk.time[i], chunk.x[i, 0], chunk.y[i, 0]
+                       , chunk.x[i, 1], chunk.y[i, 1])
+
+    def initialize_animation(self, ax=None):
+        '''
+            Initializes the animation of the projectile
+        '''
+        self._frames = self.iter_frames()
+        t, x1, y1, x2, y2 = next(self._frames)
+        # the base class draws the first frame from single-step arrays
+        self.t, self.x1, self.y1, self.x2, self.y2 = ([t], [x1], [y1], [x2], [y2])
+        super().initialize_animation(ax=ax)
+
+    def update_frame(self, frame):
+        '''
+            updates the frames for the projectile animation
+            :param frame: a (time, x1, y1, x2, y2) tuple from iter_frames
+        '''
+        t, x1, y1, x2, y2 = frame
+        x0, y0 = self.double_pendulum.pendulum1.origin
+        self._pendulum_artist.set_xdata(np.array([x0, x1, x2]))
+        self._pendulum_artist.set_ydata(np.array([y0, y1, y2]))
+
+        self._tail_x.append(x2)
+        self._tail_y.append(y2)
+        self._trace_artist.set_xdata(self._tail_x)
+        self._trace_artist.set_ydata(self._tail_y)
+
+        self._text_artist.set_text(s=f"t = {t:.1f} s")
+
+        return (self._pendulum_artist, self._trace_artist, self._text_artist)
+
+    def show_projectile_animation(self):
+        '''
+            shows the projectile animation, until the stream ends
+        '''
+        # initialize animation
+        self.initialize_animation()
+
+        # instantiate animation, pulling frames lazily from the stream
+        ani = animation.FuncAnimation(fig=self._fig, func=self.update_frame
+                                      , frames=self._frames, interval=20
+                                      , cache_frame_data=False, repeat=False)
+        plt.show()
+
+
+class LiveDoublePendulumAnimation(StreamingDoublePendulumAnimation):
+    '''
+        A double pendulum animation rendered while it is integrated. A
+        worker thread runs DoublePendulumSimulation.iter_simulation and puts
+        one frame per 1/fps of simulated time into a bounded queue; when
+        the queue is full the worker waits, so it never runs more than
+        queue_size frames ahead of the display.
+
+        The display follows the wall clock: every tick shows the newest
+        frame that is due and drops the older ones, so a slow renderer
+        skips frames instead of falling behind. When the integration is
+        slower than real time, the last frame stays up and the clock waits.
+    '''
+    def __init__(self, double_pendulum: DoublePendulum
+                 , propagator
+                 , timestep: float
+                 , simulation_time: float|int|None = None
+                 , simulation: DoublePendulumSimulation|None = None
+                 , fps: float|int = 30
+                 , speed: float = 1
+                 , queue_size: int = 60
+                 , chunk_size: int = 64
+                 , tail_length: int = 100):
+        '''
+            Parameters:
+            -------------------------
+            double_pendulum: the double pendulum to simulate, updated by the
+                             worker as the run goes on
+            propagator:      an integrator method, e.g.
+                             RungeKuttaIntegrator.propagate_state
+            timestep:        timestep of propagation
+            simulation_time: end of the run, None runs until the window closes
+            simulation:      the simulator, a new DoublePendulumSimulation
+                             by default
+            fps:             frames per second of simulated time
+            speed:           simulated seconds per second of wall time
+            queue_size:      frames the worker may run ahead
+            chunk_size:      steps the worker integrates at a time
+            tail_length:     number of frames in the trace tail
+        '''
+        super().__init__(chunks=None, double_pendulum=double_pendulum
+                         , tail_length=tail_length)
+        self.propagator = propagator
+        self.timestep = timestep
+        self.simulation_time = simulation_time
+        self.simulation = DoublePendulumSimulation() if simulation is None else simulation
+        self.fps = fps
+        self.speed = speed
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.stats = {'produced': 0, 'rendered': 0, 'dropped': 0, 'underruns': 0}
+        self._worker = None
+
+    def _produce(self):
+        '''
+            Worker loop, integrates and queues the frames until the run ends
+            or stop is called.
+        '''
+        last_mark = -1
+        try:
+            for chunk in self.simulation.iter_simulation(
+                    double_pendulum=self.double_pendulum, propagator=self.propagator
+                    , timestep=self.timestep, simulation_time=self.simulation_time
+                    , chunk_size=self.chunk_size):
+                # the first step of every frame interval
+                marks = np.floor(np.asarray(chunk.time) * self.fps).astype(int)
+                for i in np.flatnonzero(np.diff(marks, prepend=last_mark) > 0):
+                    if not self._put((chunk.time[i], chunk.x[i, 0], chunk.y[i, 0]
+                                      , chunk.x[i, 1], chunk.y[i, 1])):
+                        return
+                    self.stats['produced'] += 1
+                last_mark = marks[-1]
+        except Exception as error:
+            self.error = error
+        finally:
+            self._put(None)
+
+    def _put(self, frame) -> bool:
+        '''
+            Queues a frame, waiting while the queue is full. Returns False
+            if stopped meanwhile.
+        '''
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(frame, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def start(self):
+        '''
+            Starts the worker.
+        '''
+        self.error = None
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._produce, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        '''
+            Stops the worker and waits for it to finish.
+        '''
+        if self._worker is not None:
+            self._stopped.set()
+            self._worker.join()
+            self._worker = None
+
+    def iter_frames(self):
+        '''
+            Yields one (time, x1, y1, x2, y2) frame per tick: the first one
+            as soon as it is integrated, then the newest one due by the
+            clock, or the previous one again if none is due yet. Ends with
+            the run, and stops the worker when closed.
+        '''
+        self.start()
+        try:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            clock_start = timer.perf_counter() - frame[0] / self.speed
+            pending = None
+            while True:
+                yield frame
+                self.stats['rendered'] += 1
+
+                now = timer.perf_counter()
+                due = (now - clock_start) * self.speed
+                new = None
+                while True:
+                    if pending is None:
+                        try:
+                            pending = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                    if pending is None or pending[0] > due:
+                        break
+                    if new is not None:
+                        self.stats['dropped'] += 1
+                    new, pending = pending, None
+                if new is not None:
+                    frame = new
+                elif pending is None and self._queue.empty():
+                    if not self._worker.is_alive():
+                        # the run has ended and every frame is shown
+                        break
+                    # the integration is behind, hold the clock at this frame
+                    self.stats['underruns'] += 1
+                    clock_start = now - frame[0] / self.speed
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def show_projectile_animation(self):
+        '''
+            shows the animation live, until the run ends or the window closes
+        '''
+        # initialize animation, which starts the worker
+        self.initialize_animation()
+        self._fig.canvas.mpl_connect('close_event', lambda event: self.stop())
+
+        ani = animation.FuncAnimation(fig=self._fig, func=self.update_frame
+                                      , frames=self._frames, interval=1000/self.fps
+                                      , cache_frame_data=False, repeat=False)
+        plt.show()
+        self.stop()
+
+
+class EnsembleAnimation():
+    '''
+        An animation of an ensemble of double pendula, e.g. thousands of
+        nearly identical ones. All arms are drawn by one LineCollection and
+        all bobs by one scatter, updated per frame from an (N, 2, 2) array of
+        bob positions, so the number of artists does not grow with N.
+    '''
+    def __init__(self, simulation: DoublePendulumEnsembleSimulation
+                 , fps: float|int = 30
+                 , color_by: str = 'index'
+                 , cmap: str = 'viridis'):
+        '''
+            Initializes the animation object, given the results of an ensemble simulation
+
+            Parameters:
+            -------------------------
+            simulation: the ensemble simulation
+            fps:        frames per second of simulated time, each frame shows
+                        the nearest recorded step
+            color_by:   'index' colors members by their index, 'divergence'
+                        by the distance of their lower bob from member 0
+            cmap:       colormap of the members
+        '''
+        if color_by not in ['index', 'divergence']:
+            raise ValueError("color_by must be 'index' or 'divergence'")
+        self.simulation = simulation
+        self.fps = fps
+        self.color_by = color_by
+        self.cmap = cmap
+        self.n_members = simulation.x1.shape[1]
+        # hang-points of the members, (N, 2), from a shared (2,) origin or
+        # one per member, (2, N)
+        origin = np.asarray(simulation.origin, dtype=np.float64).reshape(2, -1)
+        self.origins = np.broadcast_to(origin.T, (self.n_members, 2))
+        lengths = np.asarray(simulation.properties)[..., 2:]
+        self.reach = float(np.max(np.sum(lengths, axis=-1)))
+
+        # the recorded step shown in each frame
+        time = np.asarray(simulation.time, dtype=np.float64)
+        self.t = np.arange(time[0], time[-1], 1/fps)
+        self.steps = np.minimum(np.searchsorted(time, self.t), len(time)-1)
+
+    def positions(self, frame: int) -> np.ndarray:
+        '''
+            Bob positions of all members in a frame, shape (N, 2, 2) as
+            (member, bob, coordinate).
+        '''
+        step = self.steps[frame]
+        simulation = self.simulation
+        return np.stack([np.stack([simulation.x1[step], simulation.y1[step]], axis=-1)
+                         , np.stack([simulation.x2[step], simulation.y2[step]], axis=-1)]
+                        , axis=1)
+
+    def _colors(self, positions: np.ndarray) -> np.ndarray:
+        '''
+            Color values of the members for the given positions.
+        '''
+        if self.color_by == 'index':
+            return np.arange(self.n_members)
+        return np.linalg.norm(positions[:, 1] - positions[0, 1], axis=-1)
+
+    def initialize_animation(self, ax=None):
+        '''
+            Initializes the animation of the ensemble
+            :param ax: optional axes to draw into, cleared first
+        '''
+        if ax is None:
+            self._fig, self._ax = plt.subplots()
+        else:
+            ax.clear()
+            self._fig, self._ax = ax.figure, ax
+
+        # set axis limits
+        (x_min, y_min), (x_max, y_max) = self.origins.min(axis=0), self.origins.max(axis=0)
+        width = self.reach*1.5
+        self._ax.set_xlim(left=x_min-width, right=x_max+width)
+        self._ax.set_ylim(bottom=y_min-width, top=y_max+width)
+
+        # axis labels
+        self._ax.set_xlabel('x (m)')
+        self._ax.set_ylabel('y (m)')
+
+        # set ax as square
+        self._ax.set_aspect('equal', adjustable='box')
+
+        # one artist for all arms, one for all bobs
+        positions = self.positions(0)
+        colors = self._colors(positions)
+        upper = 2*self.reach if self.color_by == 'divergence' else max(self.n_members-1, 1)
+        self._segments = np.empty((self.n_members, 3, 2))
+        self._segments[:, 0] = self.origins
+        self._segments[:, 1:] = positions
+        self._lines_artist = LineCollection(self._segments, cmap=self.cmap
+                                            , linewidths=0.5, alpha=0.5)
+        self._lines_artist.set_array(colors)
+        self._lines_artist.set_clim(0, upper)
+        self._ax.add_collection(self._lines_artist)
+        self._bobs_artist = self._ax.scatter(*positions.reshape(-1, 2).T, s=4
+                                             , c=np.repeat(colors, 2), cmap=self.cmap
+                                             , vmin=0, vmax=upper)
+        self._text_artist = self._ax.text(0.1, 0.9, s=f"t = {self.t[0]:.1f} s"
+                              , transform=self._ax.transAxes
+                              , bbox={'facecolor':'green','alpha':0.2})
+
+    def update_frame(self, frame):
+        '''
+            updates the frames for the ensemble animation
+            :param frame: the present frame
+        '''
+        positions = self.positions(frame)
+        self._segments[:, 1:] = positions
+        self._lines_artist.set_segments(self._segments)
+        self._bobs_artist.set_offsets(positions.reshape(-1, 2))
+        if self.color_by == 'divergence':
+            colors = self._colors(positions)
+            self._lines_artist.set_array(colors)
+            self._bobs_artist.set_array(np.repeat(colors, 2))
+
+        self._text_artist.set_text(f"t = {self.t[frame]:.1f} s")
+
+        return (self._lines_artist, self._bobs_artist, self._text_artist)
+
+    def show_projectile_animation(self):
+        '''
+            shows the ensemble animation in real time
+        '''
+        # initialize animation
+        self.initialize_animation()
+
+        # instantiate animation
+        ani = animation.FuncAnimation(fig=self._fig, func=self.update_frame
+                                      , frames=len(self.t), interval=1000/self.fps
+                                      , blit=True, repeat_delay=1000)
+        plt.show()
+
+
 if __name__ == '__main__':
 
     # instantiate the two pendula making up the double pendulum
@@ -192,6 +703,16 @@ if __name__ == '__main__':
     
     rk_solver = RungeKuttaIntegrator()
 
+    import sys
+    if '--live' in sys.argv:
+        # integrate while rendering, without waiting for the run
+        live_animation = LiveDoublePendulumAnimation(double_pendulum=double_pendulum
+                                                     , propagator=rk_solver.propagate_state
+                                                     , timestep=0.01)
+        live_animation.show_projectile_animation()
+        print(f"finished live animation: {live_animation.stats}")
+        sys.exit()
+
     my_simulation = DoublePendulumSimulation()
     my_simulation.run_simulation(double_pendulum=double_pendulum
                                 , propagator=rk_solver.propagate_state
@@ -0,0 +1,732 @@
+# --------------
+# Benchmarks for the simulation hot paths
+# --------------
+import os
+import sys
+import json
+import time as timer
+import argparse
+import platform
+import itertools
+import numpy as np
+from functools import partial
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+from simulator import PendulumSimulator
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from simulator import PendulumChainSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import DormandPrinceIntegrator
+from integrations import GaussLegendreIntegrator
+from integrations import ImplicitMidpointIntegrator
+from integrations import SplittingIntegrator
+from trajectory import TrajectoryBuffer
+from diagnostics import EnergyDiagnostics
+
+
+def make_double_pendulum():
+    '''
+        Returns the double pendulum used throughout the benchmarks.
+    '''
+    pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+    pendulum2 = Pendulum(mass=1, length=1)
+    double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+    double_pendulum.set_double_pendulum(theta1=np.pi/2, w1=0
+                                       , theta2=np.pi/2, w2=0)
+    return double_pendulum
+
+def benchmark_trajectory_store(step_counts: list|tuple = (10**3, 10**4, 10**5, 10**6)
+                               , append_limit: int = 10**5):
+    '''
+        Times recording n steps of five channels with TrajectoryBuffer,
+        and with per-step np.append (the old approach) up to append_limit.
+
+        Returns:
+        ---------
+        list of dicts with the step count and seconds per approach
+    '''
+    results = []
+    for n_steps in step_counts:
+        start = timer.perf_counter()
+        buffer = TrajectoryBuffer(channels=('time', 'x1', 'y1', 'x2', 'y2'))
+        for i in range(n_steps):
+            buffer.append(i, 0.0, 0.0, 0.0, 0.0)
+        buffer_seconds = timer.perf_counter() - start
+
+        append_seconds = None
+        if n_steps <= append_limit:
+            start = timer.perf_counter()
+            channels = [np.array([0], dtype=np.float32) for _ in range(5)]
+            for i in range(n_steps):
+                for j in range(5):
+                    channels[j] = np.append(channels[j], i)
+            append_seconds = timer.perf_counter() - start
+
+        results.append({'steps': n_steps
+                        , 'buffer_seconds': buffer_seconds
+                        , 'np_append_seconds': append_seconds})
+    return results
+
+def benchmark_double_pendulum_simulation(step_counts: list|tuple = (10**3, 10**4, 10**5, 10**6)
+                                         , timestep: float = 0.001
+                                         , vectorized_cartesian: bool = False):
+    '''
+        Times DoublePendulumSimulation.run_simulation for runs of n steps,
+        optionally reconstructing the cartesian coordinates after the run.
+
+        Returns:
+        ---------
+        list of dicts with the step count, seconds and steps per second
+    '''
+    results = []
+    rk_solver = RungeKuttaIntegrator()
+    for n_steps in step_counts:
+        double_pendulum = make_double_pendulum()
+        simulation = DoublePendulumSimulation()
+        start = timer.perf_counter()
+        simulation.run_simulation(double_pendulum=double_pendulum
+                                  , propagator=rk_solver.propagate_state
+                                  , simulation_time=n_steps*timestep
+                                  , timestep=timestep
+                                  , vectorized_cartesian=vectorized_cartesian)
+        seconds = timer.perf_counter() - start
+        results.append({'steps': n_steps
+                        , 'seconds': seconds
+                        , 'steps_per_second': n_steps / seconds})
+    return results
+
+def benchmark_ensemble_simulation(ensemble_sizes: list|tuple = (1, 100, 10**4)
+                                  , n_steps: int = 1000
+                                  , timestep: float = 0.001
+                                  , loop_members: int = 10):
+    '''
+        Times DoublePendulumEnsembleSimulation for ensembles of N members,
+        against looping DoublePendulumSimulation over loop_members members.
+
+        Returns:
+        ---------
+        list of dicts with the ensemble size and member-steps per second,
+        the last entry being the looped reference
+    '''
+    results = []
+    rk_solver = RungeKuttaIntegrator()
+    rng = np.random.default_rng(seed=0)
+    for n_members in ensemble_sizes:
+        initial_states = np.zeros((n_members, 4))
+        initial_states[:, :2] = np.pi/2 + 1e-3*rng.standard_normal((n_members, 2))
+        simulation = DoublePendulumEnsembleSimulation()
+        start = timer.perf_counter()
+        simulation.run_simulation(initial_states=initial_states
+                                  , properties=[1, 1, 1, 1]
+                                  , propagator=rk_solver.propagate_state
+                                  , simulation_time=n_steps*timestep
+                                  , timestep=timestep)
+        seconds = timer.perf_counter() - start
+        results.append({'members': n_members
+                        , 'seconds': seconds
+                        , 'member_steps_per_second': n_members*n_steps/seconds})
+
+    start = timer.perf_counter()
+    for _ in range(loop_members):
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                  , propagator=rk_solver.propagate_state
+                                  , simulation_time=n_steps*timestep
+                                  , timestep=timestep)
+    seconds = timer.perf_counter() - start
+    results.append({'members': 'loop'
+                    , 'seconds': seconds
+                    , 'member_steps_per_second': loop_members*n_steps/seconds})
+    return results
+
+def _max_energy_error(propagator, simulation_time: float, timestep: float
+                      , dtype: type = np.float64):
+    '''
+        Integrates the benchmark double pendulum in the given precision and
+        returns the largest deviation of its mechanical energy from the
+        initial value, and the number of RHS evaluations.
+    '''
+    double_pendulum = make_double_pendulum()
+    initial_energy = double_pendulum.calculate_mechanical_energy()
+    simulation = DoublePendulumSimulation(dtype=dtype)
+    properties = np.ones(4, dtype=simulation.dtype)
+    rhs_evaluations = 0
+    def rhs_func(state):
+        nonlocal rhs_evaluations
+        rhs_evaluations += 1
+        return simulation.double_pendulum_dynamics(state, properties)
+
+    time = 0
+    state = np.array([np.pi/2, np.pi/2, 0, 0], dtype=simulation.dtype)
+    error = 0
+    while time < simulation_time:
+        time, state = propagator(rhs_func=rhs_func, time=time
+                                 , state=state, timestep=timestep)
+        double_pendulum.set_double_pendulum(theta1=state[0], w1=state[2]
+                                           , theta2=state[1], w2=state[3])
+        error = max(error, abs(double_pendulum.calculate_mechanical_energy()
+                               - initial_energy))
+    return error, rhs_evaluations
+
+def benchmark_adaptive_integrator(simulation_time: float = 10
+                                  , rk4_timesteps: list|tuple = (0.02, 0.01, 0.005, 0.0025)
+                                  , tolerances: list|tuple = (1e-4, 1e-5, 1e-6, 1e-7)
+                                  , output_interval: float = 0.01):
+    '''
+        Compares RHS evaluations of fixed-step RK4 and the adaptive
+        Dormand-Prince integrator against the maximal energy error of a run,
+        in float64. Over 10 s, DOPRI5 with rtol=1e-7 reaches 1.4e-5 in 3104
+        evaluations, where RK4 needs 8000 (dt=0.005) to reach 1.9e-5.
+
+        Returns:
+        ---------
+        list of dicts with the integrator, its setting, energy error and
+        RHS evaluations
+    '''
+    results = []
+    for timestep in rk4_timesteps:
+        error, evaluations = _max_energy_error(
+            propagator=RungeKuttaIntegrator().propagate_state
+            , simulation_time=simulation_time, timestep=timestep)
+        results.append({'integrator': 'RK4', 'setting': f'dt={timestep:g}'
+                        , 'energy_error': error, 'rhs_evaluations': evaluations})
+    for rtol in tolerances:
+        error, evaluations = _max_energy_error(
+            propagator=DormandPrinceIntegrator(rtol=rtol, atol=rtol*1e-3).propagate_state
+            , simulation_time=simulation_time, timestep=output_interval)
+        results.append({'integrator': 'DOPRI5', 'setting': f'rtol={rtol:g}'
+                        , 'energy_error': error, 'rhs_evaluations': evaluations})
+    return results
+
+def benchmark_structure_preserving(simulation_time: float = 500
+                                   , timestep: float = 0.02
+                                   , samples: int = 5):
+    '''
+        Compares the energy error of RK4 and the structure-preserving
+        integrators over a long horizon at a large timestep, sampling
+        DoublePendulum.calculate_mechanical_energy at evenly spaced times.
+
+        Returns:
+        ---------
+        list of dicts with the integrator, sampled energy errors and seconds
+    '''
+    integrators = {'RK4': RungeKuttaIntegrator()
+                   , 'implicit midpoint': ImplicitMidpointIntegrator()
+                   , 'Gauss-Legendre 2': GaussLegendreIntegrator(stages=2)
+                   , 'splitting 2': SplittingIntegrator(order=2)
+                   , 'splitting 4': SplittingIntegrator(order=4)}
+    results = []
+    for name, integrator in integrators.items():
+        double_pendulum = make_double_pendulum()
+        double_pendulum.set_double_pendulum(theta1=2, w1=0, theta2=0.5, w2=0)
+        initial_energy = double_pendulum.calculate_mechanical_energy()
+        simulation = DoublePendulumSimulation()
+        errors = []
+        start = timer.perf_counter()
+        for _ in range(samples):
+            simulation.run_simulation(double_pendulum=double_pendulum
+                                      , propagator=integrator.propagate_state
+                                      , simulation_time=simulation_time/samples
+                                      , timestep=timestep)
+            errors.append(double_pendulum.calculate_mechanical_energy()
+                          - initial_energy)
+        results.append({'integrator': name
+                        , 'energy_errors': errors
+                        , 'seconds': timer.perf_counter() - start})
+    return results
+
+def benchmark_backends(n_steps: int = 10**5, timestep: float = 0.001):
+    '''
+        Times a single double pendulum run on the numpy and numba backends.
+        The compiled kernel is warmed up first, so compilation is excluded.
+
+        Returns:
+        ---------
+        list of dicts with the backend and steps per second
+    '''
+    import kernels
+    backends = ['numpy'] + (['numba'] if kernels.jit_available() else [])
+    results = []
+    rk_solver = RungeKuttaIntegrator()
+    for backend in backends:
+        simulation = DoublePendulumSimulation()
+        # warm up, compiling the kernel on its first call
+        simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                  , propagator=rk_solver.propagate_state
+                                  , simulation_time=timestep, timestep=timestep
+                                  , backend=backend)
+        start = timer.perf_counter()
+        simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                  , propagator=rk_solver.propagate_state
+                                  , simulation_time=n_steps*timestep
+                                  , timestep=timestep
+                                  , backend=backend)
+        seconds = timer.perf_counter() - start
+        results.append({'backend': backend
+                        , 'seconds': seconds
+                        , 'steps_per_second': n_steps / seconds})
+    return results
+
+def benchmark_animation(simulation_time: float = 10, timestep: float = 0.001
+                        , fps: int = 30, n_frames: int = 200):
+    '''
+        Times rendering frames on the Agg canvas, for the original
+        DoublePendulumAnimation, which redraws the whole figure once per
+        integration step, and for BlittedDoublePendulumAnimation, which
+        blits the animated artists at a fixed frame rate.
+
+        Returns:
+        ---------
+        list of dicts with frames per second, and seconds of simulation
+        rendered per second of wall time
+    '''
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    from animation import DoublePendulumAnimation
+    from animation import BlittedDoublePendulumAnimation
+
+    double_pendulum = make_double_pendulum()
+    simulation = DoublePendulumSimulation()
+    simulation.run_simulation(double_pendulum=double_pendulum
+                              , propagator=RungeKuttaIntegrator().propagate_state
+                              , simulation_time=simulation_time
+                              , timestep=timestep)
+
+    results = []
+    for name, rendered in [('full redraw', DoublePendulumAnimation(
+                               simulation=simulation, double_pendulum=double_pendulum))
+                           , ('blitted', BlittedDoublePendulumAnimation(
+                               simulation=simulation, double_pendulum=double_pendulum
+                               , fps=fps))]:
+        rendered.initialize_animation()
+        canvas = rendered._fig.canvas
+        frames = range(min(n_frames, len(rendered.t)))
+        if name == 'blitted':
+            # as FuncAnimation does: cache the background once, then draw
+            # only the animated artists
+            artists = rendered._init_blit()
+            for artist in artists:
+                artist.set_animated(True)
+            canvas.draw()
+            background = canvas.copy_from_bbox(rendered._fig.bbox)
+            start = timer.perf_counter()
+            for frame in frames:
+                canvas.restore_region(background)
+                for artist in rendered.update_frame(frame):
+                    rendered._ax.draw_artist(artist)
+                canvas.blit(rendered._fig.bbox)
+        else:
+            start = timer.perf_counter()
+            for frame in frames:
+                rendered.update_frame(frame)
+                canvas.draw()
+        seconds = timer.perf_counter() - start
+        plt.close(rendered._fig)
+
+        frames_per_second = len(frames) / seconds
+        simulated_per_frame = float(rendered.t[1] - rendered.t[0])
+        results.append({'path': name
+                        , 'frames_per_second': frames_per_second
+                        , 'realtime_factor': frames_per_second * simulated_per_frame})
+    return results
+
+def benchmark_ensemble_animation(ensemble_sizes: list|tuple = (100, 1000, 5000)
+                                 , n_frames: int = 50):
+    '''
+        Times blitting frames of an EnsembleAnimation on the Agg canvas, as
+        FuncAnimation does, for growing ensembles.
+
+        Returns:
+        ---------
+        list of dicts with the ensemble size and frames per second
+    '''
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    from animation import EnsembleAnimation
+
+    results = []
+    for n_members in ensemble_sizes:
+        states = np.zeros((n_members, 4))
+        states[:, 0] = np.pi/2
+        states[:, 1] = np.pi/2 + np.linspace(0, 1e-3, n_members)
+        ensemble = DoublePendulumEnsembleSimulation()
+        ensemble.run_simulation(initial_states=states, properties=[1, 1, 1, 1]
+                                , propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=n_frames/30, timestep=0.01)
+
+        rendered = EnsembleAnimation(simulation=ensemble, fps=30, color_by='divergence')
+        rendered.initialize_animation()
+        canvas = rendered._fig.canvas
+        artists = rendered.update_frame(0)
+        for artist in artists:
+            artist.set_animated(True)
+        canvas.draw()
+        background = canvas.copy_from_bbox(rendered._fig.bbox)
+        frames = range(len(rendered.t))
+        start = timer.perf_counter()
+        for frame in frames:
+            canvas.restore_region(background)
+            for artist in rendered.update_frame(frame):
+                rendered._ax.draw_artist(artist)
+            canvas.blit(rendered._fig.bbox)
+        seconds = timer.perf_counter() - start
+        plt.close(rendered._fig)
+
+        results.append({'members': n_members
+                        , 'frames_per_second': len(frames) / seconds})
+    return results
+
+
+def benchmark_precision(n_members: int = 10**4, n_steps: int = 200
+                        , timestep: float = 0.001):
+    '''
+        Compares float32 and float64 ensembles: throughput, memory of the
+        recorded trajectory, and the energy drift of a single chaotic run.
+
+        Returns:
+        ---------
+        list of dicts per dtype
+    '''
+    results = []
+    for dtype in [np.float32, np.float64]:
+        simulation = DoublePendulumEnsembleSimulation(dtype=dtype)
+        start = timer.perf_counter()
+        simulation.run_simulation(initial_states=_ensemble_state(n_members, np.float64)
+                                  , properties=[1, 1, 1, 1]
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=n_steps*timestep
+                                  , timestep=timestep)
+        seconds = timer.perf_counter() - start
+        memory = simulation.trajectory.data.nbytes + simulation.states.data.nbytes
+
+        single = DoublePendulumSimulation(dtype=dtype)
+        single.run_simulation(double_pendulum=make_double_pendulum()
+                              , propagator=RungeKuttaIntegrator().propagate_state
+                              , simulation_time=10, timestep=timestep
+                              , vectorized_cartesian=True)
+        results.append({'dtype': np.dtype(dtype).name
+                        , 'member_steps_per_second': n_members*n_steps/seconds
+                        , 'trajectory_bytes': memory
+                        , 'energy_drift': float(single.energy.statistics['max_abs_drift'])})
+    return results
+
+
+# --------------
+# Regression suite: micro-benchmarks with machine-readable results,
+# compared against a stored baseline
+# --------------
+DTYPES = (np.float32, np.float64)
+
+def _best_time(func, number: int = 1, repeat: int = 3) -> float:
+    '''
+        Best of repeat timings of number calls, in seconds per call.
+    '''
+    best = np.inf
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (timer.perf_counter() - start) / number)
+    return best
+
+def _ensemble_state(n_members: int, dtype: type) -> np.ndarray:
+    '''
+        Ensemble state of shape (N, 4) near the benchmark pendulum, or (4,)
+        for a single member.
+    '''
+    rng = np.random.default_rng(seed=0)
+    state = np.zeros((n_members, 4))
+    state[:, :2] = np.pi/2 + 1e-3*rng.standard_normal((n_members, 2))
+    return (state[0] if n_members == 1 else state).astype(dtype)
+
+def _suite_pendulum_simulator(quick: bool):
+    for timestep in [0.01] if quick else [0.01, 0.001]:
+        for dtype in DTYPES:
+            def run(timestep=timestep, dtype=dtype):
+                pendulum = Pendulum(mass=1, length=1, origin=[0,0])
+                pendulum.set_angle(theta=np.pi/2)
+                pendulum.set_angular_velocity(w=0)
+                PendulumSimulator(dtype=dtype).run_simulation(
+                    pendulum=pendulum, propagator=RungeKuttaIntegrator().propagate_state
+                    , timestep=timestep)
+            yield {'timestep': timestep, 'dtype': np.dtype(dtype).name}, run, 1
+
+def _suite_double_pendulum_simulation(quick: bool):
+    for n_steps in [10**3] if quick else [10**3, 10**4]:
+        for vectorized_cartesian in [False, True]:
+            for dtype in DTYPES:
+                run = partial(DoublePendulumSimulation(dtype=dtype).run_simulation
+                              , propagator=RungeKuttaIntegrator().propagate_state
+                              , simulation_time=n_steps*0.001, timestep=0.001
+                              , vectorized_cartesian=vectorized_cartesian)
+                yield ({'steps': n_steps, 'vectorized_cartesian': vectorized_cartesian
+                        , 'dtype': np.dtype(dtype).name}
+                       , lambda run=run: run(double_pendulum=make_double_pendulum()), 1)
+
+def _suite_single_run(quick: bool):
+    # a default single run, the path the per-step overhead of the RHS and
+    # the canonical conversions dominates, in quick runs too
+    integrators = {'rk4': (RungeKuttaIntegrator, 8000)
+                   , 'gauss_legendre': (GaussLegendreIntegrator, 1000)
+                   , 'splitting': (SplittingIntegrator, 1000)}
+    for name, (integrator, n_steps) in integrators.items():
+        run = partial(DoublePendulumSimulation().run_simulation
+                      , propagator=integrator().propagate_state
+                      , simulation_time=n_steps*0.001, timestep=0.001)
+        yield ({'integrator': name, 'steps': n_steps}
+               , lambda run=run: run(double_pendulum=make_double_pendulum()), 1)
+
+def _suite_ensemble_simulation(quick: bool):
+    for n_members in [100] if quick else [100, 10**4]:
+        for dtype in DTYPES:
+            run = partial(DoublePendulumEnsembleSimulation(dtype=dtype).run_simulation
+                          , initial_states=_ensemble_state(n_members, np.float64)
+                          , properties=[1, 1, 1, 1]
+                          , propagator=RungeKuttaIntegrator().propagate_state
+                          , simulation_time=0.1, timestep=0.001)
+            yield {'members': n_members, 'steps': 100, 'dtype': np.dtype(dtype).name}, run, 1
+
+def _suite_propagate_state(quick: bool):
+    simulation = DoublePendulumSimulation()
+    propagator = RungeKuttaIntegrator().propagate_state
+    for n_members in [1] if quick else [1, 1000]:
+        for dtype in DTYPES:
+            rhs = partial(simulation.double_pendulum_dynamics
+                          , properties=np.ones(4, dtype=dtype))
+            state = _ensemble_state(n_members, dtype)
+            run = partial(propagator, rhs_func=rhs, time=0, state=state
+                          , timestep=0.001)
+            yield ({'members': n_members, 'dtype': np.dtype(dtype).name}
+                   , run, 1000 if n_members == 1 else 100)
+
+def _suite_rhs(quick: bool):
+    simulation = DoublePendulumSimulation()
+    functions = {'dynamics': simulation.double_pendulum_dynamics
+                 , 'hamiltonian': simulation.double_pendulum_hamiltonian_dynamics}
+    for name, function in functions.items():
+        for n_members in [1] if quick else [1, 10**4]:
+            for dtype in DTYPES:
+                run = partial(function, state=_ensemble_state(n_members, dtype)
+                              , properties=np.ones(4, dtype=dtype))
+                yield ({'function': name, 'members': n_members
+                        , 'dtype': np.dtype(dtype).name}
+                       , run, 1000 if n_members == 1 else 20)
+
+def _suite_chain(quick: bool):
+    simulation = PendulumChainSimulation()
+    for n_links in [2, 3] if quick else [2, 3, 5, 10]:
+        for n_members in [1] if quick else [1, 100, 1000]:
+            state = np.random.default_rng(seed=0).uniform(-1, 1, (n_members, 2*n_links))
+            run = partial(simulation.chain_dynamics, state=state
+                          , properties=np.ones(2*n_links))
+            yield ({'links': n_links, 'members': n_members}
+                   , run, 1000 if n_members == 1 else 20)
+
+def _suite_energy(quick: bool):
+    for n_steps in [10**4] if quick else [10**4, 10**6]:
+        for dtype in DTYPES:
+            state = np.random.default_rng(seed=0).standard_normal((4, n_steps)).astype(dtype)
+            run = lambda state=state: EnergyDiagnostics(*state, properties=[1, 1, 1, 1]).statistics
+            yield {'steps': n_steps, 'dtype': np.dtype(dtype).name}, run, 3
+
+def _suite_animation_frame(quick: bool):
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    from animation import DoublePendulumAnimation
+    from animation import BlittedDoublePendulumAnimation
+
+    double_pendulum = make_double_pendulum()
+    simulation = DoublePendulumSimulation()
+    simulation.run_simulation(double_pendulum=double_pendulum
+                              , propagator=RungeKuttaIntegrator().propagate_state
+                              , simulation_time=10, timestep=0.01)
+    for cls in [DoublePendulumAnimation, BlittedDoublePendulumAnimation]:
+        rendered = cls(simulation=simulation, double_pendulum=double_pendulum)
+        rendered.initialize_animation()
+        frames = itertools.cycle(range(100, 200))
+        # update only, the drawing is measured by benchmark_animation
+        yield ({'animation': cls.__name__}
+               , lambda rendered=rendered, frames=frames: rendered.update_frame(next(frames))
+               , 100)
+        plt.close(rendered._fig)
+
+SUITE = {'pendulum_simulator': _suite_pendulum_simulator
+         , 'double_pendulum_simulation': _suite_double_pendulum_simulation
+         , 'single_run': _suite_single_run
+         , 'ensemble_simulation': _suite_ensemble_simulation
+         , 'propagate_state': _suite_propagate_state
+         , 'rhs': _suite_rhs
+         , 'chain': _suite_chain
+         , 'energy': _suite_energy
+         , 'animation_frame': _suite_animation_frame}
+
+def _key(result: dict) -> str:
+    '''
+        Identifies a case across runs, e.g. "rhs[dtype=float32,members=1]".
+    '''
+    params = ','.join(f'{name}={value}' for name, value in sorted(result['params'].items()))
+    return f"{result['benchmark']}[{params}]"
+
+def run_suite(names: list|None = None, quick: bool = False, repeat: int = 3):
+    '''
+        Runs the micro-benchmarks of the suite.
+
+        Parameters:
+        ----------------
+        names:  benchmarks of SUITE to run, all by default
+        quick:  run only the smallest case of each parameter
+        repeat: number of timings per case, the best is kept
+
+        Returns:
+        ---------
+        list of dicts with the benchmark, its params and seconds per call
+    '''
+    results = []
+    for name in names or SUITE:
+        for params, func, number in SUITE[name](quick):
+            results.append({'benchmark': name
+                            , 'params': params
+                            , 'seconds': _best_time(func, number=number, repeat=repeat)})
+    return results
+
+def compare_to_baseline(results: list, baseline: list, threshold: float = 1.5):
+    '''
+        Compares results with a baseline run, matching cases by benchmark
+        and params. Cases missing from either side are skipped.
+
+        Returns:
+        ---------
+        list of dicts with the case, both timings, their ratio, and whether
+        the ratio exceeds threshold
+    '''
+    reference = {_key(result): result['seconds'] for result in baseline}
+    comparison = []
+    for result in results:
+        key = _key(result)
+        if key not in reference:
+            continue
+        ratio = result['seconds'] / reference[key]
+        comparison.append({'case': key
+                           , 'seconds': result['seconds']
+                           , 'baseline_seconds': reference[key]
+                           , 'ratio': ratio
+                           , 'regression': ratio > threshold})
+    return comparison
+
+def write_results(path: str, results: list, setup: dict|None = None):
+    '''
+        Writes results as JSON, with the machine they were measured on and
+        the setup of the run, e.g. the command line options.
+    '''
+    with open(path, 'w') as file:
+        json.dump({'machine': platform.machine()
+                   , 'platform': platform.platform()
+                   , 'cpu_count': os.cpu_count()
+                   , 'python': platform.python_version()
+                   , 'numpy': np.__version__
+                   , 'setup': setup or {}
+                   , 'results': results}, file, indent=1)
+
+def read_results(path: str) -> list:
+    '''
+        Reads results written by write_results.
+    '''
+    with open(path) as file:
+        return json.load(file)['results']
+
+def print_studies():
+    '''
+        Prints the comparative studies of the benchmark functions above.
+    '''
+    print('trajectory store, seconds per step:')
+    for result in benchmark_trajectory_store():
+        n = result['steps']
+        line = f"  {n:>8d} steps  buffer {result['buffer_seconds']/n*1e6:8.3f} us"
+        if result['np_append_seconds'] is not None:
+            line += f"  np.append {result['np_append_seconds']/n*1e6:8.3f} us"
+        print(line)
+
+    for vectorized_cartesian in [False, True]:
+        print(f'double pendulum simulation, vectorized_cartesian={vectorized_cartesian}:')
+        for result in benchmark_double_pendulum_simulation(
+                vectorized_cartesian=vectorized_cartesian):
+            print(f"  {result['steps']:>8d} steps  {result['seconds']:8.2f} s"
+                  f"  {result['steps_per_second']:10.0f} steps/s")
+
+    print('ensemble simulation:')
+    for result in benchmark_ensemble_simulation():
+        print(f"  {str(result['members']):>8s} members  {result['seconds']:8.2f} s"
+              f"  {result['member_steps_per_second']:12.0f} member-steps/s")
+
+    print('energy error against RHS evaluations:')
+    for result in benchmark_adaptive_integrator():
+        print(f"  {result['integrator']:>6s} {result['setting']:>10s}"
+              f"  error {result['energy_error']:9.2e}"
+              f"  {result['rhs_evaluations']:8d} RHS evaluations")
+
+    print('energy error over a long horizon:')
+    for result in benchmark_structure_preserving():
+        errors = ' '.join(f'{error:9.2e}' for error in result['energy_errors'])
+        print(f"  {result['integrator']:>17s}  {errors}  {result['seconds']:6.1f} s")
+
+    print('precision:')
+    for result in benchmark_precision():
+        print(f"  {result['dtype']:>8s}  {result['member_steps_per_second']:12.0f} member-steps/s"
+              f"  {result['trajectory_bytes']/2**20:8.1f} MiB"
+              f"  energy drift {result['energy_drift']:9.2e}")
+
+    print('simulation backends:')
+    for result in benchmark_backends():
+        print(f"  {result['backend']:>6s}  {result['steps_per_second']:12.0f} steps/s")
+
+    print('animation rendering:')
+    for result in benchmark_animation():
+        print(f"  {result['path']:>11s}  {result['frames_per_second']:8.1f} frames/s"
+              f"  {result['realtime_factor']:8.3f} x real time")
+
+    print('ensemble animation rendering:')
+    for result in benchmark_ensemble_animation():
+        print(f"  {result['members']:>8d} members  {result['frames_per_second']:8.1f} frames/s")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite')
+    parser.add_argument('--only', nargs='+', choices=list(SUITE)
+                        , help='benchmarks to run, all by default')
+    parser.add_argument('--quick', action='store_true'
+                        , help='run only the smallest cases')
+    parser.add_argument('--repeat', type=int, default=3
+                        , help='timings per case, the best is kept')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file, e.g. '
+                        'the committed benchmark_baseline.json')
+    parser.add_argument('--threshold', type=float, default=1.5
+                        , help='slowdown ratio reported as a regression')
+    parser.add_argument('--studies', action='store_true'
+                        , help='print the comparative studies instead')
+    args = parser.parse_args()
+
+    if args.studies:
+        print_studies()
+        sys.exit()
+
+    results = run_suite(names=args.only, quick=args.quick, repeat=args.repeat)
+    for result in results:
+        print(f"  {_key(result):<70s} {result['seconds']*1e6:12.1f} us")
+    if args.output:
+        write_results(args.output, results
+                      , setup={'only': args.only, 'quick': args.quick
+                               , 'repeat': args.repeat})
+
+    if args.baseline:
+        comparison = compare_to_baseline(results, read_results(args.baseline)
+                                         , threshold=args.threshold)
+        regressions = [entry for entry in comparison if entry['regression']]
+        print(f"{len(comparison)} cases compared, {len(regressions)} slower than "
+              f"{args.threshold}x the baseline:")
+        for entry in regressions:
+            print(f"  {entry['case']:<70s} {entry['ratio']:6.2f}x")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,250 @@
+# --------------
+# A content-addressed disk cache of double pendulum runs
+# --------------
+import os
+import json
+import hashlib
+import numpy as np
+from types import FunctionType, MethodType
+
+from helper import save_arrays_atomic
+from pendulum import DoublePendulum
+from simulator import DoublePendulumSimulation
+
+# integrator attributes that count work done and do not change results
+COUNTERS = ('rhs_evaluations', 'accepted_steps', 'rejected_steps')
+
+
+def _jsonable(value):
+    '''
+        Converts the numpy values among the inputs of a run for json.
+    '''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (type, np.dtype)):
+        return np.dtype(value).name
+    raise TypeError(f"cannot hash {type(value).__name__} values of a run")
+
+
+class SimulationCache():
+    '''
+        Stores the recorded state of DoublePendulumSimulation runs on disk,
+        addressed by a hash of everything that determines the result: the
+        initial state, properties and origin of the double pendulum, the
+        dtype of the simulation, the timestep, the backend, and the type,
+        version and parameters of the integrator.
+
+        The simulation time is not part of the key, so runs of one setup
+        share an entry holding the longest run so far: a shorter run is cut
+        from it, and a longer run continues from its last state. Continuing
+        reproduces the uncached run exactly for explicit integrators. For
+        DormandPrinceIntegrator, which restarts its internal steps, and for
+        canonical integrators, which convert the recorded velocities back to
+        momenta, results agree only to round-off.
+
+        Entries are .npz files written atomically, so concurrent processes
+        may share a directory. Once the files exceed max_bytes the least
+        recently used ones are removed.
+    '''
+    def __init__(self, directory: str, max_bytes: int = 2**30):
+        '''
+            Parameters:
+            -------------------------
+            directory: directory of the cache files, created if needed
+            max_bytes: size above which the least recently used runs are
+                       evicted
+        '''
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, simulation: DoublePendulumSimulation
+            , double_pendulum: DoublePendulum
+            , propagator: MethodType|FunctionType
+            , timestep: float
+            , backend: str = 'numpy') -> str:
+        '''
+            Hash of the inputs of a run, from the current state of
+            double_pendulum.
+        '''
+        integrator = getattr(propagator, '__self__', propagator)
+        parameters = {name: value for name, value in vars(integrator).items()
+                      if not name.startswith('_') and name not in COUNTERS}
+        pendulum1, pendulum2 = double_pendulum.pendulum1, double_pendulum.pendulum2
+        inputs = {'state': [pendulum1.theta, pendulum2.theta, pendulum1.w, pendulum2.w]
+                  , 'properties': [pendulum1.mass, pendulum2.mass
+                                   , pendulum1.length, pendulum2.length]
+                  , 'origin': np.asarray(pendulum1.origin, dtype=np.float64)
+                  , 'dtype': simulation.dtype
+                  , 'timestep': float(timestep)
+                  , 'backend': backend
+                  , 'integrator': [type(integrator).__module__
+                                   , getattr(propagator, '__qualname__', '')
+                                   , getattr(integrator, 'version', None)]
+                  , 'parameters': parameters}
+        encoded = json.dumps(inputs, sort_keys=True, default=_jsonable)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+    def _load(self, key: str):
+        '''
+            Returns the cached (times, states) of key, or None, marking the
+            entry as used.
+        '''
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                times, states = entry['times'], entry['states']
+            os.utime(path)
+        except FileNotFoundError:
+            # never stored, or evicted by another process
+            return None
+        return times, states
+
+    def _store(self, key: str, times: np.ndarray, states: np.ndarray):
+        '''
+            Writes an entry through a temporary file, so readers never see
+            a partial one, then evicts.
+        '''
+        path = self._path(key)
+        save_arrays_atomic(path, times=times, states=states)
+        self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        '''
+            Removes the least recently used entries, other than keep, until
+            the cache fits into max_bytes.
+        '''
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self) -> int:
+        '''
+            Bytes held by the cache.
+        '''
+        return sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory) if name.endswith('.npz'))
+
+    def clear(self):
+        '''
+            Removes all entries.
+        '''
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.directory, name))
+
+    def run_simulation(self, simulation: DoublePendulumSimulation
+                       , double_pendulum: DoublePendulum
+                       , propagator: MethodType|FunctionType
+                       , simulation_time: float|int
+                       , timestep: float
+                       , backend: str = 'numpy') -> str:
+        '''
+            Runs simulation.run_simulation with vectorized_cartesian, or
+            loads its result from the cache. Either way simulation holds the
+            run and double_pendulum is left in its final state afterwards.
+
+            Returns:
+            ---------
+            str: 'hit' if the run was cached, 'extended' if a shorter cached
+                 run was continued, 'miss' if it was run from the start
+        '''
+        key = self.key(simulation=simulation, double_pendulum=double_pendulum
+                       , propagator=propagator, timestep=timestep, backend=backend)
+        cached = self._load(key)
+
+        if cached is None:
+            simulation.run_simulation(double_pendulum=double_pendulum
+                                      , propagator=propagator
+                                      , simulation_time=simulation_time
+                                      , timestep=timestep
+                                      , backend=backend
+                                      , vectorized_cartesian=True)
+            self._store(key, *self._recorded(simulation))
+            return 'miss'
+
+        times, states = cached
+        # the run loop accumulates time step by step, redo that to find
+        # where it stops and to continue at exactly the same time
+        loop_times = np.add.accumulate(np.r_[0.0, np.full(len(times) - 1, float(timestep))])
+        if loop_times[-1] >= simulation_time:
+            steps = np.searchsorted(loop_times, simulation_time, side='left') + 1
+            simulation.set_trajectory(double_pendulum=double_pendulum
+                                      , times=times[:steps], states=states[:steps])
+            return 'hit'
+
+        double_pendulum.set_double_pendulum(theta1=states[-1, 0], w1=states[-1, 2]
+                                           , theta2=states[-1, 1], w2=states[-1, 3])
+        simulation.run_simulation(double_pendulum=double_pendulum
+                                  , propagator=propagator
+                                  , simulation_time=simulation_time
+                                  , timestep=timestep
+                                  , backend=backend
+                                  , vectorized_cartesian=True
+                                  , start_time=loop_times[-1])
+        extension_times, extension_states = self._recorded(simulation)
+        # the first record of the continuation is the last cached one
+        times = np.concatenate([times, extension_times[1:]])
+        states = np.concatenate([states, extension_states[1:]])
+        simulation.set_trajectory(double_pendulum=double_pendulum
+                                  , times=times, states=states)
+        self._store(key, times, states)
+        return 'extended'
+
+    @staticmethod
+    def _recorded(simulation: DoublePendulumSimulation):
+        '''
+            (times, states) recorded by a run with vectorized_cartesian.
+        '''
+        return simulation.time, np.stack([simulation.theta1, simulation.theta2
+                                          , simulation.w1, simulation.w2], axis=1)
+
+
+if __name__ == '__main__':
+
+    import tempfile
+    import time as timer
+    from pendulum import Pendulum
+    from integrations import RungeKuttaIntegrator
+
+    cache = SimulationCache(tempfile.mkdtemp())
+    pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+    pendulum2 = Pendulum(mass=1, length=1)
+    double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+    propagator = RungeKuttaIntegrator().propagate_state
+    for simulation_time in [10, 10, 5, 20]:
+        double_pendulum.set_double_pendulum(theta1=np.pi/2, w1=0
+                                            , theta2=np.pi, w2=0)
+        simulation = DoublePendulumSimulation()
+        start = timer.perf_counter()
+        status = cache.run_simulation(simulation=simulation
+                                      , double_pendulum=double_pendulum
+                                      , propagator=propagator
+                                      , simulation_time=simulation_time
+                                      , timestep=0.01)
+        print(f"{simulation_time:>3} s: {status:<8s} in {timer.perf_counter() - start:.4f} s")
+    print(f"cache holds {cache.size()} bytes in {cache.directory}")
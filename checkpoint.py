@@ -0,0 +1,117 @@
+# --------------
+# Checkpoints of running simulations, to resume or extend them
+# --------------
+import os
+import time as timer
+import numpy as np
+
+from helper import save_arrays_atomic
+
+# prefix of the integrator state among the arrays of a checkpoint file
+INTEGRATOR_PREFIX = 'integrator.'
+
+
+class Checkpoint():
+    '''
+        A checkpoint file of a DoublePendulumSimulation run. Pass one to
+        run_simulation as checkpoint to save the progress periodically and
+        at the end of the run, then continue it with resume_simulation,
+        after a crash or to extend a finished run.
+
+        A checkpoint holds the time, the state the integrator works on,
+        the internal state of the integrator if it keeps one (see
+        DormandPrinceIntegrator.get_state) and the trajectory recorded so
+        far, so a resumed run is identical to an uninterrupted one. Files
+        are replaced atomically, so an interrupted save leaves the previous
+        checkpoint intact.
+    '''
+    def __init__(self, path: str
+                 , every_seconds: float|None = 60
+                 , every_steps: int|None = None):
+        '''
+            Parameters:
+            -------------------------
+            path:          .npz file of the checkpoint
+            every_seconds: wall time between checkpoints
+            every_steps:   steps between checkpoints, e.g. for reproducible
+                           checkpoint times. None on both only saves at the
+                           end of a run.
+        '''
+        self.path = path
+        self.every_seconds = every_seconds
+        self.every_steps = every_steps
+        self.saves = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def start(self):
+        '''
+            Marks the start of a run, from which the intervals count.
+        '''
+        self._last_save = timer.perf_counter()
+        self._steps = 0
+
+    def due(self) -> bool:
+        '''
+            Counts a step, and tells if a checkpoint is due after it.
+        '''
+        self._steps += 1
+        if self.every_steps is not None and self._steps % self.every_steps == 0:
+            return True
+        return (self.every_seconds is not None
+                and timer.perf_counter() - self._last_save >= self.every_seconds)
+
+    def save(self, integrator_state: dict, **arrays):
+        '''
+            Writes a checkpoint of the given arrays and integrator state.
+        '''
+        arrays.update({INTEGRATOR_PREFIX + name: value
+                       for name, value in integrator_state.items()})
+        save_arrays_atomic(self.path, **arrays)
+        self._last_save = timer.perf_counter()
+        self.saves += 1
+
+    def load(self) -> tuple:
+        '''
+            Reads the checkpoint.
+
+            Returns:
+            ---------
+            tuple: (dict of arrays, dict of the integrator state)
+        '''
+        with np.load(self.path) as checkpoint:
+            arrays = {name: checkpoint[name] for name in checkpoint.files}
+        integrator_state = {name[len(INTEGRATOR_PREFIX):]: arrays.pop(name)
+                            for name in list(arrays)
+                            if name.startswith(INTEGRATOR_PREFIX)}
+        return arrays, integrator_state
+
+
+if __name__ == '__main__':
+
+    import tempfile
+    from pendulum import Pendulum
+    from pendulum import DoublePendulum
+    from simulator import DoublePendulumSimulation
+    from integrations import DormandPrinceIntegrator
+
+    pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+    pendulum2 = Pendulum(mass=1, length=1)
+    double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+    double_pendulum.set_double_pendulum(theta1=np.pi/2, w1=0, theta2=np.pi, w2=0)
+    checkpoint = Checkpoint(os.path.join(tempfile.mkdtemp(), 'run.npz')
+                            , every_seconds=None, every_steps=500)
+
+    simulation = DoublePendulumSimulation()
+    simulation.run_simulation(double_pendulum=double_pendulum
+                              , propagator=DormandPrinceIntegrator().propagate_state
+                              , simulation_time=10, timestep=0.01
+                              , vectorized_cartesian=True, checkpoint=checkpoint)
+    print(f"ran to {simulation.time[-1]:.2f} s with {checkpoint.saves} checkpoints")
+    # extend the finished run with a new integrator, as after a restart
+    simulation.resume_simulation(double_pendulum=double_pendulum
+                                 , propagator=DormandPrinceIntegrator().propagate_state
+                                 , checkpoint=checkpoint, simulation_time=20)
+    print(f"extended to {simulation.time[-1]:.2f} s, energy drift "
+          f"{simulation.energy.statistics['max_relative_drift']:.2e}")
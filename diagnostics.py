@@ -0,0 +1,82 @@
+# --------------
+# Vectorized diagnostics over whole trajectories
+# --------------
+import numpy as np
+from functools import cached_property
+
+from pendulum import calculate_double_pendulum_energy
+
+
+class EnergyDiagnostics():
+    '''
+        Energy series and drift statistics of a double pendulum trajectory,
+        a single run of shape (T,) or an ensemble of shape (T, N). Every
+        quantity is computed in one vectorized pass on first access and
+        cached, so repeated queries are free.
+    '''
+    def __init__(self, theta1: np.ndarray, theta2: np.ndarray
+                 , w1: np.ndarray, w2: np.ndarray
+                 , properties: np.ndarray|list
+                 , origin: np.ndarray|list = (0, 0)):
+        '''
+            Parameters:
+            -------------------------
+            theta1, theta2, w1, w2: state arrays with time along the first axis
+            properties:             (mass1, mass2, length1, length2), shape
+                                    (4,) or (N, 4)
+            origin:                 hang-point of the upper pendulum
+        '''
+        # compute in double precision, whatever the trajectory dtype
+        self._state = [np.asarray(value, dtype=np.float64)
+                       for value in [theta1, theta2, w1, w2]]
+        self.properties = np.asarray(properties, dtype=np.float64)
+        self.origin = origin
+
+    @cached_property
+    def _energies(self):
+        return calculate_double_pendulum_energy(*self._state
+                                                , properties=self.properties
+                                                , origin=self.origin)
+
+    @cached_property
+    def kinetic(self) -> np.ndarray:
+        return self._energies[0]
+
+    @cached_property
+    def potential(self) -> np.ndarray:
+        return self._energies[1]
+
+    @cached_property
+    def total(self) -> np.ndarray:
+        return self.kinetic + self.potential
+
+    @cached_property
+    def drift(self) -> np.ndarray:
+        '''
+            Deviation of the total energy from its initial value.
+        '''
+        return self.total - self.total[0]
+
+    @cached_property
+    def scale(self) -> np.ndarray:
+        '''
+            Energy scale for relative drift, the potential energy difference
+            between the pendulum hanging down and standing up. Unlike the
+            initial energy it is never zero.
+        '''
+        mass1, mass2 = self.properties[..., 0], self.properties[..., 1]
+        length1, length2 = self.properties[..., 2], self.properties[..., 3]
+        return 2 * 9.82 * ((mass1+mass2) * length1 + mass2 * length2)
+
+    @cached_property
+    def statistics(self) -> dict:
+        '''
+            Drift statistics along the time axis, arrays of shape (N,) for an
+            ensemble.
+        '''
+        drift = self.drift
+        return {'max_abs_drift': np.max(np.abs(drift), axis=0)
+                , 'final_drift': drift[-1]
+                , 'mean_drift': np.mean(drift, axis=0)
+                , 'rms_drift': np.sqrt(np.mean(drift**2, axis=0))
+                , 'max_relative_drift': np.max(np.abs(drift), axis=0) / self.scale}
@@ -0,0 +1,168 @@
+# --------------
+# Events of double pendulum runs, located within a step by root finding
+# --------------
+import numpy as np
+from types import FunctionType
+from typing import NamedTuple
+
+from pendulum import calculate_double_pendulum_energy
+
+CHANNELS = ('theta1', 'theta2', 'w1', 'w2')
+
+
+class EventLog(NamedTuple):
+    '''
+        The occurrences of one event in a run, as returned by find_events.
+    '''
+    time: np.ndarray                  # (k,)
+    state: np.ndarray                 # (k, 4), rows (theta1, theta2, w1, w2)
+    member: np.ndarray|None = None    # (k,) ensemble member of each occurrence
+
+
+class Event():
+    '''
+        An event of a double pendulum run: a zero crossing of
+        func(time, state, properties), where state has shape (n, 4), rows
+        (theta1, theta2, w1, w2), for the n pendula still integrated, and
+        properties the matching (mass1, mass2, length1, length2), of shape
+        (4,) or (n, 4). time is a float, or an array (n,) while a crossing
+        is located. func returns an array of shape (n,).
+
+        Crossings are detected from the sign of func after every step, so
+        two crossings within one step go unnoticed, and then located in the
+        step by bisection on a cubic Hermite interpolant of the state.
+    '''
+    def __init__(self, func: FunctionType
+                 , terminal: bool = False
+                 , direction: int = 0
+                 , name: str = ''):
+        '''
+            Parameters:
+            -------------------------
+            func:      event function, see above
+            terminal:  stop integrating a pendulum at its first occurrence
+            direction: 1 for rising crossings only, -1 for falling ones,
+                       0 for both
+            name:      label of the event
+        '''
+        if direction not in [-1, 0, 1]:
+            raise ValueError("direction must be -1, 0 or 1")
+        self.func = func
+        self.terminal = terminal
+        self.direction = direction
+        self.name = name
+
+    def __call__(self, time: float, state: np.ndarray
+                 , properties: np.ndarray) -> np.ndarray:
+        # broadcast, e.g. for events of the time alone
+        return np.broadcast_to(self.func(time, state, properties), (len(state),))
+
+    def crossed(self, before: np.ndarray, after: np.ndarray) -> np.ndarray:
+        '''
+            Mask of the crossings in the given direction between two values
+            of the event function. A zero counts once, at the end of a step.
+        '''
+        rising = (before < 0) & (after >= 0)
+        falling = (before > 0) & (after <= 0)
+        if self.direction == 1:
+            return rising
+        if self.direction == -1:
+            return falling
+        return rising | falling
+
+
+def crossing(channel: str, value: float = 0, direction: int = 0
+             , terminal: bool = False) -> Event:
+    '''
+        An event of a state channel passing value, e.g. theta1 passing 0
+        with direction 1, i.e. with positive w1, for a Poincare section.
+    '''
+    index = CHANNELS.index(channel)
+    return Event(lambda time, state, properties: state[:, index] - value
+                 , terminal=terminal, direction=direction
+                 , name=f'{channel}={value}')
+
+def flip(pendulum: int = 2, terminal: bool = True) -> Event:
+    '''
+        An event of a pendulum (1 upper, 2 lower) flipping over its
+        hang-point, i.e. its angle leaving (-pi, pi), as in the flip-time
+        maps of fractal.py.
+    '''
+    index = pendulum - 1
+    return Event(lambda time, state, properties: np.cos(state[:, index] / 2)
+                 , terminal=terminal, direction=-1, name=f'flip{pendulum}')
+
+def energy_crossing(energy: float, origin: np.ndarray|list = (0, 0)
+                    , direction: int = 0, terminal: bool = False) -> Event:
+    '''
+        An event of the mechanical energy passing a threshold, e.g. to
+        detect numerical drift.
+    '''
+    def func(time, state, properties):
+        kinetic, potential = calculate_double_pendulum_energy(
+            state[:, 0], state[:, 1], state[:, 2], state[:, 3]
+            , properties=properties, origin=origin)
+        return kinetic + potential - energy
+    return Event(func, terminal=terminal, direction=direction, name=f'energy={energy}')
+
+
+def hermite_interpolation(time: np.ndarray, time0: float, state0: np.ndarray
+                          , derivative0: np.ndarray, time1: float
+                          , state1: np.ndarray, derivative1: np.ndarray):
+    '''
+        Evaluates the cubic Hermite interpolant between (time0, state0) and
+        (time1, state1) with the given derivatives at the times (n,), for
+        states of shape (n, 4).
+    '''
+    h = time1 - time0
+    s = ((time - time0) / h)[:, None]
+    return ((2*s**3 - 3*s**2 + 1) * state0 + (s**3 - 2*s**2 + s) * h * derivative0
+            + (-2*s**3 + 3*s**2) * state1 + (s**3 - s**2) * h * derivative1)
+
+def locate(event: Event, time0: float, state0: np.ndarray, derivative0: np.ndarray
+           , time1: float, state1: np.ndarray, derivative1: np.ndarray
+           , value0: np.ndarray, properties: np.ndarray, tol: float):
+    '''
+        Bisects the crossings of event within a step, for n pendula at
+        once, until the times are known to tol.
+
+        Returns:
+        ---------
+        tuple: (times (n,), states (n, 4))
+    '''
+    n = len(state0)
+    low, high = np.full(n, float(time0)), np.full(n, float(time1))
+    # halving a step a hundred times reaches the resolution of any float
+    for _ in range(100):
+        if np.max(high - low) <= tol:
+            break
+        middle = (low + high) / 2
+        value = event(middle, hermite_interpolation(middle, time0, state0, derivative0
+                                                    , time1, state1, derivative1)
+                      , properties)
+        before = np.sign(value) == np.sign(value0)
+        low, value0 = np.where(before, middle, low), np.where(before, value, value0)
+        high = np.where(before, high, middle)
+    return high, hermite_interpolation(high, time0, state0, derivative0
+                                       , time1, state1, derivative1)
+
+
+if __name__ == '__main__':
+
+    import time as timer
+    from simulator import DoublePendulumEnsembleSimulation
+    from integrations import RungeKuttaIntegrator
+
+    # first flip times of a row of initial angles, without storing any path
+    initial_states = np.zeros((500, 4))
+    initial_states[:, 0] = np.linspace(-3, 3, 500)
+    initial_states[:, 1] = 2
+    simulation = DoublePendulumEnsembleSimulation()
+    start = timer.perf_counter()
+    flips, section = simulation.find_events(
+        initial_states=initial_states, properties=[1, 1, 1, 1]
+        , propagator=RungeKuttaIntegrator().propagate_state
+        , events=[flip(2), crossing('theta1', 0, direction=1)]
+        , simulation_time=20, timestep=0.01)
+    print(f"{len(flips.time)} of 500 members flipped, {len(section.time)} section"
+          f" crossings, in {timer.perf_counter() - start:.2f} s")
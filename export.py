@@ -0,0 +1,168 @@
+# --------------
+# Headless export of double pendulum simulations to video and GIF files
+# --------------
+import os
+import time as timer
+import numpy as np
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib import animation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+from simulator import DoublePendulumSimulation
+from integrations import RungeKuttaIntegrator
+from animation import DoublePendulumAnimation
+from animation import BlittedDoublePendulumAnimation
+
+
+class Clip(NamedTuple):
+    '''
+        A clip to export: a run of a double pendulum hanging from the origin,
+        rendered to path. GIF for a .gif path, ffmpeg otherwise.
+    '''
+    path: str
+    state: tuple                       # (theta1, theta2, w1, w2)
+    properties: tuple = (1, 1, 1, 1)   # (mass1, mass2, length1, length2)
+    simulation_time: float = 10
+    timestep: float = 0.01
+    fps: int = 30
+
+
+def make_writer(path: str, fps: float|int):
+    '''
+        Returns a Pillow writer for GIF files, and an ffmpeg writer for
+        any other file type.
+    '''
+    if os.path.splitext(path)[1].lower() == '.gif':
+        return animation.PillowWriter(fps=fps)
+    if not animation.writers.is_available('ffmpeg'):
+        raise ValueError(f"ffmpeg is not installed, cannot write {path}; "
+                         "export to .gif instead")
+    return animation.FFMpegWriter(fps=fps)
+
+
+class ClipExporter():
+    '''
+        Renders animations into files without a display. Frames are drawn
+        by the Agg canvas straight into the writer, and one figure is reused
+        for every clip.
+    '''
+    def __init__(self, figsize: tuple = (6.4, 4.8), dpi: int = 100):
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+
+    def export(self, double_pendulum_animation: DoublePendulumAnimation
+               , path: str) -> dict:
+        '''
+            Writes every frame of the animation to path, at the frame rate of
+            a BlittedDoublePendulumAnimation, or at 50 frames per second for
+            the original one-frame-per-step animation.
+
+            Returns:
+            ---------
+            dict with the path, number of frames, seconds and frames per second
+        '''
+        fps = getattr(double_pendulum_animation, 'fps', 50)
+        writer = make_writer(path, fps)
+
+        start = timer.perf_counter()
+        double_pendulum_animation.initialize_animation(ax=self.ax)
+        with writer.saving(self.figure, path, dpi=self.dpi):
+            for frame in range(len(double_pendulum_animation.t)):
+                double_pendulum_animation.update_frame(frame)
+                writer.grab_frame()
+        seconds = timer.perf_counter() - start
+
+        frames = len(double_pendulum_animation.t)
+        return {'path': path
+                , 'frames': frames
+                , 'seconds': seconds
+                , 'frames_per_second': frames / seconds}
+
+
+# one exporter, and so one figure, per worker process
+_exporter = None
+
+def export_clip(clip: Clip) -> dict:
+    '''
+        Simulates and exports one clip, with the exporter of this process.
+
+        Returns:
+        ---------
+        dict as ClipExporter.export, with the process id as 'worker'
+    '''
+    global _exporter
+    if _exporter is None:
+        _exporter = ClipExporter()
+
+    mass1, mass2, length1, length2 = clip.properties
+    pendulum1 = Pendulum(mass=mass1, length=length1, origin=[0,0])
+    pendulum2 = Pendulum(mass=mass2, length=length2)
+    double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+    double_pendulum.set_double_pendulum(theta1=clip.state[0], w1=clip.state[2]
+                                       , theta2=clip.state[1], w2=clip.state[3])
+    simulation = DoublePendulumSimulation()
+    simulation.run_simulation(double_pendulum=double_pendulum
+                              , propagator=RungeKuttaIntegrator().propagate_state
+                              , simulation_time=clip.simulation_time
+                              , timestep=clip.timestep
+                              , vectorized_cartesian=True)
+
+    result = _exporter.export(BlittedDoublePendulumAnimation(
+        simulation=simulation, double_pendulum=double_pendulum, fps=clip.fps)
+        , path=clip.path)
+    result['worker'] = os.getpid()
+    return result
+
+def export_clips(clips: list, workers: int|None = None):
+    '''
+        Exports clips over a process pool.
+
+        Parameters:
+        ----------------
+        clips:   list of Clip
+        workers: size of the process pool, 0 exports in this process
+
+        Returns:
+        ---------
+        tuple: (list of results per clip, dict of frames, seconds and
+                frames per second per worker)
+    '''
+    if workers == 0:
+        results = [export_clip(clip) for clip in clips]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(export_clip, clips))
+
+    per_worker = {}
+    for result in results:
+        stats = per_worker.setdefault(result['worker']
+                                      , {'clips': 0, 'frames': 0, 'seconds': 0.0})
+        stats['clips'] += 1
+        stats['frames'] += result['frames']
+        stats['seconds'] += result['seconds']
+    for stats in per_worker.values():
+        stats['frames_per_second'] = stats['frames'] / stats['seconds']
+    return results, per_worker
+
+
+if __name__ == '__main__':
+
+    import tempfile
+    rng = np.random.default_rng(seed=0)
+    directory = tempfile.mkdtemp()
+    clips = [Clip(path=os.path.join(directory, f'clip{i}.gif')
+                  , state=(*rng.uniform(-np.pi, np.pi, 2), 0, 0)
+                  , simulation_time=5)
+             for i in range(8)]
+    results, per_worker = export_clips(clips)
+    for worker, stats in per_worker.items():
+        print(f"worker {worker}: {stats['clips']} clips, {stats['frames']} frames"
+              f" at {stats['frames_per_second']:.1f} frames/s")
+    print(f"clips written to {directory}")
@@ -0,0 +1,173 @@
+# --------------
+# A module for flip-time maps over a grid of initial angles
+# --------------
+import time as timer
+import numpy as np
+from functools import partial
+
+from simulator import DoublePendulumSimulation
+from integrations import RungeKuttaIntegrator
+from helper import SharedBatchPool
+
+
+def _integrate_tile(image: np.ndarray, theta1: np.ndarray, theta2: np.ndarray
+                    , rows: slice, cols: slice, stride: int, first_level: bool
+                    , properties: np.ndarray, max_time: float, timestep: float):
+    '''
+        Integrates the pixels of one tile that belong to the given refinement
+        level as a single batch, and writes their flip times into image.
+        Pixels are retired from the batch as soon as they flip.
+
+        Returns:
+        ---------
+        int: number of pixels computed
+    '''
+    # pixels of this tile on the level's sub-grid, skipping those computed
+    # on a coarser level
+    i = np.arange(rows.start, rows.stop)
+    j = np.arange(cols.start, cols.stop)
+    i, j = np.meshgrid(i[i % stride == 0], j[j % stride == 0], indexing='ij')
+    i, j = i.ravel(), j.ravel()
+    if not first_level:
+        new = (i % (2*stride) != 0) | (j % (2*stride) != 0)
+        i, j = i[new], j[new]
+    if len(i) == 0:
+        return 0
+
+    state = np.zeros((len(i), 4), dtype=theta1.dtype)
+    state[:, 0] = theta1[j]
+    state[:, 1] = theta2[i]
+    flip_time = np.full(len(i), np.inf)
+
+    # pendula released at rest with too little energy can never flip
+    mass1, mass2, length1, length2 = properties
+    energy = - 9.82 * ((mass1+mass2) * length1 * np.cos(state[:, 0])
+                       + mass2 * length2 * np.cos(state[:, 1]))
+    flip_energy = - 9.82 * np.abs((mass1+mass2) * length1 - mass2 * length2)
+    active = np.flatnonzero(energy >= flip_energy)
+    state = state[active]
+
+    func = partial(DoublePendulumSimulation().double_pendulum_dynamics
+                   , properties=properties)
+    propagate_state = RungeKuttaIntegrator().propagate_state
+    time = 0
+    while len(active) > 0 and time < max_time:
+        time, state = propagate_state(rhs_func=func, time=time
+                                      , state=state, timestep=timestep)
+        flipped = (np.abs(state[:, 0]) > np.pi) | (np.abs(state[:, 1]) > np.pi)
+        if flipped.any():
+            flip_time[active[flipped]] = time
+            active = active[~flipped]
+            state = state[~flipped]
+
+    image[i, j] = flip_time
+    return len(i)
+
+
+class FlipTimeMap():
+    '''
+        Computes the time until the first flip of either arm of a double
+        pendulum, released at rest, over a theta1 x theta2 grid. Pixels that
+        do not flip within max_time are set to inf.
+    '''
+    def __init__(self, resolution: int = 256
+                 , properties: np.ndarray|list = (1, 1, 1, 1)
+                 , max_time: float|int = 10
+                 , timestep: float = 0.01
+                 , theta_range: tuple = (-np.pi, np.pi)
+                 , tile_size: int = 64
+                 , workers: int|None = None
+                 , dtype: type = np.float32):
+        '''
+            Parameters:
+            -------------------------
+            resolution:  number of pixels along each axis
+            properties:  (mass1, mass2, length1, length2)
+            max_time:    simulated time after which a pixel counts as unflipped
+            timestep:    timestep of propagation
+            theta_range: range of both initial angles
+            tile_size:   pixels along each side of a tile
+            workers:     size of the process pool, 0 computes in this process
+            dtype:       precision of the integration, float32 by default as
+                         flip times need little accuracy and many pixels
+        '''
+        self.resolution = resolution
+        self.properties = np.array(properties, dtype=dtype)
+        self.max_time = max_time
+        self.timestep = timestep
+        self.tile_size = tile_size
+        self.workers = workers
+        # theta1 varies along columns, theta2 along rows
+        self.theta1 = np.linspace(*theta_range, resolution, dtype=dtype)
+        self.theta2 = np.linspace(*theta_range, resolution, dtype=dtype)
+
+    def _tiles(self):
+        for row in range(0, self.resolution, self.tile_size):
+            for col in range(0, self.resolution, self.tile_size):
+                yield (slice(row, min(row+self.tile_size, self.resolution))
+                       , slice(col, min(col+self.tile_size, self.resolution)))
+
+    def refine(self, levels: int = 4):
+        '''
+            Computes the map progressively, from a sub-grid with a stride of
+            2**(levels-1) pixels down to the full grid. After each level the
+            image computed so far is yielded, with missing pixels filled from
+            the nearest computed pixel up and to the left.
+
+            Yields:
+            ---------
+            tuple: (np.ndarray image, dict with stride, pixels and pixels_per_second)
+        '''
+        shape = (self.resolution, self.resolution)
+        with SharedBatchPool(shape=shape, workers=self.workers, fill=np.nan) as pool:
+            image = pool.array
+            for level in reversed(range(levels)):
+                stride = 2**level
+                tile_kwargs = {tile: {'theta1': self.theta1, 'theta2': self.theta2
+                                      , 'rows': rows, 'cols': cols
+                                      , 'stride': stride
+                                      , 'first_level': level == levels-1
+                                      , 'properties': self.properties
+                                      , 'max_time': self.max_time
+                                      , 'timestep': self.timestep}
+                               for tile, (rows, cols) in enumerate(self._tiles())}
+
+                start = timer.perf_counter()
+                pixels = sum(n for _, n in pool.run(_integrate_tile, tile_kwargs))
+                seconds = timer.perf_counter() - start
+
+                # fill the pixels of finer levels from the coarse sub-grid
+                coarse = image[::stride, ::stride]
+                filled = np.repeat(np.repeat(coarse, stride, axis=0)
+                                   , stride, axis=1)[:shape[0], :shape[1]]
+                stats = {'stride': stride
+                         , 'pixels': pixels
+                         , 'pixels_per_second': pixels / seconds}
+                yield filled.copy(), stats
+
+    def compute(self, levels: int = 1):
+        '''
+            Computes the full map, returning only the final image. The
+            throughput over all levels is stored in self.pixels_per_second.
+        '''
+        start = timer.perf_counter()
+        for image, stats in self.refine(levels=levels):
+            pass
+        self.pixels_per_second = self.resolution**2 / (timer.perf_counter() - start)
+        return image
+
+
+if __name__ == '__main__':
+
+    flip_map = FlipTimeMap(resolution=256, max_time=10, timestep=0.01)
+    for image, stats in flip_map.refine(levels=4):
+        print(f"stride {stats['stride']}: {stats['pixels']} pixels"
+              f" at {stats['pixels_per_second']:.0f} pixels/s")
+
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    ax.imshow(np.log10(image), origin='lower', cmap='magma'
+              , extent=[-np.pi, np.pi, -np.pi, np.pi])
+    ax.set_xlabel('theta1')
+    ax.set_ylabel('theta2')
+    plt.show()
@@ -1,4 +1,8 @@
+import os
+import tempfile
 import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def calculate_angle(x:float|int, y:float|int, offset: float|int = 0):
     '''
@@ -19,4 +23,146 @@ def calculate_angle(x:float|int, y:float|int, offset: float|int = 0):
     elif x < 0 and y == 0:
         return np.pi - offset
     else:
-        raise ValueError("Angle ill-defined for (x,y)=(0,0)")
\ No newline at end of file
+        raise ValueError("Angle ill-defined for (x,y)=(0,0)")
+
+def calculate_angles(x: np.ndarray, y: np.ndarray, offset: float|int = 0):
+    '''
+        helper function, computes angles from arrays of cartesian coordinates,
+        with the convention of calculate_angle: angles in [0, 2*pi) minus
+        offset, except -pi/2 minus offset on the negative y-axis.
+
+        Returns:
+        ---------
+        tuple: (angles, undefined), where undefined masks the points at
+               (x,y)=(0,0), whose angles are nan
+    '''
+    x, y = np.asarray(x), np.asarray(y)
+    angles = np.mod(np.arctan2(y, x), 2*np.pi)
+    angles = np.where((x == 0) & (y < 0), -np.pi/2, angles)
+    undefined = (x == 0) & (y == 0)
+    angles = np.where(undefined, np.nan, angles) - offset
+    return angles, undefined
+
+def create_shared_array(shape: tuple, dtype: type = np.float64, fill=None):
+    '''
+        helper function, allocates a numpy array in shared memory, so worker
+        processes can write results without pickling them back.
+
+        Returns:
+        ---------
+        tuple: (SharedMemory, np.ndarray), the caller must close and unlink
+               the SharedMemory when done
+    '''
+    size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shared = shared_memory.SharedMemory(create=True, size=size)
+    array = np.ndarray(shape, dtype=dtype, buffer=shared.buf)
+    if fill is not None:
+        array.fill(fill)
+    return shared, array
+
+def attach_shared_array(name: str, shape: tuple, dtype: type = np.float64):
+    '''
+        helper function, attaches to an array created by create_shared_array
+        from a worker process.
+
+        Returns:
+        ---------
+        tuple: (SharedMemory, np.ndarray), the caller must close the
+               SharedMemory when done, but not unlink it, as the block is
+               owned by the creating process
+    '''
+    shared = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shared.buf)
+    return shared, array
+
+def _run_shared_batch(func, name: str, shape: tuple, dtype: type, /, **kwargs):
+    '''
+        Worker entry point of SharedBatchPool, attaches to the shared array
+        and runs one batch on it.
+    '''
+    shared, array = attach_shared_array(name=name, shape=shape, dtype=dtype)
+    try:
+        return func(array, **kwargs)
+    finally:
+        shared.close()
+
+class SharedBatchPool():
+    '''
+        helper class, runs batches of work over a process pool, each writing
+        its results into one array in shared memory instead of pickling them
+        back. A batch is func(array, **kwargs), with func defined at module
+        level so it can be sent to the workers. With workers=0 the batches
+        run in this process on the same array. Use it as a context manager,
+        which shuts the pool down, cancelling batches not yet started, and
+        frees the shared memory.
+    '''
+    def __init__(self, shape: tuple
+                 , workers: int|None = None
+                 , dtype: type = np.float64
+                 , fill=None):
+        '''
+            Parameters:
+            -------------------------
+            shape:   shape of the shared array
+            workers: size of the process pool, None for one per CPU, 0 runs
+                     the batches in this process
+            dtype:   dtype of the shared array
+            fill:    optional initial value of the shared array
+        '''
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.shared, self.array = create_shared_array(shape=shape, dtype=dtype
+                                                      , fill=fill)
+        self.executor = None
+        if workers != 0:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def run(self, func, batch_kwargs: dict):
+        '''
+            Runs func(array, **kwargs) for every batch.
+
+            Parameters:
+            -------------------------
+            func:         function of the shared array and the keyword
+                          arguments of a batch
+            batch_kwargs: batch key to keyword arguments
+
+            Yields:
+            ---------
+            tuple: (batch key, result of func), as the batches finish
+        '''
+        if self.executor is None:
+            for key, kwargs in batch_kwargs.items():
+                yield key, func(self.array, **kwargs)
+            return
+        futures = {self.executor.submit(_run_shared_batch, func, self.shared.name
+                                        , self.shape, self.dtype, **kwargs): key
+                   for key, kwargs in batch_kwargs.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def save_arrays_atomic(path: str, **arrays):
+    '''
+        helper function, saves arrays to an .npz file through a temporary
+        file in the same directory, so readers, or a crash, never leave a
+        partially written file at path.
+    '''
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path))
+                                     , suffix='.tmp', delete=False) as file:
+        np.savez(file, **arrays)
+    os.replace(file.name, path)
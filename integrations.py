@@ -2,13 +2,24 @@
 # A script to define integrator classes
 # --------------
 import numpy as np
+from functools import partial
 from types import FunctionType
 class RungeKuttaIntegrator():
     '''
         A class of RK integrators to propagate newtonian particles
     '''
-    def __init__(self):
-        pass
+    # revision of the numerics, to bump whenever a change alters results,
+    # which invalidates runs stored by SimulationCache
+    version = 1
+
+    def __init__(self, dtype: type|None = None):
+        '''
+            Parameters:
+            -------------------------
+            dtype: precision of the propagation, states are converted to it.
+                   None propagates in the dtype of the given state.
+        '''
+        self.dtype = dtype
 
     def propagate_state(self, rhs_func: FunctionType 
                        , time: float, state: np.ndarray 
@@ -26,6 +37,9 @@ class RungeKuttaIntegrator():
             ---------
             tuple: (float, np.ndarray)
         '''
+        state = np.asarray(state, dtype=self.dtype)
+        # a numpy float64 timestep would promote a float32 state
+        timestep = float(timestep)
         # calculate k1 and check that is is numpy array type
         k1 = rhs_func(state)
         if type(k1) is not np.ndarray:
@@ -38,4 +52,418 @@ class RungeKuttaIntegrator():
         state = state + timestep/6 * (k1 + 2*k2 + 2*k3 + k4)
         time = time + timestep
 
-        return time, state
\ No newline at end of file
+        return time, state
+
+class DormandPrinceIntegrator():
+    '''
+        An adaptive Runge-Kutta 5(4) integrator (Dormand-Prince), with
+        error control, FSAL reuse of the last RHS evaluation and dense output.
+        
+        propagate_state has the calling convention of
+        RungeKuttaIntegrator.propagate_state, but timestep is the output
+        interval; internally the integrator takes as many adaptive steps as
+        the tolerances require and interpolates the state at time + timestep.
+    '''
+    version = 1
+    # nodes, coefficients and weights of the Butcher tableau
+    C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+    A = [np.array([]),
+         np.array([1/5]),
+         np.array([3/40, 9/40]),
+         np.array([44/45, -56/15, 32/9]),
+         np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+         np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]),
+         np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])]
+    B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+    # difference between the 5th and the embedded 4th order weights
+    E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+    # coefficients of the 4th order dense output polynomial
+    P = np.array([
+        [1, -8048581381/2820520608, 8663915743/2820520608
+         , -12715105075/11282082432],
+        [0, 0, 0, 0],
+        [0, 131558114200/32700410799, -68118460800/10900136933
+         , 87487479700/32700410799],
+        [0, -1754552775/470086768, 14199869525/1410260304
+         , -10690763975/1880347072],
+        [0, 127303824393/49829197408, -318862633887/49829197408
+         , 701980252875/199316789632],
+        [0, -282668133/205662961, 2019193451/616988883
+         , -1453857185/822651844],
+        [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+    def __init__(self, rtol: float = 1e-6, atol: float = 1e-9
+                 , max_step: float = np.inf, safety: float = 0.9
+                 , dtype: type|None = None):
+        '''
+            Parameters:
+            -------------------------
+            rtol:     relative tolerance of the local error
+            atol:     absolute tolerance of the local error
+            max_step: upper bound on the internal step size
+            safety:   factor applied to the optimal step size
+            dtype:    precision of the propagation, see RungeKuttaIntegrator
+        '''
+        self.dtype = dtype
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max_step
+        self.safety = safety
+        self.rhs_evaluations = 0
+        self.accepted_steps = 0
+        self.rejected_steps = 0
+        self.reset()
+
+    def reset(self):
+        '''
+            Forgets the internal step, so the next call starts afresh.
+        '''
+        self._rhs_func = None
+        self._output = None
+
+    def _start(self, rhs_func: FunctionType, time: float, state: np.ndarray):
+        '''
+            Initializes the internal step from (time, state), choosing the
+            first step size as suggested by Hairer, Norsett & Wanner.
+        '''
+        self._rhs_func = rhs_func
+        self._t, self._y = time, state
+        self._f = self._evaluate(state)
+        self._t_old, self._y_old, self._k = time, state, None
+        self._cast_tableau(np.result_type(state, self._f))
+
+        scale = self.atol + self.rtol * np.abs(state)
+        d0 = self._norm(state / scale)
+        d1 = self._norm(self._f / scale)
+        h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+        f1 = self._evaluate(state + h0 * self._f)
+        d2 = self._norm((f1 - self._f) / scale) / h0
+        if max(d1, d2) <= 1e-15:
+            h1 = max(1e-6, h0 * 1e-3)
+        else:
+            h1 = (0.01 / max(d1, d2)) ** (1/5)
+        self._h = float(min(100 * h0, h1, self.max_step))
+
+    def _cast_tableau(self, dtype: np.dtype):
+        '''
+            Keeps the tableau in the working dtype, so no stage is promoted.
+        '''
+        self._A = [a.astype(dtype) for a in self.A]
+        self._B, self._E, self._P = (self.B.astype(dtype), self.E.astype(dtype)
+                                     , self.P.astype(dtype))
+
+    def get_state(self) -> dict:
+        '''
+            The internal step, last output and counters as numbers and
+            arrays, e.g. to checkpoint a run. set_state restores them, so
+            the integration continues exactly as if never interrupted.
+        '''
+        state = {'rhs_evaluations': self.rhs_evaluations
+                 , 'accepted_steps': self.accepted_steps
+                 , 'rejected_steps': self.rejected_steps}
+        if self._output is not None:
+            state.update({'t': self._t, 'y': self._y, 'f': self._f, 'h': self._h
+                          , 't_old': self._t_old, 'y_old': self._y_old
+                          , 'output_time': self._output[0]
+                          , 'output_state': self._output[1]})
+            if self._k is not None:
+                state['k'] = self._k
+        return state
+
+    def set_state(self, state: dict):
+        '''
+            Restores a state of get_state, possibly read back from a file.
+            The next call of propagate_state continues from it if given the
+            restored output time and state, with whatever RHS function it
+            is given.
+        '''
+        self.reset()
+        self.rhs_evaluations = int(state['rhs_evaluations'])
+        self.accepted_steps = int(state['accepted_steps'])
+        self.rejected_steps = int(state['rejected_steps'])
+        if 'output_time' not in state:
+            return
+        self._t, self._t_old, self._h = (float(state['t']), float(state['t_old'])
+                                         , float(state['h']))
+        self._y, self._y_old, self._f = (np.asarray(state['y']), np.asarray(state['y_old'])
+                                         , np.asarray(state['f']))
+        self._k = np.asarray(state['k']) if 'k' in state else None
+        self._output = (float(state['output_time']), np.asarray(state['output_state']))
+        self._cast_tableau(np.result_type(self._y, self._f))
+
+    def _evaluate(self, state: np.ndarray) -> np.ndarray:
+        k = self._rhs_func(state)
+        if type(k) is not np.ndarray:
+            raise TypeError(f"Your RHS function must return a numpy ndarray, yours returned: {type(k)}")
+        self.rhs_evaluations += 1
+        return k
+
+    @staticmethod
+    def _norm(x: np.ndarray) -> float:
+        return float(np.sqrt(np.mean(np.square(x))))
+
+    def _step(self):
+        '''
+            Takes one accepted step from the internal state, shrinking the
+            step size until the error estimate is within tolerance. Raises
+            RuntimeError if the error estimate is not finite, or if the step
+            size falls below what the time can resolve, e.g. at a
+            singularity of the solution.
+        '''
+        y, h = self._y, self._h
+        min_step = 10 * np.spacing(abs(self._t))
+        while True:
+            if h < min_step:
+                raise RuntimeError(f"Step size {h:.3g} fell below the resolution of "
+                                   f"time {self._t:.6g}, the solution may be singular")
+            k = np.empty((7,) + np.shape(y), dtype=np.result_type(y, self._f))
+            k[0] = self._f
+            for i in range(1, 6):
+                k[i] = self._evaluate(y + h * np.tensordot(self._A[i], k[:i], axes=1))
+            y_new = y + h * np.tensordot(self._B[:6], k[:6], axes=1)
+            k[6] = self._evaluate(y_new)
+
+            error = h * np.tensordot(self._E, k, axes=1)
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+            error_norm = self._norm(error / scale)
+            if not np.isfinite(error_norm):
+                raise RuntimeError(f"Error estimate is not finite at time {self._t:.6g}, "
+                                   "the state or the RHS holds inf or nan")
+
+            if error_norm <= 1:
+                factor = 10 if error_norm == 0 else min(10, self.safety * error_norm**(-1/5))
+                self.accepted_steps += 1
+                break
+            # rejected, retry with a smaller step
+            self.rejected_steps += 1
+            h = h * max(0.2, self.safety * error_norm**(-1/5))
+
+        self._t_old, self._y_old, self._k = self._t, y, k
+        self._t, self._y, self._f = self._t + h, y_new, k[6]
+        self._h = min(h * factor, self.max_step)
+
+    def dense_output(self, time: float) -> np.ndarray:
+        '''
+            Interpolates the state at a time within the last internal step.
+        '''
+        if self._k is None:
+            return self._y
+        h = self._t - self._t_old
+        x = (time - self._t_old) / h
+        coefficients = np.tensordot(self._P, np.array([x, x**2, x**3, x**4]
+                                                      , dtype=self._P.dtype), axes=1)
+        return self._y_old + h * np.tensordot(coefficients, self._k, axes=1)
+
+    def propagate_state(self, rhs_func: FunctionType
+                       , time: float, state: np.ndarray
+                       , timestep: float) -> tuple:
+        '''
+            method for propagating a newtonian particle over one output
+            interval. If (time, state) equals the previous output, integration
+            continues from the internal step instead of restarting.
+            
+            :param rhsFunc: a function defining the rhs of the EOM, given
+                            the projectile state.
+            :param state: current state of the object to be propagated, passed
+                          to rhsFunc.
+            :param timestep: output interval
+
+            Returns:
+            ---------
+            tuple: (float, np.ndarray)
+        '''
+        if self._output is not None and self._rhs_func is None:
+            # restored by set_state, continue with the RHS of this call
+            self._rhs_func = rhs_func
+        if (self._output is None or rhs_func is not self._rhs_func
+                or time != self._output[0]
+                or not (state is self._output[1]
+                        or np.array_equal(state, self._output[1]))):
+            self._start(rhs_func=rhs_func, time=time
+                        , state=np.asarray(state, dtype=self.dtype))
+
+        target = time + float(timestep)
+        while self._t < target:
+            self._step()
+        state = self.dense_output(target).astype(self._y.dtype, copy=False)
+
+        self._output = (target, state)
+        return target, state
+
+
+class GaussLegendreIntegrator():
+    '''
+        An implicit Gauss-Legendre Runge-Kutta integrator, symplectic for
+        Hamiltonian systems. The stage equations are solved by fixed-point
+        iteration.
+
+        canonical marks that the integrator expects Hamilton's equations in
+        canonical coordinates (q, p), as only then is the flow symplectic;
+        the simulators switch to the Hamiltonian RHS accordingly.
+    '''
+    canonical = True
+    version = 1
+    # Butcher tableaus by number of stages, as (A, b)
+    TABLEAUS = {
+        1: (np.array([[1/2]]), np.array([1.0])),
+        2: (np.array([[1/4, 1/4 - np.sqrt(3)/6],
+                      [1/4 + np.sqrt(3)/6, 1/4]]), np.array([1/2, 1/2]))
+    }
+
+    def __init__(self, stages: int = 2, tol: float|None = None
+                 , max_iterations: int = 100, dtype: type|None = None):
+        '''
+            Parameters:
+            -------------------------
+            stages:         number of stages, 1 (implicit midpoint, order 2)
+                            or 2 (order 4)
+            tol:            convergence tolerance of the fixed-point iteration,
+                            relative to the size of the stage derivatives.
+                            Defaults to a few ulps of the state's dtype. The
+                            iteration also ends once it stops contracting
+                            within sqrt(eps) of the solution, the round-off
+                            floor of the RHS
+            max_iterations: iterations after which the stage equations count
+                            as not converged
+            dtype:          precision of the propagation, see
+                            RungeKuttaIntegrator
+        '''
+        if stages not in self.TABLEAUS:
+            raise ValueError(f"stages must be one of {list(self.TABLEAUS)}")
+        self.stages = stages
+        self.A, self.b = self.TABLEAUS[stages]
+        self.tol = tol
+        self.max_iterations = max_iterations
+        self.dtype = dtype
+
+    def propagate_state(self, rhs_func: FunctionType 
+                       , time: float, state: np.ndarray 
+                       , timestep: float) -> tuple:
+        '''
+            method for propagating a newtonian particle.
+            
+            :param rhsFunc: a function defining the rhs of the EOM, given
+                            the projectile state.
+            :param state: current state of the object to be propagated, passed
+                          to rhsFunc.
+            :param timestep: timestep of propagation
+
+            Returns:
+            ---------
+            tuple: (float, np.ndarray)
+        '''
+        state = np.asarray(state, dtype=self.dtype)
+        timestep = float(timestep)
+        k1 = rhs_func(state)
+        if type(k1) is not np.ndarray:
+            raise TypeError(f"Your RHS function must return a numpy ndarray, yours returned: {type(k1)}")
+        eps = np.finfo(k1.dtype).eps
+        tol = self.tol
+        if tol is None:
+            tol = 8 * eps
+        # the tableau in the working dtype, so no stage is promoted
+        A, b = self.A.astype(k1.dtype), self.b.astype(k1.dtype)
+
+        # stage derivatives, starting from an explicit Euler guess
+        k = np.stack([k1] * self.stages)
+        previous = np.inf
+        for _ in range(self.max_iterations):
+            k_new = np.stack([rhs_func(state + timestep * np.tensordot(a, k, axes=1))
+                              for a in A])
+            change = np.max(np.abs(k_new - k))
+            k = k_new
+            scale = 1 + np.max(np.abs(k))
+            if change <= tol * scale:
+                break
+            # an iteration that stops contracting close to the solution has
+            # reached the round-off of the RHS, which for large states or
+            # stiff stages lies above a few ulps
+            if change >= previous and change <= np.sqrt(eps) * scale:
+                break
+            previous = change
+        else:
+            raise RuntimeError("Stage equations did not converge, reduce the timestep")
+
+        state = state + timestep * np.tensordot(b, k, axes=1)
+        time = time + timestep
+
+        return time, state
+
+
+class ImplicitMidpointIntegrator(GaussLegendreIntegrator):
+    '''
+        The implicit midpoint rule, the one-stage Gauss-Legendre integrator.
+    '''
+    def __init__(self, tol: float|None = None, max_iterations: int = 100
+                 , dtype: type|None = None):
+        super().__init__(stages=1, tol=tol, max_iterations=max_iterations
+                         , dtype=dtype)
+
+
+
+class SplittingIntegrator():
+    '''
+        A symplectic Strang splitting of a Hamiltonian H = T(q, p) + V(q).
+        The potential flow is an exact kick of the momenta, and the kinetic
+        flow, which is not separable for coupled pendula, is taken with the
+        implicit midpoint rule. Both are symplectic, so their composition is.
+
+        The RHS must be Hamilton's equations of a state whose last axis is
+        (q, p), and accept a part keyword: 'kinetic' or 'potential' returns
+        the equations of T or V alone.
+    '''
+    canonical = True
+    version = 1
+    # triple-jump weights raising the order from 2 to 4
+    TRIPLE_JUMP = (1/(2 - 2**(1/3)), 1 - 2/(2 - 2**(1/3)), 1/(2 - 2**(1/3)))
+
+    def __init__(self, order: int = 2, tol: float|None = None
+                 , max_iterations: int = 100, dtype: type|None = None):
+        '''
+            Parameters:
+            -------------------------
+            order:          2, or 4 by triple-jump composition
+            tol:            convergence tolerance of the kinetic flow, see
+                            GaussLegendreIntegrator
+            max_iterations: iteration limit of the kinetic flow
+            dtype:          precision of the propagation, see
+                            RungeKuttaIntegrator
+        '''
+        if order not in [2, 4]:
+            raise ValueError("order must be 2 or 4")
+        self.order = order
+        self.tol = tol
+        self.max_iterations = max_iterations
+        self.dtype = dtype
+        self._kinetic_flow = ImplicitMidpointIntegrator(tol=tol
+                                                        , max_iterations=max_iterations)
+
+    def propagate_state(self, rhs_func: FunctionType 
+                       , time: float, state: np.ndarray 
+                       , timestep: float) -> tuple:
+        '''
+            method for propagating a newtonian particle.
+            
+            :param rhsFunc: a function defining Hamilton's equations, given
+                            the canonical state and the part of H.
+            :param state: current canonical state (q, p), passed to rhsFunc.
+            :param timestep: timestep of propagation
+
+            Returns:
+            ---------
+            tuple: (float, np.ndarray)
+        '''
+        state = np.asarray(state, dtype=self.dtype)
+        kinetic_func = partial(rhs_func, part='kinetic')
+        weights = self.TRIPLE_JUMP if self.order == 4 else (1,)
+        for weight in weights:
+            delta = weight * float(timestep)
+            state = state + delta/2 * rhs_func(state, part='potential')
+            _, state = self._kinetic_flow.propagate_state(rhs_func=kinetic_func
+                                                          , time=time
+                                                          , state=state
+                                                          , timestep=delta)
+            state = state + delta/2 * rhs_func(state, part='potential')
+        time = time + timestep
+
+        return time, state
@@ -0,0 +1,97 @@
+# --------------
+# Compiled kernels fusing the equations of motion with the integrator
+# --------------
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _jit(func):
+    '''
+        Compiles func with numba when it is installed, otherwise returns it
+        unchanged.
+    '''
+    if numba is None:
+        return func
+    return numba.njit(cache=True)(func)
+
+def jit_available() -> bool:
+    '''
+        Whether the compiled kernels are available.
+    '''
+    return numba is not None
+
+
+@_jit
+def double_pendulum_rhs(theta1, theta2, w1, w2
+                        , mass1, mass2, length1, length2):
+    '''
+        Scalar RHS of a double pendulum, as in
+        DoublePendulumSimulation.double_pendulum_dynamics.
+    '''
+    # calculate alphas
+    alpha1 = (length2 / length1 * mass2 / (mass1 + mass2)
+               * np.cos(theta1-theta2) )
+    alpha2 = length1 / length2 * np.cos(theta1-theta2)
+    # calculate fs
+    f1 = (- length2/length1 * mass2/(mass1+mass2)
+          * w2**2 * np.sin(theta1-theta2)
+          - 9.82/length1 * np.sin(theta1)
+            )
+    f2 = (length1/length2 * w1**2 * np.sin(theta1-theta2)
+          - 9.82/length2 * np.sin(theta2)
+            )
+    # calculate gs
+    g1 = (f1 - alpha1*f2) / (1-alpha1*alpha2)
+    g2 = (f2 - alpha2*f1) / (1-alpha1*alpha2)
+
+    return w1, w2, g1, g2
+
+@_jit
+def double_pendulum_rk4(state, properties, start_time, simulation_time, timestep
+                        , times, states):
+    '''
+        Runs the RK4 loop of DoublePendulumSimulation.run_simulation without
+        returning to Python: propagates state from start_time until
+        simulation_time, writing the initial and every following time and
+        state into the preallocated arrays times (capacity,) and
+        states (capacity, 4).
+
+        Returns:
+        ---------
+        int: number of recorded steps, including the initial state
+    '''
+    mass1, mass2, length1, length2 = properties[0], properties[1], properties[2], properties[3]
+    theta1, theta2, w1, w2 = state[0], state[1], state[2], state[3]
+    half = timestep / 2
+
+    time = start_time
+    times[0] = time
+    states[0, 0], states[0, 1], states[0, 2], states[0, 3] = theta1, theta2, w1, w2
+    n = 1
+    while time < simulation_time and n < len(times):
+        a1, a2, a3, a4 = double_pendulum_rhs(theta1, theta2, w1, w2
+                                             , mass1, mass2, length1, length2)
+        b1, b2, b3, b4 = double_pendulum_rhs(theta1 + half*a1, theta2 + half*a2
+                                             , w1 + half*a3, w2 + half*a4
+                                             , mass1, mass2, length1, length2)
+        c1, c2, c3, c4 = double_pendulum_rhs(theta1 + half*b1, theta2 + half*b2
+                                             , w1 + half*b3, w2 + half*b4
+                                             , mass1, mass2, length1, length2)
+        d1, d2, d3, d4 = double_pendulum_rhs(theta1 + timestep*c1, theta2 + timestep*c2
+                                             , w1 + timestep*c3, w2 + timestep*c4
+                                             , mass1, mass2, length1, length2)
+        theta1 = theta1 + timestep/6 * (a1 + 2*b1 + 2*c1 + d1)
+        theta2 = theta2 + timestep/6 * (a2 + 2*b2 + 2*c2 + d2)
+        w1 = w1 + timestep/6 * (a3 + 2*b3 + 2*c3 + d3)
+        w2 = w2 + timestep/6 * (a4 + 2*b4 + 2*c4 + d4)
+        time = time + timestep
+
+        times[n] = time
+        states[n, 0], states[n, 1], states[n, 2], states[n, 3] = theta1, theta2, w1, w2
+        n += 1
+
+    return n
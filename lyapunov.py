@@ -0,0 +1,276 @@
+# --------------
+# Lyapunov exponents from the variational equations, integrated with the state
+# --------------
+import time as timer
+import numpy as np
+from types import MethodType, FunctionType
+
+from simulator import DoublePendulumSimulation
+from integrations import RungeKuttaIntegrator
+from helper import SharedBatchPool
+
+# imaginary step of the complex-step derivatives. There is no subtraction
+# in the derivative, so it can be far below the resolution of the state.
+COMPLEX_STEP = 1e-20
+
+
+def tangent_rhs(func: FunctionType, step: float = COMPLEX_STEP) -> FunctionType:
+    '''
+        Extends the RHS func of states (..., d) to the RHS of extended states
+        (..., 1+k, d): the state followed by k tangent vectors. The tangents
+        move with the Jacobian J of func, dv/dt = J v, evaluated as complex
+        step derivatives Im(func(x + i h v)) / h, exact to round-off and
+        without forming J. The state moves with the real part of the same
+        evaluation, so func is called once per stage, on complex (..., k, d)
+        states; it must therefore be analytic and keep the dtype of its
+        state, as the RHS of the simulators do. Keyword arguments, e.g. the
+        part of splitting integrators, are passed on.
+    '''
+    def rhs(extended, **kwargs):
+        perturbed = extended[..., :1, :] + 1j * step * extended[..., 1:, :]
+        derivative = func(perturbed, **kwargs)
+        return np.concatenate([derivative[..., :1, :].real
+                               , derivative.imag / step], axis=-2)
+    return rhs
+
+def orthonormalize(tangents: np.ndarray):
+    '''
+        Gram-Schmidt orthonormalization, by QR decomposition, of the tangent
+        vectors (..., k, d) of all members at once.
+
+        Returns:
+        ---------
+        tuple: (orthonormal tangents (..., k, d), log of their stretch (..., k))
+    '''
+    q, r = np.linalg.qr(np.swapaxes(tangents, -1, -2))
+    stretch = np.abs(np.diagonal(r, axis1=-2, axis2=-1))
+    return (np.swapaxes(q, -1, -2)
+            , np.log(np.maximum(stretch, np.finfo(tangents.dtype).tiny)))
+
+
+class LyapunovSpectrum():
+    '''
+        Estimates the largest Lyapunov exponents of pendula by integrating
+        the variational (tangent linear) equations alongside the state, see
+        tangent_rhs, instead of twin runs from perturbed initial conditions.
+        Every renormalize_steps steps the tangents are orthonormalized and
+        the logs of their stretch summed, so the exponents after time T are
+        the sums over T. With as many exponents as state dimensions this is
+        the full spectrum, which for conservative pendula comes in pairs of
+        opposite sign.
+
+        Works for any simulator with equations_of_motion, i.e.
+        DoublePendulumSimulation and PendulumChainSimulation, and for every
+        integrator; the structure-preserving ones integrate the tangents of
+        the canonical state, which have the same exponents. Implicit
+        integrators iterate the tangent stages with the state. States have
+        any number of leading (ensemble) axes, members are independent.
+    '''
+    def __init__(self, simulation=None
+                 , n_exponents: int = 1
+                 , renormalize_steps: int = 10
+                 , dtype: type = np.float64
+                 , seed: int = 0):
+        '''
+            Parameters:
+            -------------------------
+            simulation:        simulator providing the equations of motion,
+                               DoublePendulumSimulation() by default
+            n_exponents:       number of exponents, from the largest down
+            renormalize_steps: steps between orthonormalizations
+            dtype:             precision of the integration
+            seed:              seed of the random initial tangents
+        '''
+        self.simulation = DoublePendulumSimulation() if simulation is None else simulation
+        self.n_exponents = n_exponents
+        self.renormalize_steps = renormalize_steps
+        self.dtype = np.dtype(dtype)
+        self.seed = seed
+
+    def initial_tangents(self, shape: tuple) -> np.ndarray:
+        '''
+            Random orthonormal tangents for states of the given shape,
+            the same for every member. Random tangents have a component along
+            the most unstable directions, unlike the coordinate axes.
+        '''
+        dimension = shape[-1]
+        if not 1 <= self.n_exponents <= dimension:
+            raise ValueError(f"n_exponents must be between 1 and {dimension}")
+        rng = np.random.default_rng(seed=self.seed)
+        tangents, _ = orthonormalize(rng.standard_normal((self.n_exponents, dimension)))
+        return np.broadcast_to(tangents, shape[:-1] + tangents.shape).astype(self.dtype)
+
+    def run(self, initial_states: np.ndarray
+            , properties: np.ndarray
+            , propagator: MethodType|FunctionType
+            , simulation_time: float|int
+            , timestep: float):
+        '''
+            Integrates the states and their tangents. The running estimates
+            after every renormalization are stored in self.time (R,) and
+            self.history (R, ..., n_exponents).
+
+            Parameters:
+            ----------------
+            initial_states:  states (..., d) in velocity form, e.g. (theta1,
+                             theta2, w1, w2) of double pendula
+            properties:      matching properties, (..., d) or (d,)
+            propagator:      an integrator method
+            simulation_time: duration of the integration
+            timestep:        timestep of propagation
+
+            Returns:
+            ---------
+            np.ndarray: exponents (..., n_exponents), in the order of the
+                        orthonormalization, which converges to descending
+        '''
+        state = np.array(initial_states, dtype=self.dtype)
+        properties = np.array(properties, dtype=self.dtype)
+        tangents = self.initial_tangents(state.shape)
+
+        # a length 1 axis in front of the state dimension broadcasts the
+        # properties over the tangents
+        func, state, canonical = self.simulation.equations_of_motion(
+            propagator=propagator, state=state[..., None, :]
+            , properties=properties[..., None, :])
+        rhs = tangent_rhs(func)
+        extended = np.concatenate([state, tangents], axis=-2)
+
+        log_stretch = np.zeros(tangents.shape[:-1], dtype=self.dtype)
+        times, history = [], []
+        time, steps = 0, 0
+        while time < simulation_time:
+            time, extended = propagator(rhs_func=rhs, time=time
+                                        , state=extended, timestep=timestep)
+            steps += 1
+            if steps % self.renormalize_steps == 0 or time >= simulation_time:
+                tangents, stretch = orthonormalize(extended[..., 1:, :])
+                log_stretch += stretch
+                extended = np.concatenate([extended[..., :1, :], tangents], axis=-2)
+                times.append(time)
+                history.append(log_stretch / time)
+
+        self.time = np.array(times)
+        self.history = np.array(history)
+        state = extended[..., 0, :]
+        self.final_states = (self.simulation.momentum_to_velocity(state, properties)
+                             if canonical else state)
+        self.exponents = log_stretch / time
+        return self.exponents
+
+
+def _lyapunov_rows(image: np.ndarray, theta1: np.ndarray, theta2: np.ndarray
+                   , rows: slice, properties: np.ndarray
+                   , simulation_time: float, timestep: float
+                   , renormalize_steps: int, dtype: type):
+    '''
+        Computes the largest exponent of the pixels in the given rows of the
+        map as a single ensemble, and writes them into image.
+
+        Returns:
+        ---------
+        int: number of pixels computed
+    '''
+    state = np.zeros((rows.stop - rows.start, len(theta1), 4))
+    state[..., 0] = theta1[None, :]
+    state[..., 1] = theta2[rows, None]
+    spectrum = LyapunovSpectrum(renormalize_steps=renormalize_steps, dtype=dtype)
+    exponents = spectrum.run(initial_states=state, properties=properties
+                             , propagator=RungeKuttaIntegrator().propagate_state
+                             , simulation_time=simulation_time, timestep=timestep)
+    image[rows] = exponents[..., 0]
+    return exponents[..., 0].size
+
+
+class LyapunovMap():
+    '''
+        Computes the largest Lyapunov exponent of a double pendulum, released
+        at rest, over a theta1 x theta2 grid, the companion of FlipTimeMap.
+        Regular motion has exponents that decay towards zero as 1/max_time,
+        chaotic motion keeps them positive.
+    '''
+    def __init__(self, resolution: int = 128
+                 , properties: np.ndarray|list = (1, 1, 1, 1)
+                 , simulation_time: float|int = 20
+                 , timestep: float = 0.01
+                 , theta_range: tuple = (-np.pi, np.pi)
+                 , rows_per_batch: int = 16
+                 , renormalize_steps: int = 10
+                 , workers: int|None = None
+                 , dtype: type = np.float64):
+        '''
+            Parameters:
+            -------------------------
+            resolution:        number of pixels along each axis
+            properties:        (mass1, mass2, length1, length2)
+            simulation_time:   time over which the exponents are averaged
+            timestep:          timestep of propagation
+            theta_range:       range of both initial angles
+            rows_per_batch:    rows of pixels integrated together
+            renormalize_steps: steps between orthonormalizations
+            workers:           size of the process pool, 0 computes in this
+                               process
+            dtype:             precision of the integration
+        '''
+        self.resolution = resolution
+        self.properties = np.array(properties, dtype=dtype)
+        self.simulation_time = simulation_time
+        self.timestep = timestep
+        self.rows_per_batch = rows_per_batch
+        self.renormalize_steps = renormalize_steps
+        self.workers = workers
+        self.dtype = dtype
+        # theta1 varies along columns, theta2 along rows
+        self.theta1 = np.linspace(*theta_range, resolution)
+        self.theta2 = np.linspace(*theta_range, resolution)
+
+    def compute(self):
+        '''
+            Computes the map. The throughput is stored in
+            self.pixels_per_second.
+
+            Returns:
+            ---------
+            np.ndarray: largest exponents, shape (resolution, resolution)
+        '''
+        batch_kwargs = {row: {'theta1': self.theta1, 'theta2': self.theta2
+                              , 'rows': slice(row, min(row+self.rows_per_batch, self.resolution))
+                              , 'properties': self.properties
+                              , 'simulation_time': self.simulation_time
+                              , 'timestep': self.timestep
+                              , 'renormalize_steps': self.renormalize_steps
+                              , 'dtype': self.dtype}
+                        for row in range(0, self.resolution, self.rows_per_batch)}
+        start = timer.perf_counter()
+        with SharedBatchPool(shape=(self.resolution, self.resolution)
+                             , workers=self.workers, fill=np.nan) as pool:
+            pixels = sum(n for _, n in pool.run(_lyapunov_rows, batch_kwargs))
+            result = pool.array.copy()
+        self.pixels_per_second = pixels / (timer.perf_counter() - start)
+        return result
+
+
+if __name__ == '__main__':
+
+    # the full spectrum of a chaotic and a regular double pendulum
+    spectrum = LyapunovSpectrum(n_exponents=4)
+    exponents = spectrum.run(initial_states=[(2.5, 2.5, 0, 0), (0.1, 0.1, 0, 0)]
+                             , properties=[1, 1, 1, 1]
+                             , propagator=RungeKuttaIntegrator().propagate_state
+                             , simulation_time=50, timestep=0.01)
+    for name, row in zip(['chaotic', 'regular'], exponents):
+        print(f"{name:<8s} exponents {np.array2string(row, precision=3)}"
+              f", sum {np.sum(row):.1e}")
+
+    lyapunov_map = LyapunovMap(resolution=64, simulation_time=20)
+    image = lyapunov_map.compute()
+    print(f"{lyapunov_map.resolution**2} pixels at"
+          f" {lyapunov_map.pixels_per_second:.0f} pixels/s")
+
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    ax.imshow(image, origin='lower', cmap='magma'
+              , extent=[-np.pi, np.pi, -np.pi, np.pi])
+    ax.set_xlabel('theta1')
+    ax.set_ylabel('theta2')
+    plt.show()
@@ -5,7 +5,9 @@ import numpy as np
 from functools import partial
 
 from helper import calculate_angle
+from helper import calculate_angles
 calculate_angle = partial(calculate_angle, offset= -np.pi/2)
+calculate_angles = partial(calculate_angles, offset= -np.pi/2)
 
 class Pendulum():
     '''
@@ -13,12 +15,12 @@ class Pendulum():
     '''
     def __init__(self, mass: float|int = 1
                  , length: float|int = 1
-                 , origin: np.ndarray|list = np.array([0,0], dtype=np.float32)):
+                 , origin: np.ndarray|list = np.array([0,0], dtype=np.float64)):
 
         self.mass = mass
         self.length = length
         if origin is list:
-            self.origin = np.array(origin, dtype=np.float32)
+            self.origin = np.array(origin, dtype=np.float64)
         else:
             self.origin = origin
 
@@ -76,7 +78,7 @@ class Pendulum():
         '''
 
         if type(origin) is list:
-            self.origin = np.array(origin, dtype=np.float32)
+            self.origin = np.array(origin, dtype=np.float64)
         else:
             self.origin = origin
 
@@ -155,6 +157,553 @@ class DoublePendulum():
         '''
         return (self.pendulum1.calculate_mechanical_energy()
                 + self.pendulum2.calculate_mechanical_energy() )
+
+
+class PendulumChain():
+    '''
+        A chain of N pendulum objects, each hanging from the bob of the
+        previous one, e.g. a triple pendulum for N=3.
+    '''
+    def __init__(self, pendula: list|tuple):
+
+        if len(pendula) < 1:
+            raise ValueError("a chain needs at least one pendulum")
+        self.pendula = list(pendula)
+
+    def __len__(self):
+        return len(self.pendula)
+
+    @property
+    def properties(self) -> np.ndarray:
+        '''
+            (mass1, ..., massN, length1, ..., lengthN)
+        '''
+        return np.array([pendulum.mass for pendulum in self.pendula]
+                        + [pendulum.length for pendulum in self.pendula]
+                        , dtype=np.float64)
+
+    @property
+    def state(self) -> np.ndarray:
+        '''
+            (theta1, ..., thetaN, w1, ..., wN)
+        '''
+        return np.array([pendulum.theta for pendulum in self.pendula]
+                        + [pendulum.w for pendulum in self.pendula])
+
+    def set_chain(self, theta: np.ndarray|list, w: np.ndarray|list):
+        '''
+            Sets all pendula from the top down, each hanging from the
+            previous bob and moving with it.
+
+            Parameters:
+            ----------------
+            theta:  angles of the pendula, top first
+            w:      angular velocities of the pendula, top first
+        '''
+        if len(theta) != len(self.pendula) or len(w) != len(self.pendula):
+            raise ValueError(f"theta and w must have {len(self.pendula)} values")
+        vx, vy = 0, 0
+        for i, pendulum in enumerate(self.pendula):
+            if i > 0:
+                previous = self.pendula[i-1]
+                pendulum.set_origin([previous.x, previous.y])
+            pendulum.set_angle(theta=theta[i])
+            pendulum.set_angular_velocity(w=w[i], set_cart=False)
+            vx = vx + pendulum.length * pendulum.w * np.cos(pendulum.theta)
+            vy = vy + pendulum.length * pendulum.w * np.sin(pendulum.theta)
+            pendulum.vx, pendulum.vy = vx, vy
+
+    def calculate_kinetic_energy(self):
+        '''
+            Calculates the kinetic energy of the chain
+        '''
+        return sum(pendulum.calculate_kinetic_energy() for pendulum in self.pendula)
+
+    def calculate_potential_energy(self):
+        '''
+            Calculates the potential energy of the chain
+        '''
+        return sum(pendulum.calculate_potential_energy() for pendulum in self.pendula)
+
+    def calculate_mechanical_energy(self):
+        '''
+            Calculates the mechanical energy of the chain
+        '''
+        return self.calculate_kinetic_energy() + self.calculate_potential_energy()
+
+
+class DoublePendulumEnsemble():
+    '''
+        The states of N double pendula in a few contiguous arrays, instead of
+        2N Pendulum objects: state (N, 4) with rows (theta1, theta2, w1, w2),
+        properties (N, 4) with rows (mass1, mass2, length1, length2), and
+        origin (2, N), the hang-points of the upper pendula. state is laid
+        out as the vectorized integrators and DoublePendulumEnsembleSimulation
+        expect it, so it can be propagated in place. Cartesian coordinates
+        are not stored, but computed from the state when needed.
+
+        Indexing gives a DoublePendulumView of one member, with the API of
+        DoublePendulum, e.g. for DoublePendulumSimulation or the animations.
+    '''
+    def __init__(self, size: int
+                 , properties: np.ndarray|list = (1, 1, 1, 1)
+                 , origin: np.ndarray|list = (0, 0)
+                 , dtype: type = np.float64):
+        '''
+            Parameters:
+            -------------------------
+            size:       number of double pendula, all at rest hanging down
+            properties: (mass1, mass2, length1, length2), shape (4,) or (N, 4)
+            origin:     hang-point, shape (2,) or (2, N)
+            dtype:      precision of the arrays
+        '''
+        self.state = np.zeros((size, 4), dtype=dtype)
+        self.properties = np.empty((size, 4), dtype=dtype)
+        self.properties[:] = properties
+        self.origin = np.empty((2, size), dtype=dtype)
+        self.origin[:] = np.reshape(origin, (2, -1))
+
+    @classmethod
+    def from_double_pendula(cls, double_pendula: list|tuple
+                            , dtype: type = np.float64):
+        '''
+            Copies the states of DoublePendulum objects into a new ensemble.
+        '''
+        ensemble = cls(len(double_pendula), dtype=dtype)
+        for member, double_pendulum in zip(ensemble, double_pendula):
+            pendulum1, pendulum2 = double_pendulum.pendulum1, double_pendulum.pendulum2
+            member.pendulum1.set_origin(pendulum1.origin)
+            member.pendulum1.set_properties(mass=pendulum1.mass, length=pendulum1.length)
+            member.pendulum2.set_properties(mass=pendulum2.mass, length=pendulum2.length)
+            member.set_double_pendulum(theta1=pendulum1.theta, w1=pendulum1.w
+                                       , theta2=pendulum2.theta, w2=pendulum2.w)
+        return ensemble
+
+    def __len__(self):
+        return len(self.state)
+
+    def __getitem__(self, index: int):
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"index {index} out of range for {len(self)} members")
+        return DoublePendulumView(self, index % len(self))
+
+    def __iter__(self):
+        return (DoublePendulumView(self, index) for index in range(len(self)))
+
+    @property
+    def theta1(self) -> np.ndarray:
+        return self.state[:, 0]
+
+    @property
+    def theta2(self) -> np.ndarray:
+        return self.state[:, 1]
+
+    @property
+    def w1(self) -> np.ndarray:
+        return self.state[:, 2]
+
+    @property
+    def w2(self) -> np.ndarray:
+        return self.state[:, 3]
+
+    def calculate_positions(self, index: int|slice = slice(None)):
+        '''
+            Cartesian coordinates of the selected members.
+
+            Returns:
+            ---------
+            tuple: (x1, y1, x2, y2)
+        '''
+        state, properties = self.state[index], self.properties[index]
+        return calculate_double_pendulum_positions(
+            theta1=state[..., 0], theta2=state[..., 1]
+            , length1=properties[..., 2], length2=properties[..., 3]
+            , origin=self.origin[:, index])
+
+    def calculate_velocities(self, index: int|slice = slice(None)):
+        '''
+            Cartesian velocities of the selected members.
+
+            Returns:
+            ---------
+            tuple: (vx1, vy1, vx2, vy2)
+        '''
+        state, properties = self.state[index], self.properties[index]
+        return calculate_double_pendulum_velocities(
+            theta1=state[..., 0], theta2=state[..., 1]
+            , w1=state[..., 2], w2=state[..., 3]
+            , length1=properties[..., 2], length2=properties[..., 3])
+
+    def calculate_energy(self, index: int|slice = slice(None)):
+        '''
+            Kinetic and potential energy of the selected members.
+
+            Returns:
+            ---------
+            tuple: (kinetic energy, potential energy)
+        '''
+        state = self.state[index]
+        return calculate_double_pendulum_energy(
+            state[..., 0], state[..., 1], state[..., 2], state[..., 3]
+            , properties=self.properties[index], origin=self.origin[:, index])
+
+    def calculate_mechanical_energy(self) -> np.ndarray:
+        '''
+            Calculates the mechanical energy of every member
+        '''
+        kinetic, potential = self.calculate_energy()
+        return kinetic + potential
+
+
+class PendulumView():
+    '''
+        One pendulum of a member of a DoublePendulumEnsemble, with the API
+        of Pendulum. Reads and writes go to the arrays of the ensemble. The
+        lower pendulum hangs from the bob of the upper one and moves with
+        it, as set by DoublePendulum.set_double_pendulum.
+    '''
+    __slots__ = ('ensemble', 'index', 'arm')
+
+    def __init__(self, ensemble: DoublePendulumEnsemble, index: int, arm: int):
+        self.ensemble = ensemble
+        self.index = index
+        # 0 for the upper pendulum, 1 for the lower one
+        self.arm = arm
+
+    @property
+    def theta(self):
+        return self.ensemble.state[self.index, self.arm]
+
+    @theta.setter
+    def theta(self, theta: float|int):
+        self.ensemble.state[self.index, self.arm] = theta
+
+    @property
+    def w(self):
+        return self.ensemble.state[self.index, 2 + self.arm]
+
+    @w.setter
+    def w(self, w: float|int):
+        self.ensemble.state[self.index, 2 + self.arm] = w
+
+    @property
+    def mass(self):
+        return self.ensemble.properties[self.index, self.arm]
+
+    @mass.setter
+    def mass(self, mass: float|int):
+        self.ensemble.properties[self.index, self.arm] = mass
+
+    @property
+    def length(self):
+        return self.ensemble.properties[self.index, 2 + self.arm]
+
+    @length.setter
+    def length(self, length: float|int):
+        self.ensemble.properties[self.index, 2 + self.arm] = length
+
+    @property
+    def origin(self) -> np.ndarray:
+        if self.arm == 0:
+            return self.ensemble.origin[:, self.index].copy()
+        x1, y1, _, _ = self.ensemble.calculate_positions(self.index)
+        return np.array([x1, y1])
+
+    @property
+    def x(self):
+        return self.ensemble.calculate_positions(self.index)[2*self.arm]
+
+    @property
+    def y(self):
+        return self.ensemble.calculate_positions(self.index)[2*self.arm + 1]
+
+    @property
+    def vx(self):
+        return self.ensemble.calculate_velocities(self.index)[2*self.arm]
+
+    @property
+    def vy(self):
+        return self.ensemble.calculate_velocities(self.index)[2*self.arm + 1]
+
+    def set_angle(self, theta: float|int):
+        '''
+            Set pendulum angle, starting from negative y-axis.
+        '''
+        self.theta = theta
+
+    def set_angular_velocity(self, w: float|int, set_cart: bool = True):
+        '''
+            Set angular velocity. The cartesian velocity always follows it,
+            so set_cart only exists for the API of Pendulum.
+        '''
+        self.w = w
+
+    def set_properties(self, mass: int|float, length: int|float):
+        '''
+            Sets pendulum properties
+        '''
+        self.mass = mass
+        self.length = length
+
+    def set_origin(self, origin: np.ndarray|list):
+        '''
+            Sets the hang-point of an upper pendulum
+        '''
+        if self.arm != 0:
+            raise ValueError("the lower pendulum hangs from the bob of the upper one")
+        self.ensemble.origin[:, self.index] = origin
+
+    def calculate_kinetic_energy(self):
+        '''
+            Calculates the kinetic energy of the pendulum
+        '''
+        return 1/2 * self.mass * (self.vx**2 + self.vy**2)
+
+    def calculate_potential_energy(self):
+        '''
+            Calculates the potential energy of the pendulum
+        '''
+        return 9.82 * self.mass * self.y
+
+    def calculate_mechanical_energy(self):
+        '''
+            Calculates the mechanical energy
+        '''
+        return self.calculate_kinetic_energy() + self.calculate_potential_energy()
+
+
+class DoublePendulumView():
+    '''
+        One member of a DoublePendulumEnsemble, with the API of
+        DoublePendulum.
+    '''
+    __slots__ = ('ensemble', 'index')
+
+    def __init__(self, ensemble: DoublePendulumEnsemble, index: int):
+        self.ensemble = ensemble
+        self.index = index
+
+    @property
+    def pendulum1(self) -> PendulumView:
+        return PendulumView(self.ensemble, self.index, 0)
+
+    @property
+    def pendulum2(self) -> PendulumView:
+        return PendulumView(self.ensemble, self.index, 1)
+
+    def set_double_pendulum(self, theta1: float|int, w1: float|int
+                            , theta2: float|int, w2: float|int):
+        '''
+            Sets the state of the member
+
+            Parameters:
+            ----------------
+            theta1:  upper pendulum angle
+            w1:      upper pendulum angular velocity
+            theta2:  lower pendulum angle
+            w2:      lower pendulum angular velocity
+        '''
+        self.ensemble.state[self.index] = theta1, theta2, w1, w2
+
+    def calculate_kinetic_energy(self):
+        '''
+            Calculates the kinetic energy of the double pendulum
+        '''
+        return self.ensemble.calculate_energy(self.index)[0]
+
+    def calculate_potential_energy(self):
+        '''
+            Calculates the potential energy of the double pendulum
+        '''
+        return self.ensemble.calculate_energy(self.index)[1]
+
+    def calculate_mechanical_energy(self):
+        '''
+            Calculates the mechanical energy of the double pendulum
+        '''
+        return sum(self.ensemble.calculate_energy(self.index))
+
+
+def calculate_double_pendulum_positions(theta1: np.ndarray, theta2: np.ndarray
+                                        , length1: np.ndarray|float
+                                        , length2: np.ndarray|float
+                                        , origin: np.ndarray|list = (0, 0)):
+    '''
+        Calculates the cartesian coordinates of both pendula from their angles,
+        for arrays of any (broadcastable) shape, e.g. (T,) or (T, N).
+
+        Parameters:
+        ----------------
+        theta1:  upper pendulum angles
+        theta2:  lower pendulum angles
+        length1: upper pendulum length(s)
+        length2: lower pendulum length(s)
+        origin:  hang-point of the upper pendulum
+
+        Returns:
+        ---------
+        tuple: (x1, y1, x2, y2)
+    '''
+    x1 = length1 * np.sin(theta1) + origin[0]
+    y1 = - length1 * np.cos(theta1) + origin[1]
+    x2 = x1 + length2 * np.sin(theta2)
+    y2 = y1 - length2 * np.cos(theta2)
+
+    return x1, y1, x2, y2
+
+def calculate_double_pendulum_angles(x1: np.ndarray, y1: np.ndarray
+                                     , x2: np.ndarray, y2: np.ndarray
+                                     , origin: np.ndarray|list = (0, 0)):
+    '''
+        Calculates the angles of both pendula from their cartesian
+        coordinates, e.g. of tracked experimental data, the inverse of
+        calculate_double_pendulum_positions up to multiples of 2*pi.
+
+        Returns:
+        ---------
+        tuple: (theta1, theta2, undefined), angles in [pi/2, 5*pi/2), or 0
+               for a bob straight below its hang-point, and a mask of the
+               points where a bob sits on its hang-point
+    '''
+    theta1, undefined1 = calculate_angles(np.subtract(x1, origin[0])
+                                          , np.subtract(y1, origin[1]))
+    theta2, undefined2 = calculate_angles(np.subtract(x2, x1), np.subtract(y2, y1))
+    return theta1, theta2, undefined1 | undefined2
+
+def calculate_double_pendulum_velocities(theta1: np.ndarray, theta2: np.ndarray
+                                         , w1: np.ndarray, w2: np.ndarray
+                                         , length1: np.ndarray|float
+                                         , length2: np.ndarray|float):
+    '''
+        Calculates the cartesian velocities of both pendula from their angles
+        and angular velocities, for arrays of any (broadcastable) shape, with
+        the conventions of DoublePendulum.set_double_pendulum.
+
+        Parameters:
+        ----------------
+        theta1:  upper pendulum angles
+        theta2:  lower pendulum angles
+        w1:      upper pendulum angular velocities
+        w2:      lower pendulum angular velocities
+        length1: upper pendulum length(s)
+        length2: lower pendulum length(s)
+
+        Returns:
+        ---------
+        tuple: (vx1, vy1, vx2, vy2)
+    '''
+    vx1 = length1 * w1 * np.cos(theta1)
+    vy1 = length1 * w1 * np.sin(theta1)
+    vx2 = vx1 + length2 * w2 * np.cos(theta2)
+    vy2 = vy1 + length2 * w2 * np.sin(theta2)
+
+    return vx1, vy1, vx2, vy2
+
+def calculate_double_pendulum_energy(theta1: np.ndarray, theta2: np.ndarray
+                                     , w1: np.ndarray, w2: np.ndarray
+                                     , properties: np.ndarray|list
+                                     , origin: np.ndarray|list = (0, 0)):
+    '''
+        Calculates the kinetic and potential energy of a double pendulum for
+        whole trajectories, with the conventions of
+        DoublePendulum.calculate_kinetic_energy and calculate_potential_energy.
+
+        Parameters:
+        ----------------
+        theta1, theta2, w1, w2: state arrays, e.g. of shape (T,) or (T, N)
+        properties:             (mass1, mass2, length1, length2), shape (4,)
+                                or (N, 4) for an ensemble
+        origin:                 hang-point of the upper pendulum
+
+        Returns:
+        ---------
+        tuple: (kinetic energy, potential energy)
+    '''
+    properties = np.asarray(properties)
+    mass1, mass2 = properties[..., 0], properties[..., 1]
+    length1, length2 = properties[..., 2], properties[..., 3]
+
+    x1, y1, x2, y2 = calculate_double_pendulum_positions(
+        theta1=theta1, theta2=theta2, length1=length1, length2=length2
+        , origin=origin)
+    vx1, vy1, vx2, vy2 = calculate_double_pendulum_velocities(
+        theta1=theta1, theta2=theta2, w1=w1, w2=w2
+        , length1=length1, length2=length2)
+
+    kinetic_energy = 1/2 * (mass1 * (vx1**2 + vy1**2) + mass2 * (vx2**2 + vy2**2))
+    potential_energy = 9.82 * (mass1 * y1 + mass2 * y2)
+
+    return kinetic_energy, potential_energy
+
+
+def calculate_chain_positions(theta: np.ndarray, lengths: np.ndarray
+                              , origin: np.ndarray|list = (0, 0)):
+    '''
+        Calculates the cartesian coordinates of the bobs of N-link chains,
+        the generalization of calculate_double_pendulum_positions.
+
+        Parameters:
+        ----------------
+        theta:   angles, with the links along the last axis, e.g. (T, N)
+        lengths: lengths of the links, shape (N,) or broadcastable to theta
+        origin:  hang-point of the top pendulum
+
+        Returns:
+        ---------
+        tuple: (x, y), shaped like theta
+    '''
+    x = np.cumsum(lengths * np.sin(theta), axis=-1) + origin[0]
+    y = - np.cumsum(lengths * np.cos(theta), axis=-1) + origin[1]
+    return x, y
+
+def calculate_chain_mass_matrix(theta: np.ndarray, properties: np.ndarray):
+    '''
+        Assembles the mass matrix M of N-link chains, where the kinetic
+        energy is w.M.w / 2, for any number of leading (ensemble) axes.
+        Entry (i, j) is the mass hanging at or below links i and j, times
+        l_i l_j cos(theta_i - theta_j).
+
+        Parameters:
+        ----------------
+        theta:      angles, shape (..., N)
+        properties: (mass1, ..., massN, length1, ..., lengthN), shape (..., 2N)
+
+        Returns:
+        ---------
+        tuple: (M, S, tail), the mass matrix (..., N, N), the matching
+               matrix S with sin in place of cos, whose products with the
+               squared angular velocities give the centripetal coupling, and
+               the masses at or below each link (..., N)
+    '''
+    properties = np.asarray(properties)
+    n = properties.shape[-1] // 2
+    masses, lengths = properties[..., :n], properties[..., n:]
+    tail = np.flip(np.cumsum(np.flip(masses, axis=-1), axis=-1), axis=-1)
+    # mass at or below both links: the tail mass of the lower one
+    below = np.maximum.outer(np.arange(n), np.arange(n))
+    scale = tail[..., below] * lengths[..., :, None] * lengths[..., None, :]
+    difference = theta[..., :, None] - theta[..., None, :]
+    return scale * np.cos(difference), scale * np.sin(difference), tail
+
+def calculate_chain_energy(theta: np.ndarray, w: np.ndarray
+                           , properties: np.ndarray
+                           , origin: np.ndarray|list = (0, 0)):
+    '''
+        Calculates the kinetic and potential energy of N-link chains, with
+        the conventions of calculate_double_pendulum_energy.
+
+        Returns:
+        ---------
+        tuple: (kinetic energy, potential energy), shaped like theta[..., 0]
+    '''
+    properties = np.asarray(properties)
+    n = properties.shape[-1] // 2
+    mass_matrix, _, _ = calculate_chain_mass_matrix(theta, properties)
+    kinetic_energy = 1/2 * np.einsum('...i,...ij,...j->...', w, mass_matrix, w)
+    _, y = calculate_chain_positions(theta, properties[..., n:], origin=origin)
+    potential_energy = 9.82 * np.sum(properties[..., :n] * y, axis=-1)
+    return kinetic_energy, potential_energy
+
     
 if __name__ == '__main__':
     # instantiate the two pendula making up the double pendulum
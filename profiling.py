@@ -0,0 +1,110 @@
+# --------------
+# Per-phase profiling of simulation runs
+# --------------
+import time as timer
+import numpy as np
+
+
+class SimulationProfiler():
+    '''
+        Timers and counters for the phases of a simulation run. Pass one to
+        run_simulation as profiler; the simulator then wraps its propagator,
+        RHS, state resets and result appends with timed versions. Without a
+        profiler nothing is wrapped, so a plain run pays nothing.
+
+        Phases:
+        -------------------------
+        run:        the whole run
+        propagate:  propagator calls, one per step, including the RHS
+        rhs:        RHS evaluations
+        set_state:  resetting the (double) pendulum to the new state
+        append:     recording results
+        callback:   the step callback, if any
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        '''
+            Clears all timers and counters.
+        '''
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self._integrator_counts = {}
+
+    def timed(self, phase: str, func):
+        '''
+            Wraps func to add its time and calls to phase.
+        '''
+        seconds, calls = self.seconds, self.calls
+        seconds.setdefault(phase, 0.0)
+        calls.setdefault(phase, 0)
+        clock = timer.perf_counter
+
+        def timed_func(*args, **kwargs):
+            start = clock()
+            result = func(*args, **kwargs)
+            seconds[phase] += clock() - start
+            calls[phase] += 1
+            return result
+        return timed_func
+
+    def count(self, name: str, value: int = 1):
+        '''
+            Adds value to a counter.
+        '''
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def start(self, propagator):
+        '''
+            Marks the start of a run, noting the counters of an adaptive
+            integrator, e.g. DormandPrinceIntegrator.rejected_steps.
+        '''
+        integrator = getattr(propagator, '__self__', None)
+        self._integrator_counts = {name: getattr(integrator, name)
+                                   for name in ['accepted_steps', 'rejected_steps']
+                                   if hasattr(integrator, name)}
+        self._integrator = integrator
+        self._start = timer.perf_counter()
+
+    def stop(self, buffers: list|tuple = ()):
+        '''
+            Marks the end of a run, counting the bytes recorded in buffers.
+        '''
+        self.seconds['run'] = self.seconds.get('run', 0.0) + timer.perf_counter() - self._start
+        self.calls['run'] = self.calls.get('run', 0) + 1
+        for name, value in self._integrator_counts.items():
+            self.count(name, getattr(self._integrator, name) - value)
+        self.count('bytes_appended', sum(buffer.data.nbytes for buffer in buffers))
+
+    def summary(self) -> dict:
+        '''
+            Seconds and calls per phase, the propagator overhead (propagate
+            time not spent in the RHS) and the counters.
+        '''
+        summary = {'seconds': dict(self.seconds)
+                   , 'calls': dict(self.calls)
+                   , 'counters': dict(self.counters)}
+        if 'propagate' in self.seconds:
+            summary['counters'].setdefault('steps', self.calls['propagate'])
+            summary['seconds']['propagator_overhead'] = (self.seconds['propagate']
+                                                         - self.seconds.get('rhs', 0.0))
+        if 'rhs' in self.calls:
+            summary['counters'].setdefault('rhs_calls', self.calls['rhs'])
+        return summary
+
+    def report(self) -> str:
+        '''
+            The summary as a table, phases sorted by time.
+        '''
+        summary = self.summary()
+        total = summary['seconds'].get('run', np.nan)
+        lines = [f"{'phase':<20s} {'seconds':>10s} {'share':>7s} {'calls':>10s}"]
+        for phase, seconds in sorted(summary['seconds'].items()
+                                     , key=lambda item: -item[1]):
+            calls = summary['calls'].get(phase, '')
+            lines.append(f"{phase:<20s} {seconds:10.4f} {seconds/total:7.1%} {calls:>10}")
+        for name, value in summary['counters'].items():
+            lines.append(f"{name:<20s} {value:>10}")
+        return '\n'.join(lines)
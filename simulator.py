@@ -1,53 +1,109 @@
 import numpy as np
+import warnings
 from functools import partial
 
 from types import MethodType, FunctionType
 
 from pendulum import Pendulum
 from pendulum import DoublePendulum
+from pendulum import PendulumChain
+from pendulum import DoublePendulumEnsemble
+from pendulum import calculate_double_pendulum_positions
+from pendulum import calculate_chain_positions
+from pendulum import calculate_chain_mass_matrix
+from pendulum import calculate_double_pendulum_velocities
+
 from integrations import RungeKuttaIntegrator
+from trajectory import TrajectoryBuffer
+from trajectory import TrajectoryChunk
+from storage import TrajectoryWriter
+from diagnostics import EnergyDiagnostics
+from profiling import SimulationProfiler
+from checkpoint import Checkpoint
+from events import EventLog
+from events import locate
+from events import hermite_interpolation
+import kernels
  
 
 class PendulumSimulator:
 
-    def __init__(self):
-        pass
+    def __init__(self, dtype: type = np.float64):
+        '''
+            :param dtype: precision of the state, the integration and the
+                          recorded trajectory
+        '''
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def time(self):
+        return self.trajectory.channel('time')
+
+    @property
+    def x(self):
+        return self.trajectory.channel('x')
+
+    @property
+    def y(self):
+        return self.trajectory.channel('y')
     
     def run_simulation(self, pendulum: Pendulum
                            , propagator: MethodType|FunctionType
-                           , timestep: float):
+                           , timestep: float
+                           , profiler: SimulationProfiler|None = None
+                           , step_callback: FunctionType|None = None):
         '''
             Calculates the path of the pendulum
 
             :param rhsFunc: a function defining the rhs of the EOM, given
                             the projectile state.  
+            :param profiler: optional SimulationProfiler timing the phases
+                            of the run
+            :param step_callback: optional function called as
+                            step_callback(time, state) after every step
         '''
-        # initialize result lists
-        self.time = np.array([0], dtype=np.float32)
-        self.x = np.array([pendulum.x], dtype=np.float32)
-        self.y = np.array([pendulum.y], dtype=np.float32)
+        # initialize result buffer
+        self.trajectory = TrajectoryBuffer.for_duration(
+            channels=('time', 'x', 'y'), simulation_time=5, timestep=timestep
+            , dtype=self.dtype)
+        self.trajectory.append(0, pendulum.x, pendulum.y)
         
         # local variables for simulation
         time = 0
         state = np.array([pendulum.theta, pendulum.w]
-                         , dtype=np.float32)
+                         , dtype=self.dtype)
         
         func = partial(self.single_pendulum_dynamics, length=pendulum.length)
 
-        while self.time[-1] <= 5:
+        set_angle, set_angular_velocity = pendulum.set_angle, pendulum.set_angular_velocity
+        append = self.trajectory.append
+        if profiler is not None:
+            profiler.start(propagator)
+            propagator = profiler.timed('propagate', propagator)
+            func = profiler.timed('rhs', func)
+            set_angle = profiler.timed('set_state', set_angle)
+            set_angular_velocity = profiler.timed('set_state', set_angular_velocity)
+            append = profiler.timed('append', append)
+            if step_callback is not None:
+                step_callback = profiler.timed('callback', step_callback)
+
+        while time <= 5:
             # update time and state
-            time, state = propagator(rhsFunc=func
+            time, state = propagator(rhs_func=func
                                       , time=time
                                       , state=state
                                       , timestep=timestep)
             # reset pendulum position
-            pendulum.set_angle(theta=state[0])
-            pendulum.set_angular_velocity(w=state[1])
+            set_angle(theta=state[0])
+            set_angular_velocity(w=state[1])
 
-            # append results to result lists
-            self.time = np.append(self.time, time)
-            self.x = np.append(self.x, pendulum.x)
-            self.y = np.append(self.y, pendulum.y)
+            # record results
+            append(time, pendulum.x, pendulum.y)
+            if step_callback is not None:
+                step_callback(time, state)
+
+        if profiler is not None:
+            profiler.stop(buffers=[self.trajectory])
 
         return (self.time, self.x, self.y)
 
@@ -61,72 +117,351 @@ class PendulumSimulator:
         w_derivative = - 9.82 * np.sin(theta) / length
 
         return np.array([theta_derivative, w_derivative]
-                         , dtype=np.float32)
+                         , dtype=np.result_type(state))
     
-class DoublePendulumSimulation():
+class DoublePendulumDynamics():
     '''
-        A double pendulum simulator
+        The equations of motion, the canonical conversions and the
+        recorded results shared by the double pendulum simulators,
+        DoublePendulumSimulation and DoublePendulumEnsembleSimulation.
     '''
-    def __init__(self):
-        pass
+    def __init__(self, dtype: type = np.float64):
+        '''
+            :param dtype: precision of the state, the properties, the
+                          integration and the recorded trajectory; float64
+                          for accuracy, float32 to halve the memory of large
+                          ensembles
+        '''
+        self.dtype = np.dtype(dtype)
 
-    def run_simulation(self, double_pendulum: DoublePendulum
+    @property
+    def time(self):
+        return self.trajectory.channel('time')
+
+    @property
+    def x1(self):
+        return self._channel('x1')
+
+    @property
+    def y1(self):
+        return self._channel('y1')
+
+    @property
+    def x2(self):
+        return self._channel('x2')
+
+    @property
+    def y2(self):
+        return self._channel('y2')
+
+    @property
+    def theta1(self):
+        return self._channel('theta1')
+
+    @property
+    def theta2(self):
+        return self._channel('theta2')
+
+    @property
+    def w1(self):
+        return self._channel('w1')
+
+    @property
+    def w2(self):
+        return self._channel('w2')
+
+    @property
+    def vx1(self):
+        return self._channel('vx1')
+
+    @property
+    def vy1(self):
+        return self._channel('vy1')
+
+    @property
+    def vx2(self):
+        return self._channel('vx2')
+
+    @property
+    def vy2(self):
+        return self._channel('vy2')
+
+    @property
+    def energy(self) -> EnergyDiagnostics:
+        '''
+            Energy series and drift statistics of the last run, computed on
+            first access from the recorded state and kept until the next run.
+        '''
+        if self._energy is None:
+            self._energy = EnergyDiagnostics(self.theta1, self.theta2
+                                             , self.w1, self.w2
+                                             , properties=self.properties
+                                             , origin=self.origin)
+        return self._energy
+
+    def _channel(self, name: str) -> np.ndarray:
+        '''
+            Returns a recorded channel, or one reconstructed after the run.
+        '''
+        if name in self.trajectory.channels:
+            return self.trajectory.channel(name)
+        if name not in self._reconstructed:
+            if 'theta1' not in self.trajectory.channels:
+                raise AttributeError(f"{name} needs the recorded state, which this "
+                                     "trajectory lacks; run run_simulation again, "
+                                     "or with vectorized_cartesian=True")
+            self._reconstruct_cartesian(properties=self.properties, origin=self.origin)
+        return self._reconstructed[name]
+
+    def _reconstruct_cartesian(self, properties: np.ndarray
+                               , origin: np.ndarray|list):
+        '''
+            Computes positions and velocities from the recorded state of the
+            whole run in one vectorized pass.
+        '''
+        theta1, theta2, w1, w2 = self.theta1, self.theta2, self.w1, self.w2
+        length1, length2 = properties[..., 2], properties[..., 3]
+        positions = calculate_double_pendulum_positions(
+            theta1=theta1, theta2=theta2
+            , length1=length1, length2=length2, origin=origin)
+        velocities = calculate_double_pendulum_velocities(
+            theta1=theta1, theta2=theta2, w1=w1, w2=w2
+            , length1=length1, length2=length2)
+        self._reconstructed = dict(zip(['x1', 'y1', 'x2', 'y2'], positions))
+        self._reconstructed.update(zip(['vx1', 'vy1', 'vx2', 'vy2'], velocities))
+
+    def _detect_events(self, state: np.ndarray
+                           , properties: np.ndarray
                            , propagator: MethodType|FunctionType
+                           , events: list
                            , simulation_time: float|int
-                           , timestep: float):
+                           , timestep: float
+                           , tol: float):
         '''
-            Calculates the path of the pendulum
+            The integration loop of find_events, for N pendula with initial
+            states (N, 4) and properties (4,) or (N, 4). A pendulum leaves
+            the integrated batch at its first terminal event.
 
-            :param rhsFunc: a function defining the rhs of the EOM, given
-                            the projectile state.  
+            Returns:
+            ---------
+            tuple: (list of EventLog with members, final states (N, 4))
         '''
-        # initialize result lists
-        self.time = np.array([0], dtype=np.float32)
-        self.x1 = np.array([double_pendulum.pendulum1.x], dtype=np.float32)
-        self.y1 = np.array([double_pendulum.pendulum1.y], dtype=np.float32)
-        self.x2 = np.array([double_pendulum.pendulum2.x], dtype=np.float32)
-        self.y2 = np.array([double_pendulum.pendulum2.y], dtype=np.float32)
-
-        # local variables for simulation
+        shared = properties.ndim == 1
+        members = np.arange(len(state))
+        final = np.array(state)
+        func, state, canonical = self.equations_of_motion(propagator=propagator
+                                                          , state=state
+                                                          , properties=properties)
         time = 0
-        state = np.array([double_pendulum.pendulum1.theta
-                          , double_pendulum.pendulum2.theta
-                          , double_pendulum.pendulum1.w
-                          , double_pendulum.pendulum2.w]
-                         , dtype=np.float32)
-        
-        # setting the function for the EOM 
-        properties = np.array([double_pendulum.pendulum1.mass
-                                , double_pendulum.pendulum2.mass
-                                , double_pendulum.pendulum1.length
-                                , double_pendulum.pendulum2.length]
-                                , dtype=np.float32)
-
-        func = partial(self.double_pendulum_dynamics, properties=properties)
+        velocity = self.momentum_to_velocity(state, properties) if canonical else state
+        derivative = self.double_pendulum_dynamics(velocity, properties)
+        values = [event(time, velocity, properties) for event in events]
+        found = [[] for _ in events]
 
-        while self.time[-1] < simulation_time:
-            # update time and state
+        while len(members) > 0 and time < simulation_time:
+            time0, velocity0, derivative0 = time, velocity, derivative
             time, state = propagator(rhs_func=func
                                       , time=time
                                       , state=state
                                       , timestep=timestep)
-            # reset pendulum position
-            double_pendulum.set_double_pendulum(theta1=state[0], w1=state[2]   
-                                               , theta2=state[1], w2=state[3])
+            velocity = self.momentum_to_velocity(state, properties) if canonical else state
+            derivative = self.double_pendulum_dynamics(velocity, properties)
+
+            # locate the crossings of this step, and the first terminal one
+            stop = np.full(len(members), np.inf)
+            located = []
+            for i, event in enumerate(events):
+                value = event(time, velocity, properties)
+                index = np.flatnonzero(event.crossed(values[i], value))
+                if len(index) > 0:
+                    times, states = locate(event=event, time0=time0
+                                           , state0=velocity0[index]
+                                           , derivative0=derivative0[index]
+                                           , time1=time, state1=velocity[index]
+                                           , derivative1=derivative[index]
+                                           , value0=values[i][index]
+                                           , properties=properties if shared
+                                                        else properties[index]
+                                           , tol=tol)
+                    located.append((i, index, times, states))
+                    if event.terminal:
+                        stop[index] = np.minimum(stop[index], times)
+                values[i] = value
+            # drop what happens after a terminal event within the step
+            for i, index, times, states in located:
+                before = times <= stop[index]
+                found[i].append((times[before], states[before], members[index[before]]))
+
+            stopped = np.isfinite(stop)
+            if stopped.any():
+                final[members[stopped]] = hermite_interpolation(
+                    stop[stopped], time0, velocity0[stopped], derivative0[stopped]
+                    , time, velocity[stopped], derivative[stopped])
+                running = ~stopped
+                members, state = members[running], state[running]
+                velocity, derivative = velocity[running], derivative[running]
+                values = [value[running] for value in values]
+                if not shared:
+                    properties = properties[running]
+                func, _, _ = self.equations_of_motion(propagator=propagator
+                                                      , state=velocity
+                                                      , properties=properties)
+        final[members] = velocity
+
+        logs = []
+        for occurrences in found:
+            times, states, indices = zip(*occurrences) if occurrences else ([], [], [])
+            logs.append(EventLog(time=np.concatenate([np.empty(0), *times])
+                                 , state=np.concatenate([np.empty((0, 4)), *states])
+                                 , member=np.concatenate([np.empty(0, dtype=int), *indices])))
+        return logs, final
+
+    def equations_of_motion(self, propagator: MethodType|FunctionType
+                            , state: np.ndarray, properties: np.ndarray):
+        '''
+            Chooses the RHS matching the propagator. Integrators with a true
+            canonical attribute (the structure-preserving ones) are given the
+            Hamiltonian form, and the state converted to momenta.
+
+            Returns:
+            ---------
+            tuple: (rhs function, state, bool canonical)
+        '''
+        integrator = getattr(propagator, '__self__', propagator)
+        if getattr(integrator, 'canonical', False):
+            func = partial(self.double_pendulum_hamiltonian_dynamics
+                           , properties=properties)
+            return func, self.velocity_to_momentum(state, properties), True
+        func = partial(self.double_pendulum_dynamics, properties=properties)
+        return func, state, False
+
+    def velocity_to_momentum(self, state: np.ndarray, properties: np.ndarray):
+        '''
+            Converts (theta1, theta2, w1, w2) to the canonical state
+            (theta1, theta2, p1, p2), along the last axis.
+        '''
+        if state.ndim == 1 and np.ndim(properties) == 1:
+            # a single state unpacks to scalars, much cheaper than 0-d slices
+            theta1, theta2, w1, w2 = state
+            mass1, mass2, length1, length2 = properties
+        else:
+            theta1, theta2 = state[..., 0], state[..., 1]
+            w1, w2 = state[..., 2], state[..., 3]
+            mass1, mass2 = properties[..., 0], properties[..., 1]
+            length1, length2 = properties[..., 2], properties[..., 3]
+
+        coupling = mass2 * length1 * length2 * np.cos(theta1-theta2)
+        momentum1 = (mass1+mass2) * length1**2 * w1 + coupling * w2
+        momentum2 = mass2 * length2**2 * w2 + coupling * w1
 
-            # append results to result lists
-            self.time = np.append(self.time, time)
-            self.x1 = np.append(self.x1, double_pendulum.pendulum1.x)
-            self.y1 = np.append(self.y1, double_pendulum.pendulum1.y)         
-            self.x2 = np.append(self.x2, double_pendulum.pendulum2.x)
-            self.y2 = np.append(self.y2, double_pendulum.pendulum2.y)
-                                
+        if np.ndim(coupling) == 0:
+            # a single state is fastest built from its components at once
+            return np.array([theta1, theta2, momentum1, momentum2]
+                            , dtype=np.result_type(state))
+        canonical = np.empty(np.shape(coupling) + (4,), dtype=np.result_type(state))
+        canonical[..., 0] = theta1
+        canonical[..., 1] = theta2
+        canonical[..., 2] = momentum1
+        canonical[..., 3] = momentum2
+        return canonical
+
+    def momentum_to_velocity(self, state: np.ndarray, properties: np.ndarray):
+        '''
+            Converts the canonical state (theta1, theta2, p1, p2) to
+            (theta1, theta2, w1, w2), along the last axis.
+        '''
+        if state.ndim == 1 and np.ndim(properties) == 1:
+            # a single state unpacks to scalars, much cheaper than 0-d slices
+            theta1, theta2, p1, p2 = state
+            mass1, mass2, length1, length2 = properties
+        else:
+            theta1, theta2 = state[..., 0], state[..., 1]
+            p1, p2 = state[..., 2], state[..., 3]
+            mass1, mass2 = properties[..., 0], properties[..., 1]
+            length1, length2 = properties[..., 2], properties[..., 3]
+
+        # entries and determinant of the mass matrix
+        a = (mass1+mass2) * length1**2
+        b = mass2 * length2**2
+        c = mass2 * length1 * length2 * np.cos(theta1-theta2)
+        determinant = a*b - c**2
+        w1 = (b*p1 - c*p2) / determinant
+        w2 = (a*p2 - c*p1) / determinant
+
+        if np.ndim(c) == 0:
+            return np.array([theta1, theta2, w1, w2], dtype=np.result_type(state))
+        velocity = np.empty(np.shape(c) + (4,), dtype=np.result_type(state))
+        velocity[..., 0] = theta1
+        velocity[..., 1] = theta2
+        velocity[..., 2] = w1
+        velocity[..., 3] = w2
+        return velocity
+
+    def double_pendulum_hamiltonian_dynamics(self, state: np.ndarray
+                                             , properties: np.ndarray
+                                             , part: str = 'full'):
+        '''
+            Function defines the RHS of Hamilton's equations of a double
+            pendulum, (dH/dp, -dH/dtheta), for the canonical state
+            (theta1, theta2, p1, p2) along the last axis. part selects the
+            equations of the 'kinetic' or 'potential' energy alone, as used
+            by splitting integrators.
+        '''
+        if part not in ['full', 'kinetic', 'potential']:
+            raise ValueError("part must be 'full', 'kinetic' or 'potential'")
+        if state.ndim == 1 and np.ndim(properties) == 1:
+            # a single state unpacks to scalars, much cheaper than 0-d slices
+            theta1, theta2, p1, p2 = state
+            mass1, mass2, length1, length2 = properties
+        else:
+            theta1, theta2 = state[..., 0], state[..., 1]
+            p1, p2 = state[..., 2], state[..., 3]
+            mass1, mass2 = properties[..., 0], properties[..., 1]
+            length1, length2 = properties[..., 2], properties[..., 3]
+
+        # derivatives of the angles and momenta, zero for the missing part
+        derivatives = [0, 0, 0, 0]
+        if part != 'potential':
+            # entries and determinant of the mass matrix
+            a = (mass1+mass2) * length1**2
+            b = mass2 * length2**2
+            c = mass2 * length1 * length2 * np.cos(theta1-theta2)
+            determinant = a*b - c**2
+            kinetic_energy = (b*p1**2 + a*p2**2 - 2*c*p1*p2) / (2*determinant)
+            # derivative of the kinetic energy with respect to theta1-theta2
+            coupling = (mass2 * length1 * length2 * np.sin(theta1-theta2)
+                        * (p1*p2 - 2*c*kinetic_energy) / determinant)
+            derivatives = [(b*p1 - c*p2) / determinant, (a*p2 - c*p1) / determinant
+                           , - coupling, coupling]
+        if part != 'kinetic':
+            derivatives[2] = derivatives[2] - 9.82 * (mass1+mass2) * length1 * np.sin(theta1)
+            derivatives[3] = derivatives[3] - 9.82 * mass2 * length2 * np.sin(theta2)
+
+        shape = np.broadcast_shapes(np.shape(theta1), np.shape(mass1))
+        if shape == ():
+            return np.array(derivatives, dtype=np.result_type(state))
+        derivative = np.empty(shape + (4,), dtype=np.result_type(state))
+        for index, component in enumerate(derivatives):
+            derivative[..., index] = component
+        return derivative
 
     def double_pendulum_dynamics(self, state: np.ndarray
                                  , properties: np.ndarray):
-        
-        theta1, theta2, w1, w2 = state
-        mass1, mass2, length1, length2 = properties
+        '''
+            Function defines the RHS of a double pendulum. The last axis of
+            state is (theta1, theta2, w1, w2) and of properties is
+            (mass1, mass2, length1, length2); leading axes are broadcast, so
+            an (N, 4) state evaluates N pendula at once.
+        '''
+        if state.ndim == 1 and np.ndim(properties) == 1:
+            # a single state unpacks to scalars, much cheaper than 0-d slices
+            theta1, theta2, w1, w2 = state
+            mass1, mass2, length1, length2 = properties
+        else:
+            theta1, theta2 = state[..., 0], state[..., 1]
+            w1, w2 = state[..., 2], state[..., 3]
+            mass1, mass2 = properties[..., 0], properties[..., 1]
+            length1, length2 = properties[..., 2], properties[..., 3]
         
         # calculate alphas
         alpha1 = (length2 / length1 * mass2 / (mass1 + mass2)
@@ -134,7 +469,7 @@ class DoublePendulumSimulation():
         alpha2 = length1 / length2 * np.cos(theta1-theta2)
         # calculate fs
         f1 = (- length2/length1 * mass2/(mass1+mass2) 
-              * w1**2 * np.sin(theta1-theta2) 
+              * w2**2 * np.sin(theta1-theta2) 
               - 9.82/length1 * np.sin(theta1)
                 )
         f2 = (length1/length2 * w1**2 * np.sin(theta1-theta2)
@@ -145,14 +480,903 @@ class DoublePendulumSimulation():
         g2 = (f2 - alpha2*f1) / (1-alpha1*alpha2)
 
         # define derivative of state variables
-        deriv_theta1 = w1
-        deriv_theta2 = w2
-        deriv_w1 = g1
-        deriv_w2 = g2
+        if np.ndim(g1) == 0:
+            return np.array([w1, w2, g1, g2], dtype=np.result_type(state))
+        derivative = np.empty(np.shape(g1) + (4,), dtype=np.result_type(state))
+        derivative[..., 0] = w1
+        derivative[..., 1] = w2
+        derivative[..., 2] = g1
+        derivative[..., 3] = g2
+
+        return derivative
+
+
+class DoublePendulumSimulation(DoublePendulumDynamics):
+    '''
+        A double pendulum simulator
+    '''
+    def run_simulation(self, double_pendulum: DoublePendulum
+                           , propagator: MethodType|FunctionType
+                           , simulation_time: float|int
+                           , timestep: float
+                           , backend: str = 'numpy'
+                           , vectorized_cartesian: bool = False
+                           , profiler: SimulationProfiler|None = None
+                           , step_callback: FunctionType|None = None
+                           , start_time: float = 0
+                           , checkpoint: Checkpoint|None = None):
+        '''
+            Calculates the path of the pendulum
+
+            :param rhsFunc: a function defining the rhs of the EOM, given
+                            the projectile state.  
+            :param simulation_time: time at which the run ends
+            :param start_time: time of the current state of the double
+                            pendulum, e.g. to continue an earlier run
+            :param backend: 'numpy', or 'numba' to run the whole loop in a
+                            compiled kernel fusing the RHS with RK4. Falls
+                            back to 'numpy' when numba is not installed.
+            :param vectorized_cartesian: compute positions and velocities
+                            right after the run in one pass, and update the
+                            double pendulum only to the final state. Always
+                            the case for the numba backend. Otherwise the
+                            double pendulum follows the run step by step, and
+                            positions and velocities are computed on first
+                            access. Either way only (theta1, theta2, w1, w2)
+                            are recorded during integration.
+            :param profiler: optional SimulationProfiler timing the phases
+                            of the run. The numba backend only reports the
+                            whole run and the step count.
+            :param step_callback: optional function called as
+                            step_callback(time, state) after every step, with
+                            state (theta1, theta2, w1, w2). Not supported by
+                            the numba backend.
+            :param checkpoint: optional Checkpoint, saved periodically and at
+                            the end of the run, see resume_simulation. Not
+                            supported by the numba backend.
+        '''
+        if backend not in ['numpy', 'numba']:
+            raise ValueError("backend must be 'numpy' or 'numba'")
+        if backend == 'numba':
+            if kernels.jit_available():
+                if step_callback is not None:
+                    raise ValueError("the numba backend does not support step_callback")
+                if checkpoint is not None:
+                    raise ValueError("the numba backend does not support checkpoints")
+                return self._run_compiled_simulation(double_pendulum=double_pendulum
+                                                     , propagator=propagator
+                                                     , simulation_time=simulation_time
+                                                     , timestep=timestep
+                                                     , profiler=profiler
+                                                     , start_time=start_time)
+            warnings.warn("numba is not installed, falling back to the numpy backend")
+
+        # local variables for simulation
+        time = start_time
+        state = np.array([double_pendulum.pendulum1.theta
+                          , double_pendulum.pendulum2.theta
+                          , double_pendulum.pendulum1.w
+                          , double_pendulum.pendulum2.w]
+                         , dtype=self.dtype)
 
-        return np.array([deriv_theta1, deriv_theta2, deriv_w1, deriv_w2]
-                        , dtype=np.float32)
+        # initialize result buffer, sized for the full run
+        self._reconstructed = {}
+        self.trajectory = TrajectoryBuffer.for_duration(
+            channels=('time', 'theta1', 'theta2', 'w1', 'w2')
+            , simulation_time=simulation_time-start_time, timestep=timestep
+            , dtype=self.dtype)
+        self.trajectory.append(time, *state)
         
+        # setting the function for the EOM 
+        properties = self._properties(double_pendulum)
+        self.properties, self.origin = properties, double_pendulum.pendulum1.origin
+        self._energy = None
+
+        func, state, canonical = self.equations_of_motion(propagator=propagator
+                                                          , state=state
+                                                          , properties=properties)
+        self._integrate(double_pendulum=double_pendulum, propagator=propagator
+                        , func=func, canonical=canonical, time=time, state=state
+                        , simulation_time=simulation_time, timestep=timestep
+                        , vectorized_cartesian=vectorized_cartesian
+                        , profiler=profiler, step_callback=step_callback
+                        , checkpoint=checkpoint)
+
+    def resume_simulation(self, double_pendulum: DoublePendulum
+                              , propagator: MethodType|FunctionType
+                              , checkpoint: Checkpoint|str
+                              , simulation_time: float|int|None = None
+                              , profiler: SimulationProfiler|None = None
+                              , step_callback: FunctionType|None = None):
+        '''
+            Continues a run of run_simulation from its checkpoint, identical
+            to the run without interruption. The results, including the
+            steps before the checkpoint, are available as after
+            run_simulation, and the checkpoint is updated as the run goes on.
+
+            :param double_pendulum: the double pendulum of the run, whose
+                            properties must match the checkpoint. Its state
+                            is set from the checkpoint.
+            :param propagator: an integrator of the same type as in the
+                            run, e.g. a new instance after a crash
+            :param checkpoint: Checkpoint of the run, or the path of its file
+            :param simulation_time: time at which the run ends, later than
+                            the original one to extend a finished run. None
+                            keeps the original one.
+        '''
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
+        arrays, integrator_state = checkpoint.load()
+
+        if str(arrays['integrator']) != self._integrator_name(propagator):
+            raise ValueError(f"the checkpoint was written by {arrays['integrator']}")
+        if np.dtype(str(arrays['dtype'])) != self.dtype:
+            raise ValueError(f"the checkpoint was written in {arrays['dtype']}"
+                             f", not {self.dtype}")
+        properties = self._properties(double_pendulum)
+        if not np.array_equal(properties, arrays['properties']):
+            raise ValueError("the properties of the double pendulum do not match "
+                             "the checkpoint")
+        integrator = getattr(propagator, '__self__', None)
+        if hasattr(integrator, 'set_state'):
+            integrator.set_state(integrator_state)
+
+        if simulation_time is None:
+            simulation_time = float(arrays['simulation_time'])
+        time, state, timestep = (float(arrays['time']), arrays['state']
+                                 , float(arrays['timestep']))
+        self.properties, self.origin = properties, double_pendulum.pendulum1.origin
+        self._energy = None
+        self._reconstructed = {}
+        channels, data = [str(name) for name in arrays['channels']], arrays['trajectory']
+        remaining = int(np.ceil(max(simulation_time - time, 0) / timestep)) + 2
+        self.trajectory = TrajectoryBuffer(channels=channels
+                                           , capacity=data.shape[1] + remaining
+                                           , dtype=self.dtype)
+        self.trajectory.extend(*data)
+
+        func, _, canonical = self.equations_of_motion(propagator=propagator
+                                                      , state=state
+                                                      , properties=properties)
+        velocity_state = self.momentum_to_velocity(state, properties) if canonical else state
+        double_pendulum.set_double_pendulum(theta1=velocity_state[0]
+                                           , w1=velocity_state[2]
+                                           , theta2=velocity_state[1]
+                                           , w2=velocity_state[3])
+        self._integrate(double_pendulum=double_pendulum, propagator=propagator
+                        , func=func, canonical=canonical, time=time, state=state
+                        , simulation_time=simulation_time, timestep=timestep
+                        , vectorized_cartesian=bool(arrays['vectorized_cartesian'])
+                        , profiler=profiler, step_callback=step_callback
+                        , checkpoint=checkpoint)
+
+    @staticmethod
+    def _integrator_name(propagator: MethodType|FunctionType) -> str:
+        '''
+            Module, name and version of the integrator of a propagator.
+        '''
+        integrator = getattr(propagator, '__self__', propagator)
+        return (f"{type(integrator).__module__}.{propagator.__qualname__}"
+                f" version {getattr(integrator, 'version', None)}")
+
+    def _integrate(self, double_pendulum: DoublePendulum
+                       , propagator: MethodType|FunctionType
+                       , func: FunctionType
+                       , canonical: bool
+                       , time: float
+                       , state: np.ndarray
+                       , simulation_time: float|int
+                       , timestep: float
+                       , vectorized_cartesian: bool
+                       , profiler: SimulationProfiler|None
+                       , step_callback: FunctionType|None
+                       , checkpoint: Checkpoint|None):
+        '''
+            The integration loop of run_simulation and resume_simulation,
+            from (time, state) in the coordinates of the propagator into the
+            prepared trajectory buffer.
+        '''
+        properties = self.properties
+        velocity_state = self.momentum_to_velocity(state, properties) if canonical else state
+
+        if checkpoint is not None:
+            integrator = getattr(propagator, '__self__', None)
+            integrator_name = self._integrator_name(propagator)
+            def save_checkpoint():
+                integrator_state = {}
+                if hasattr(integrator, 'get_state'):
+                    integrator_state = integrator.get_state()
+                checkpoint.save(integrator_state=integrator_state
+                                , time=time, state=state
+                                , simulation_time=simulation_time, timestep=timestep
+                                , vectorized_cartesian=vectorized_cartesian
+                                , properties=properties, dtype=self.dtype.name
+                                , integrator=integrator_name
+                                , channels=self.trajectory.channels
+                                , trajectory=self.trajectory.data)
+            checkpoint.start()
+
+        set_state, append = double_pendulum.set_double_pendulum, self.trajectory.append
+        if profiler is not None:
+            profiler.start(propagator)
+            propagator = profiler.timed('propagate', propagator)
+            func = profiler.timed('rhs', func)
+            set_state = profiler.timed('set_state', set_state)
+            append = profiler.timed('append', append)
+            if step_callback is not None:
+                step_callback = profiler.timed('callback', step_callback)
+
+        while time < simulation_time:
+            # update time and state
+            time, state = propagator(rhs_func=func
+                                      , time=time
+                                      , state=state
+                                      , timestep=timestep)
+            if canonical:
+                velocity_state = self.momentum_to_velocity(state, properties)
+            else:
+                velocity_state = state
+            if step_callback is not None:
+                step_callback(time, velocity_state)
+            if not vectorized_cartesian:
+                # reset pendulum position
+                set_state(theta1=velocity_state[0]
+                          , w1=velocity_state[2]
+                          , theta2=velocity_state[1]
+                          , w2=velocity_state[3])
+
+            # record results
+            append(time, *velocity_state)
+            if checkpoint is not None and checkpoint.due():
+                save_checkpoint()
+
+        if checkpoint is not None:
+            save_checkpoint()
+
+        if vectorized_cartesian:
+            self._reconstruct_cartesian(properties=properties
+                                        , origin=double_pendulum.pendulum1.origin)
+            # leave the pendulum in its final state
+            double_pendulum.set_double_pendulum(theta1=velocity_state[0]
+                                               , w1=velocity_state[2]
+                                               , theta2=velocity_state[1]
+                                               , w2=velocity_state[3])
+
+        if profiler is not None:
+            profiler.stop(buffers=[self.trajectory])
+
+    def find_events(self, double_pendulum: DoublePendulum
+                        , propagator: MethodType|FunctionType
+                        , events: list
+                        , simulation_time: float|int
+                        , timestep: float
+                        , tol: float = 1e-10) -> list:
+        '''
+            Integrates as run_simulation, but records nothing but the
+            occurrences of events, each located within its step to tol. The
+            run ends at the first terminal event, or at simulation_time, and
+            the double pendulum is left in the state at the end.
+
+            :param events: list of Event, see events.py, e.g.
+                            [flip(2), crossing('theta1', 0, direction=1)]
+            :param tol: accuracy of the event times
+
+            Returns:
+            ---------
+            list: one EventLog of times and states per event
+        '''
+        state = np.array([[double_pendulum.pendulum1.theta
+                           , double_pendulum.pendulum2.theta
+                           , double_pendulum.pendulum1.w
+                           , double_pendulum.pendulum2.w]]
+                         , dtype=self.dtype)
+        logs, final = self._detect_events(state=state
+                                          , properties=self._properties(double_pendulum)
+                                          , propagator=propagator, events=events
+                                          , simulation_time=simulation_time
+                                          , timestep=timestep, tol=tol)
+        double_pendulum.set_double_pendulum(theta1=final[0, 0], w1=final[0, 2]
+                                           , theta2=final[0, 1], w2=final[0, 3])
+        self.events = [EventLog(time=log.time, state=log.state) for log in logs]
+        return self.events
+
+    def iter_simulation(self, double_pendulum: DoublePendulum
+                            , propagator: MethodType|FunctionType
+                            , timestep: float
+                            , simulation_time: float|int|None = None
+                            , chunk_size: int = 1024):
+        '''
+            Generator version of run_simulation, yielding the path in chunks
+            of chunk_size steps as they are integrated. Only one chunk is
+            held at a time, so memory does not grow with the horizon; with
+            simulation_time None the run never ends. The first chunk starts
+            with the initial state, and double_pendulum is updated to the
+            last state of each chunk before it is yielded.
+
+            Yields:
+            ---------
+            TrajectoryChunk with arrays time (n,), and theta, omega, x, y of
+            shape (n, 2) for the upper and lower pendulum
+        '''
+        state = np.array([double_pendulum.pendulum1.theta
+                          , double_pendulum.pendulum2.theta
+                          , double_pendulum.pendulum1.w
+                          , double_pendulum.pendulum2.w]
+                         , dtype=self.dtype)
+        properties = np.array([double_pendulum.pendulum1.mass
+                                , double_pendulum.pendulum2.mass
+                                , double_pendulum.pendulum1.length
+                                , double_pendulum.pendulum2.length]
+                                , dtype=self.dtype)
+        origin = double_pendulum.pendulum1.origin
+        func, state, canonical = self.equations_of_motion(propagator=propagator
+                                                          , state=state
+                                                          , properties=properties)
+        time = 0
+        velocity_state = self.momentum_to_velocity(state, properties) if canonical else state
+
+        finished = False
+        while not finished:
+            times = np.empty(chunk_size, dtype=self.dtype)
+            states = np.empty((chunk_size, 4), dtype=self.dtype)
+            n = 0
+            if time == 0:
+                times[0], states[0] = time, velocity_state
+                n = 1
+            while n < chunk_size:
+                if simulation_time is not None and time >= simulation_time:
+                    finished = True
+                    break
+                time, state = propagator(rhs_func=func
+                                          , time=time
+                                          , state=state
+                                          , timestep=timestep)
+                if canonical:
+                    velocity_state = self.momentum_to_velocity(state, properties)
+                else:
+                    velocity_state = state
+                times[n], states[n] = time, velocity_state
+                n += 1
+            if n == 0:
+                break
+
+            times, states = times[:n], states[:n]
+            x1, y1, x2, y2 = calculate_double_pendulum_positions(
+                theta1=states[:, 0], theta2=states[:, 1]
+                , length1=properties[2], length2=properties[3], origin=origin)
+            double_pendulum.set_double_pendulum(theta1=states[-1, 0], w1=states[-1, 2]
+                                               , theta2=states[-1, 1], w2=states[-1, 3])
+            yield TrajectoryChunk(time=times
+                                  , theta=states[:, :2]
+                                  , omega=states[:, 2:]
+                                  , x=np.stack([x1, x2], axis=1)
+                                  , y=np.stack([y1, y2], axis=1))
+
+    def _run_compiled_simulation(self, double_pendulum: DoublePendulum
+                                     , propagator: MethodType|FunctionType
+                                     , simulation_time: float|int
+                                     , timestep: float
+                                     , profiler: SimulationProfiler|None = None
+                                     , start_time: float = 0):
+        '''
+            Runs the simulation in the compiled RK4 kernel, computing the
+            cartesian coordinates afterwards in one pass.
+        '''
+        if not isinstance(getattr(propagator, '__self__', None), RungeKuttaIntegrator):
+            raise ValueError("the numba backend fuses the RHS with RK4, use "
+                             "RungeKuttaIntegrator.propagate_state as propagator")
+
+        state = np.array([double_pendulum.pendulum1.theta
+                          , double_pendulum.pendulum2.theta
+                          , double_pendulum.pendulum1.w
+                          , double_pendulum.pendulum2.w]
+                         , dtype=self.dtype)
+        if profiler is not None:
+            profiler.start(propagator)
+        capacity = int(np.ceil((simulation_time - start_time) / timestep)) + 2
+        times = np.empty(capacity, dtype=self.dtype)
+        states = np.empty((capacity, 4), dtype=self.dtype)
+        n = kernels.double_pendulum_rk4(state, self._properties(double_pendulum)
+                                        , float(start_time), float(simulation_time)
+                                        , float(timestep), times, states)
+        self.set_trajectory(double_pendulum=double_pendulum
+                            , times=times[:n], states=states[:n])
+
+        if profiler is not None:
+            profiler.count('steps', n - 1)
+            profiler.stop(buffers=[self.trajectory])
+
+    def _properties(self, double_pendulum: DoublePendulum) -> np.ndarray:
+        '''
+            (mass1, mass2, length1, length2) of a double pendulum.
+        '''
+        return np.array([double_pendulum.pendulum1.mass
+                         , double_pendulum.pendulum2.mass
+                         , double_pendulum.pendulum1.length
+                         , double_pendulum.pendulum2.length]
+                        , dtype=self.dtype)
+
+    def set_trajectory(self, double_pendulum: DoublePendulum
+                       , times: np.ndarray, states: np.ndarray):
+        '''
+            Sets the results of a run from its recorded times (T,) and states
+            (T, 4) of (theta1, theta2, w1, w2), e.g. of a cached run, as if
+            run_simulation with vectorized_cartesian had produced them. The
+            double pendulum is left in the final state.
+        '''
+        properties = self._properties(double_pendulum)
+        self.properties, self.origin = properties, double_pendulum.pendulum1.origin
+        self._energy = None
+
+        self.trajectory = TrajectoryBuffer(channels=('time', 'theta1', 'theta2', 'w1', 'w2')
+                                           , capacity=len(times), dtype=self.dtype)
+        self.trajectory.extend(times, *np.transpose(states))
+        self._reconstruct_cartesian(properties=properties
+                                    , origin=double_pendulum.pendulum1.origin)
+
+        # leave the pendulum in its final state
+        double_pendulum.set_double_pendulum(theta1=states[-1, 0], w1=states[-1, 2]
+                                           , theta2=states[-1, 1], w2=states[-1, 3])
+
+
+class DoublePendulumEnsembleSimulation(DoublePendulumDynamics):
+    '''
+        A simulator for an ensemble of N double pendula, integrated together
+        as one (N, 4) state array, with the equations of motion, the
+        storage and the reconstruction of DoublePendulumDynamics.
+    '''
+    @property
+    def time(self):
+        return self._channel('time')
+
+    def _channel(self, name: str) -> np.ndarray:
+        '''
+            Returns a recorded or reconstructed channel of the last run,
+            unless that run was written to a trajectory file.
+        '''
+        if self.trajectory_path is not None:
+            raise AttributeError(f"{name} is not kept in memory, the trajectory was "
+                                 f"written to {self.trajectory_path}; read it with "
+                                 "TrajectoryFile")
+        if name in self.states.channels:
+            return self.states.channel(name)
+        return super()._channel(name)
+
+    def run_simulation(self, initial_states: np.ndarray
+                           , properties: np.ndarray
+                           , propagator: MethodType|FunctionType
+                           , simulation_time: float|int
+                           , timestep: float
+                           , origin: np.ndarray|list = (0, 0)
+                           , writer: TrajectoryWriter|None = None
+                           , profiler: SimulationProfiler|None = None
+                           , step_callback: FunctionType|None = None):
+        '''
+            Calculates the paths of all pendula in the ensemble. Results are
+            stored as (T, N) arrays, e.g. self.theta1 and self.x2, or written
+            to a trajectory file chunk by chunk when a writer is given, for
+            ensembles that do not fit in memory; the results of the run are
+            then only in the file, at self.trajectory_path. The final states
+            are kept in self.final_states, shape (N, 4).
+
+            Parameters:
+            ----------------
+            initial_states:  array of shape (N, 4), rows (theta1, theta2, w1, w2)
+            properties:      array of shape (N, 4) or (4,), rows
+                             (mass1, mass2, length1, length2)
+            propagator:      an integrator method, e.g.
+                             RungeKuttaIntegrator.propagate_state
+            simulation_time: duration of the simulation
+            timestep:        timestep of propagation
+            origin:          hang-point shared by all upper pendula, or
+                             hang-points of shape (2, N)
+            writer:          optional TrajectoryWriter with the channels
+                             (theta1, theta2, w1, w2), N members and this
+                             timestep, which receives every step instead of
+                             the in-memory buffers; the integrator name of
+                             its header is filled in
+            profiler:        optional SimulationProfiler timing the phases
+                             of the run
+            step_callback:   optional function called as
+                             step_callback(time, states) after every step,
+                             with states of shape (N, 4)
+        '''
+        state = np.array(initial_states, dtype=self.dtype)
+        properties = np.array(properties, dtype=self.dtype)
+        if state.ndim != 2 or state.shape[1] != 4:
+            raise ValueError("initial_states must have shape (N, 4)")
+        if properties.shape not in [(4,), state.shape]:
+            raise ValueError("properties must have shape (4,) or (N, 4)")
+        if writer is not None:
+            self._check_writer(writer, propagator=propagator
+                               , n_members=len(state), timestep=timestep)
+        self.properties, self.origin = properties, origin
+        self._energy = None
+
+        if writer is None:
+            # initialize result buffers, sized for the full run
+            self.trajectory = TrajectoryBuffer.for_duration(
+                channels=('time',)
+                , simulation_time=simulation_time, timestep=timestep
+                , dtype=self.dtype)
+            self.states = TrajectoryBuffer.for_duration(
+                channels=('theta1', 'theta2', 'w1', 'w2')
+                , simulation_time=simulation_time, timestep=timestep
+                , member_shape=state.shape[:1], dtype=self.dtype)
+            def record(time, state):
+                self.trajectory.append(time)
+                self.states.append(*state.T)
+            self.trajectory_path = None
+        else:
+            # drop the results of a previous run, they are not this run's
+            self.trajectory = self.states = None
+            self._reconstructed = {}
+            self.trajectory_path = writer.path
+            def record(time, state):
+                writer.append(time, *state.T)
+        time = 0
+        record(time, state)
+        self.final_states = state
+
+        func, state, canonical = self.equations_of_motion(propagator=propagator
+                                                          , state=state
+                                                          , properties=properties)
+
+        if profiler is not None:
+            profiler.start(propagator)
+            propagator = profiler.timed('propagate', propagator)
+            func = profiler.timed('rhs', func)
+            record = profiler.timed('append', record)
+            if step_callback is not None:
+                step_callback = profiler.timed('callback', step_callback)
+
+        while time < simulation_time:
+            # update time and state of all members at once
+            time, state = propagator(rhs_func=func
+                                      , time=time
+                                      , state=state
+                                      , timestep=timestep)
+            velocity_state = self.momentum_to_velocity(state, properties) if canonical else state
+            # record results
+            record(time, velocity_state)
+            if step_callback is not None:
+                step_callback(time, velocity_state)
+            self.final_states = velocity_state
+
+        if writer is None:
+            # cartesian coordinates for the whole run in one pass
+            self._reconstruct_cartesian(properties=properties, origin=origin)
+
+        if profiler is not None:
+            profiler.stop(buffers=[] if writer is not None
+                          else [self.trajectory, self.states])
+
+    @staticmethod
+    def _check_writer(writer: TrajectoryWriter
+                      , propagator: MethodType|FunctionType
+                      , n_members: int, timestep: float):
+        '''
+            Checks that the header of a writer describes the run, and fills
+            in the name of the integrator.
+        '''
+        integrator = getattr(propagator, '__self__', None)
+        name = propagator.__name__ if integrator is None else type(integrator).__name__
+        header = writer.header
+        if header['channels'] != ['theta1', 'theta2', 'w1', 'w2']:
+            raise ValueError("the writer must have the channels "
+                             "(theta1, theta2, w1, w2)")
+        if header['n_members'] != n_members:
+            raise ValueError(f"the writer holds {header['n_members']} members, "
+                             f"the ensemble has {n_members}")
+        if header['timestep'] != float(timestep):
+            raise ValueError(f"the writer has timestep {header['timestep']}, "
+                             f"the run {timestep}")
+        if header['integrator'] not in ['', name]:
+            raise ValueError(f"the writer has integrator {header['integrator']}, "
+                             f"the run {name}")
+        header['integrator'] = name
+
+    def run_ensemble(self, ensemble: DoublePendulumEnsemble
+                         , propagator: MethodType|FunctionType
+                         , simulation_time: float|int
+                         , timestep: float
+                         , **kwargs):
+        '''
+            Runs the members of a DoublePendulumEnsemble, with their own
+            hang-points, see run_simulation for the keyword arguments. The
+            ensemble is left in the final states, as run_simulation of
+            DoublePendulumSimulation leaves its double pendulum.
+        '''
+        self.run_simulation(initial_states=ensemble.state
+                            , properties=ensemble.properties
+                            , propagator=propagator
+                            , simulation_time=simulation_time
+                            , timestep=timestep
+                            , origin=ensemble.origin
+                            , **kwargs)
+        ensemble.state[:] = self.final_states
+
+
+    def find_events(self, initial_states: np.ndarray
+                        , properties: np.ndarray
+                        , propagator: MethodType|FunctionType
+                        , events: list
+                        , simulation_time: float|int
+                        , timestep: float
+                        , tol: float = 1e-10) -> list:
+        '''
+            Integrates the ensemble as run_simulation, but records nothing
+            but the occurrences of events, each located within its step to
+            tol. A member stops at its first terminal event, e.g. its first
+            flip, and the run ends when all members have stopped or at
+            simulation_time.
+
+            Parameters:
+            ----------------
+            initial_states, properties, propagator, simulation_time,
+            timestep: as for run_simulation
+            events: list of Event, see events.py
+            tol:    accuracy of the event times
+
+            Returns:
+            ---------
+            list: one EventLog of times, states and members per event
+        '''
+        state = np.array(initial_states, dtype=self.dtype)
+        properties = np.array(properties, dtype=self.dtype)
+        if state.ndim != 2 or state.shape[1] != 4:
+            raise ValueError("initial_states must have shape (N, 4)")
+        if properties.shape not in [(4,), state.shape]:
+            raise ValueError("properties must have shape (4,) or (N, 4)")
+        self.events, self.final_states = self._detect_events(
+            state=state, properties=properties, propagator=propagator
+            , events=events, simulation_time=simulation_time
+            , timestep=timestep, tol=tol)
+        return self.events
+
+
+class PendulumChainDynamics():
+    '''
+        The equations of motion, the canonical conversions and the recorded
+        results shared by the simulators of chains of N pendula, see
+        PendulumChain. The equations of motion are assembled from the mass
+        matrix and solved with one batched linear solve, so they hold for any
+        N and any number of leading (ensemble) axes; for N=2 they are those
+        of DoublePendulumSimulation. States are (theta1, ..., thetaN,
+        w1, ..., wN) and properties (mass1, ..., massN, length1, ...,
+        lengthN) along the last axis.
+    '''
+    def __init__(self, dtype: type = np.float64):
+        '''
+            :param dtype: precision of the state, the integration and the
+                          recorded trajectory
+        '''
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def time(self):
+        return self.trajectory.channel('time')
+
+    @property
+    def theta(self):
+        '''
+            Angles of the run, shape (T, N)
+        '''
+        return self.states.channel('theta')
+
+    @property
+    def w(self):
+        '''
+            Angular velocities of the run, shape (T, N)
+        '''
+        return self.states.channel('w')
+
+    @property
+    def x(self):
+        return self._positions()[0]
+
+    @property
+    def y(self):
+        return self._positions()[1]
+
+    def _positions(self):
+        '''
+            Bob positions of the whole run, computed on first access.
+        '''
+        if self._reconstructed is None:
+            n = self.theta.shape[-1]
+            self._reconstructed = calculate_chain_positions(
+                self.theta, self.properties[..., n:], origin=self.origin)
+        return self._reconstructed
+
+    def _integrate(self, state: np.ndarray
+                       , properties: np.ndarray
+                       , propagator: MethodType|FunctionType
+                       , simulation_time: float|int
+                       , timestep: float
+                       , origin: np.ndarray|list):
+        '''
+            Integrates states (..., 2N) into the result buffers, returning
+            the final state in velocity form.
+        '''
+        state = np.array(state, dtype=self.dtype)
+        properties = np.array(properties, dtype=self.dtype)
+        n = state.shape[-1] // 2
+        if state.shape[-1] != 2*n or properties.shape[-1] != 2*n:
+            raise ValueError("states and properties must have 2N values "
+                             "along the last axis")
+        self.properties, self.origin = properties, origin
+        self._reconstructed = None
+
+        self.trajectory = TrajectoryBuffer.for_duration(
+            channels=('time',), simulation_time=simulation_time
+            , timestep=timestep, dtype=self.dtype)
+        self.states = TrajectoryBuffer.for_duration(
+            channels=('theta', 'w'), simulation_time=simulation_time
+            , timestep=timestep, member_shape=state.shape[:-1] + (n,)
+            , dtype=self.dtype)
+        time = 0
+        self.trajectory.append(time)
+        self.states.append(state[..., :n], state[..., n:])
+
+        func, state, canonical = self.equations_of_motion(propagator=propagator
+                                                          , state=state
+                                                          , properties=properties)
+        velocity_state = self.momentum_to_velocity(state, properties) if canonical else state
+        while time < simulation_time:
+            time, state = propagator(rhs_func=func
+                                      , time=time
+                                      , state=state
+                                      , timestep=timestep)
+            velocity_state = self.momentum_to_velocity(state, properties) if canonical else state
+            self.trajectory.append(time)
+            self.states.append(velocity_state[..., :n], velocity_state[..., n:])
+        return velocity_state
+
+    def equations_of_motion(self, propagator: MethodType|FunctionType
+                            , state: np.ndarray, properties: np.ndarray):
+        '''
+            Chooses the RHS matching the propagator, as
+            DoublePendulumDynamics.equations_of_motion does.
+
+            Returns:
+            ---------
+            tuple: (rhs function, state, bool canonical)
+        '''
+        integrator = getattr(propagator, '__self__', propagator)
+        if getattr(integrator, 'canonical', False):
+            func = partial(self.chain_hamiltonian_dynamics, properties=properties)
+            return func, self.velocity_to_momentum(state, properties), True
+        func = partial(self.chain_dynamics, properties=properties)
+        return func, state, False
+
+    def velocity_to_momentum(self, state: np.ndarray, properties: np.ndarray):
+        '''
+            Converts (theta, w) to the canonical state (theta, p), p = M w.
+        '''
+        n = state.shape[-1] // 2
+        theta, w = state[..., :n], state[..., n:]
+        mass_matrix, _, _ = calculate_chain_mass_matrix(theta, properties)
+        momentum = np.einsum('...ij,...j->...i', mass_matrix, w)
+        return np.concatenate([theta, momentum], axis=-1).astype(np.result_type(state))
+
+    def momentum_to_velocity(self, state: np.ndarray, properties: np.ndarray):
+        '''
+            Converts the canonical state (theta, p) to (theta, w).
+        '''
+        n = state.shape[-1] // 2
+        theta, momentum = state[..., :n], state[..., n:]
+        mass_matrix, _, _ = calculate_chain_mass_matrix(theta, properties)
+        w = np.linalg.solve(mass_matrix, momentum[..., None])[..., 0]
+        return np.concatenate([theta, w], axis=-1).astype(np.result_type(state))
+
+    def chain_dynamics(self, state: np.ndarray, properties: np.ndarray):
+        '''
+            Function defines the RHS of N-link chains: solves
+            M(theta) dw/dt = - S(theta) w**2 - g * tail * length * sin(theta)
+            for all chains at once, see calculate_chain_mass_matrix.
+        '''
+        n = state.shape[-1] // 2
+        theta, w = state[..., :n], state[..., n:]
+        mass_matrix, sine_coupling, tail = calculate_chain_mass_matrix(theta, properties)
+        lengths = properties[..., n:]
+
+        forcing = (- np.einsum('...ij,...j->...i', sine_coupling, w**2)
+                   - 9.82 * tail * lengths * np.sin(theta))
+        acceleration = np.linalg.solve(mass_matrix, forcing[..., None])[..., 0]
+
+        if acceleration.ndim == 1:
+            return np.concatenate([w, acceleration]).astype(np.result_type(state)
+                                                            , copy=False)
+        derivative = np.empty(acceleration.shape[:-1] + (2*n,), dtype=np.result_type(state))
+        derivative[..., :n] = w
+        derivative[..., n:] = acceleration
+        return derivative
+
+    def chain_hamiltonian_dynamics(self, state: np.ndarray
+                                   , properties: np.ndarray
+                                   , part: str = 'full'):
+        '''
+            Function defines the RHS of Hamilton's equations of N-link chains,
+            (dH/dp, -dH/dtheta), for the canonical state (theta, p). part
+            selects the equations of the 'kinetic' or 'potential' energy
+            alone, as used by splitting integrators.
+        '''
+        if part not in ['full', 'kinetic', 'potential']:
+            raise ValueError("part must be 'full', 'kinetic' or 'potential'")
+        n = state.shape[-1] // 2
+        theta, momentum = state[..., :n], state[..., n:]
+        mass_matrix, sine_coupling, tail = calculate_chain_mass_matrix(theta, properties)
+        lengths = properties[..., n:]
+
+        derivative = np.zeros(np.broadcast_shapes(theta.shape, tail.shape)[:-1] + (2*n,)
+                              , dtype=np.result_type(state))
+        if part != 'potential':
+            w = np.linalg.solve(mass_matrix, momentum[..., None])[..., 0]
+            derivative[..., :n] = w
+            # dT/dtheta_k at fixed w, the centripetal coupling of link k
+            derivative[..., n:] = - w * np.einsum('...ij,...j->...i', sine_coupling, w)
+        if part != 'kinetic':
+            derivative[..., n:] -= 9.82 * tail * lengths * np.sin(theta)
+        return derivative
+
+
+class PendulumChainSimulation(PendulumChainDynamics):
+    '''
+        A simulator for a single pendulum chain.
+    '''
+    def run_simulation(self, chain: PendulumChain
+                           , propagator: MethodType|FunctionType
+                           , simulation_time: float|int
+                           , timestep: float):
+        '''
+            Calculates the path of the chain, recording its state. The chain
+            is left in the final state.
+
+            :param chain: the pendulum chain, with its initial state set
+            :param propagator: an integrator method, e.g.
+                            RungeKuttaIntegrator.propagate_state
+        '''
+        velocity_state = self._integrate(state=chain.state, properties=chain.properties
+                                         , propagator=propagator
+                                         , simulation_time=simulation_time
+                                         , timestep=timestep
+                                         , origin=chain.pendula[0].origin)
+        n = len(chain)
+        chain.set_chain(theta=velocity_state[:n], w=velocity_state[n:])
+
+
+class PendulumChainEnsembleSimulation(PendulumChainDynamics):
+    '''
+        A simulator for an ensemble of B pendulum chains, integrated together
+        as one (B, 2N) state array. Results are (T, B, N) arrays.
+    '''
+    def run_simulation(self, initial_states: np.ndarray
+                           , properties: np.ndarray
+                           , propagator: MethodType|FunctionType
+                           , simulation_time: float|int
+                           , timestep: float
+                           , origin: np.ndarray|list = (0, 0)):
+        '''
+            Calculates the paths of all chains in the ensemble.
+
+            Parameters:
+            ----------------
+            initial_states:  array of shape (B, 2N), rows (theta, w)
+            properties:      array of shape (B, 2N) or (2N,), rows
+                             (masses, lengths)
+            propagator:      an integrator method
+            simulation_time: duration of the simulation
+            timestep:        timestep of propagation
+            origin:          hang-point shared by all chains
+        '''
+        initial_states = np.asarray(initial_states)
+        if initial_states.ndim != 2:
+            raise ValueError("initial_states must have shape (B, 2N)")
+        self._integrate(state=initial_states, properties=properties
+                        , propagator=propagator, simulation_time=simulation_time
+                        , timestep=timestep, origin=origin)
+
     
 if __name__ == '__main__':
 
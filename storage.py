@@ -0,0 +1,296 @@
+# --------------
+# A chunked, memory-mapped file format for (ensemble) trajectories
+# --------------
+# Layout: an 8 byte magic, the header length as uint64, a JSON header padded
+# to a multiple of ALIGNMENT, the member properties as a float64 (N, 4) block
+# padded likewise, then the time chunks. Each chunk holds the times of its
+# chunk_steps steps followed by one (chunk_steps, N) block per channel, all in
+# the data dtype, so a chunk is column oriented and members are contiguous
+# within a step.
+import json
+import numpy as np
+from functools import partial
+
+from pendulum import calculate_double_pendulum_positions
+
+MAGIC = b'DPTRAJ01'
+ALIGNMENT = 4096
+
+
+def _padded(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+class TrajectoryWriter():
+    '''
+        Writes a trajectory file chunk by chunk, so runs larger than memory
+        can be streamed to disk. Use as a context manager, or call close.
+    '''
+    def __init__(self, path: str
+                 , n_members: int
+                 , properties: np.ndarray|list
+                 , timestep: float
+                 , channels: list|tuple = ('theta1', 'theta2', 'w1', 'w2')
+                 , chunk_steps: int = 1024
+                 , dtype: type = np.float32
+                 , integrator: str = ''
+                 , origin: np.ndarray|list = (0, 0)):
+        '''
+            Parameters:
+            -------------------------
+            path:        file to create
+            n_members:   number of ensemble members, 1 for a single run
+            properties:  (mass1, mass2, length1, length2), shape (4,) or (N, 4)
+            timestep:    timestep of the run
+            channels:    names of the recorded quantities per member
+            chunk_steps: number of steps per chunk
+            dtype:       data type of the stored values
+            integrator:  name of the integrator, stored in the header
+            origin:      hang-point of the upper pendula, shape (2,), or
+                         (2, N) for one per member
+        '''
+        properties = np.broadcast_to(np.asarray(properties, dtype=np.float64)
+                                     , (n_members, 4))
+        origin = np.asarray(origin, dtype=np.float64)
+        if origin.shape not in [(2,), (2, n_members)]:
+            raise ValueError("origin must have shape (2,) or (2, n_members)")
+        self.header = {'n_members': int(n_members)
+                       , 'channels': list(channels)
+                       , 'chunk_steps': int(chunk_steps)
+                       , 'dtype': np.dtype(dtype).str
+                       , 'timestep': float(timestep)
+                       , 'integrator': integrator
+                       , 'origin': origin.tolist()
+                       , 'n_steps': 0}
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._file = open(path, 'wb')
+        # reserve room for the header to grow by its own size and the final
+        # step count
+        self.header['header_size'] = _padded(len(json.dumps(self.header)) + 16 + 128)
+        self._file.write(b'\0' * self.header['header_size'])
+        self._file.write(properties.tobytes())
+        self._file.write(b'\0' * (_padded(properties.nbytes) - properties.nbytes))
+
+        self._times = np.empty(chunk_steps, dtype=self.dtype)
+        self._chunk = np.empty((len(channels), chunk_steps, n_members), dtype=self.dtype)
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, time: float, *values):
+        '''
+            Records one step, values given in channel order as arrays of
+            shape (N,).
+        '''
+        self._times[self._size] = time
+        for i, value in enumerate(values):
+            self._chunk[i, self._size] = value
+        self._size += 1
+        self.header['n_steps'] += 1
+        if self._size == len(self._times):
+            self._flush()
+
+    def extend(self, times: np.ndarray, *values):
+        '''
+            Records several steps, values given in channel order as arrays
+            of shape (n, N).
+        '''
+        start = 0
+        while start < len(times):
+            n = min(len(times) - start, len(self._times) - self._size)
+            self._times[self._size:self._size+n] = times[start:start+n]
+            for i, value in enumerate(values):
+                self._chunk[i, self._size:self._size+n] = np.reshape(
+                    value[start:start+n], (n, -1))
+            self._size += n
+            self.header['n_steps'] += n
+            start += n
+            if self._size == len(self._times):
+                self._flush()
+
+    def append_chunk(self, chunk):
+        '''
+            Records a TrajectoryChunk of a single run, as yielded by
+            DoublePendulumSimulation.iter_simulation.
+        '''
+        self.extend(chunk.time, chunk.theta[:, 0], chunk.theta[:, 1]
+                    , chunk.omega[:, 0], chunk.omega[:, 1])
+
+    def _flush(self):
+        '''
+            Writes the current chunk; a partial chunk is padded.
+        '''
+        self._file.write(self._times.tobytes())
+        self._file.write(self._chunk.tobytes())
+        self._size = 0
+
+    def close(self):
+        '''
+            Writes the last partial chunk and the final header.
+        '''
+        if self._file.closed:
+            return
+        if self._size > 0:
+            self._flush()
+        header = json.dumps(self.header).encode()
+        self._file.seek(0)
+        self._file.write(MAGIC + np.uint64(len(header)).tobytes() + header)
+        self._file.close()
+
+
+class TrajectoryFile():
+    '''
+        Reads a trajectory file lazily through a memory map. Slicing by
+        member and time range only reads the chunks touched.
+    '''
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            if file.read(8) != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            length = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+            self.header = json.loads(file.read(length))
+
+        self.path = path
+        self.dtype = np.dtype(self.header['dtype'])
+        self.n_members = self.header['n_members']
+        self.n_steps = self.header['n_steps']
+        self.channels = self.header['channels']
+        self.chunk_steps = self.header['chunk_steps']
+        self.timestep = self.header['timestep']
+        self.integrator = self.header['integrator']
+        self.origin = np.array(self.header['origin'])
+
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        header_size = self.header['header_size']
+        properties_size = self.n_members * 4 * 8
+        self.properties = np.ndarray((self.n_members, 4), dtype=np.float64
+                                     , buffer=self._map, offset=header_size)
+        self._data_offset = header_size + _padded(properties_size)
+        self._chunk_size = (self.chunk_steps * (1 + len(self.channels) * self.n_members)
+                            * self.dtype.itemsize)
+
+    def __len__(self):
+        return self.n_steps
+
+    def _chunk(self, index: int):
+        '''
+            Views of the times and channel blocks of one chunk.
+        '''
+        offset = self._data_offset + index * self._chunk_size
+        times = np.ndarray((self.chunk_steps,), dtype=self.dtype
+                           , buffer=self._map, offset=offset)
+        data = np.ndarray((len(self.channels), self.chunk_steps, self.n_members)
+                          , dtype=self.dtype, buffer=self._map
+                          , offset=offset + self.chunk_steps * self.dtype.itemsize)
+        return times, data
+
+    def _read(self, channel: int|None, steps: slice, members):
+        '''
+            Reads the time (channel None) or a channel over a range of steps.
+        '''
+        start, stop, step = steps.indices(self.n_steps)
+        if step != 1:
+            return self._read(channel, slice(start, stop), members)[::step]
+        pieces = []
+        for index in range(start // self.chunk_steps
+                           , -(-stop // self.chunk_steps)):
+            times, data = self._chunk(index)
+            first = max(start - index*self.chunk_steps, 0)
+            last = min(stop - index*self.chunk_steps, self.chunk_steps)
+            if channel is None:
+                pieces.append(times[first:last])
+            else:
+                pieces.append(data[channel, first:last][:, members])
+        if not pieces:
+            shape = (0,)
+            if channel is not None:
+                shape += np.empty(self.n_members)[members].shape
+            return np.empty(shape, dtype=self.dtype)
+        return np.concatenate(pieces)
+
+    def time(self, steps: slice = slice(None)) -> np.ndarray:
+        '''
+            Reads the times of a range of steps.
+        '''
+        return self._read(None, steps, slice(None))
+
+    def read(self, channel: str, steps: slice = slice(None)
+             , members: slice|int|list = slice(None)) -> np.ndarray:
+        '''
+            Reads a channel for a range of steps and members, shape
+            (steps, members), or (steps,) for a single integer member.
+        '''
+        return self._read(self.channels.index(channel), steps, members)
+
+    def member_origin(self, index: int) -> np.ndarray:
+        '''
+            Hang-point of one member, shape (2,).
+        '''
+        return self.origin if self.origin.ndim == 1 else self.origin[:, index]
+
+    def member(self, index: int):
+        '''
+            Lazy view of one member, exposing the attributes of a simulation
+            (time, x1, y1, x2, y2), e.g. for DoublePendulumAnimation.
+        '''
+        return TrajectoryMember(self, index)
+
+
+class LazyChannel():
+    '''
+        A read-on-access, array-like channel of a single member.
+    '''
+    def __init__(self, read, length: int):
+        self._read = read
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._read(key)
+        index = range(self._length)[key]
+        return self._read(slice(index, index+1))[0]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self._read(slice(None)), dtype=dtype)
+
+
+class TrajectoryMember():
+    '''
+        One member of a TrajectoryFile. Stored channels are read lazily, and
+        missing cartesian coordinates are computed from the stored angles.
+    '''
+    def __init__(self, trajectory: TrajectoryFile, index: int):
+        self.trajectory = trajectory
+        self.index = index
+        self.properties = trajectory.properties[index]
+        n = len(trajectory)
+        self.time = LazyChannel(trajectory.time, n)
+        for name in ['theta1', 'theta2', 'w1', 'w2', 'x1', 'y1', 'x2', 'y2']:
+            if name in trajectory.channels:
+                read = partial(trajectory.read, name, members=index)
+                setattr(self, name, LazyChannel(read, n))
+        for i, name in enumerate(['x1', 'y1', 'x2', 'y2']):
+            if not hasattr(self, name):
+                setattr(self, name, LazyChannel(partial(self._position, i), n))
+
+    def _position(self, i: int, steps: slice):
+        return self.positions(steps)[i]
+
+    def positions(self, steps: slice = slice(None)):
+        '''
+            Computes (x1, y1, x2, y2) for a range of steps from the angles.
+        '''
+        return calculate_double_pendulum_positions(
+            theta1=self.trajectory.read('theta1', steps, self.index)
+            , theta2=self.trajectory.read('theta2', steps, self.index)
+            , length1=self.properties[2], length2=self.properties[3]
+            , origin=self.trajectory.member_origin(self.index))
+
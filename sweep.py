@@ -0,0 +1,267 @@
+# --------------
+# Parameter sweeps over masses, lengths and initial conditions
+# --------------
+import os
+import inspect
+import itertools
+import time as timer
+import numpy as np
+
+from simulator import DoublePendulumEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from diagnostics import EnergyDiagnostics
+from pendulum import calculate_double_pendulum_energy
+from helper import SharedBatchPool
+from helper import save_arrays_atomic
+
+# columns of the result table
+COLUMNS = ('max_angle1', 'max_angle2', 'flips', 'energy_drift', 'lyapunov')
+
+
+def _sweep_batch(table: np.ndarray, rows: slice
+                 , properties: np.ndarray, initial_states: np.ndarray
+                 , simulation_time: float, timestep: float, integrator
+                 , dtype: type, perturbation: float, renormalize_steps: int):
+    '''
+        Integrates the rows of one batch as a single ensemble, together with
+        a perturbed twin of every row, and writes their statistics into
+        table. properties and initial_states hold the rows of the batch
+        only, so no worker is sent the whole sweep.
+
+        Returns:
+        ---------
+        int: number of rows computed
+    '''
+    simulation = DoublePendulumEnsembleSimulation(dtype=dtype)
+    n = len(initial_states)
+    properties = np.tile(np.asarray(properties, dtype=dtype), (2, 1))
+    state = np.tile(np.asarray(initial_states, dtype=dtype), (2, 1))
+    state[n:, 0] += perturbation
+
+    func, state, canonical = simulation.equations_of_motion(
+        propagator=integrator.propagate_state, state=state, properties=properties)
+    def velocity(state):
+        return simulation.momentum_to_velocity(state, properties) if canonical else state
+
+    initial = EnergyDiagnostics(*velocity(state)[:n].T, properties=properties[:n])
+    energy0, scale = initial.total, initial.scale
+    distance0 = np.linalg.norm(state[n:] - state[:n], axis=1)
+    winding = np.floor((velocity(state)[:n, :2] + np.pi) / (2*np.pi))
+    max_angle = np.abs(velocity(state)[:n, :2])
+    flips = np.zeros(n)
+    energy_drift = np.zeros(n)
+    log_stretch = np.zeros(n)
+
+    time, steps = 0, 0
+    while time < simulation_time:
+        time, state = integrator.propagate_state(rhs_func=func, time=time
+                                                 , state=state, timestep=timestep)
+        steps += 1
+        current = velocity(state)[:n]
+        max_angle = np.maximum(max_angle, np.abs(current[:, :2]))
+        new_winding = np.floor((current[:, :2] + np.pi) / (2*np.pi))
+        flips += np.sum(np.abs(new_winding - winding), axis=1)
+        winding = new_winding
+        kinetic, potential = calculate_double_pendulum_energy(
+            *current.T, properties=properties[:n])
+        energy_drift = np.maximum(energy_drift, np.abs(kinetic + potential - energy0))
+
+        if steps % renormalize_steps == 0 or time >= simulation_time:
+            # pull the twins back to the initial distance, keeping the
+            # direction of separation
+            separation = state[n:] - state[:n]
+            distance = np.maximum(np.linalg.norm(separation, axis=1)
+                                  , np.finfo(state.dtype).tiny)
+            log_stretch += np.log(distance / distance0)
+            state = state.copy()
+            state[n:] = state[:n] + separation * (distance0 / distance)[:, None]
+
+    table[rows] = np.column_stack([max_angle, flips, energy_drift / scale
+                                   , log_stretch / time])
+    return n
+
+
+class ParameterSweep():
+    '''
+        Runs double pendula over a table of physical parameters and initial
+        conditions, and summarizes every run by the statistics in COLUMNS:
+        the largest |theta1| and |theta2|, the number of flips of either
+        arm, the largest energy drift relative to EnergyDiagnostics.scale,
+        and a finite-time estimate of the largest Lyapunov exponent from a
+        twin run perturbed in theta1, renormalized every renormalize_steps.
+
+        Rows are integrated as ensembles of batch_size over a process pool,
+        which writes into one table in shared memory. With a path, the
+        table is saved after every batch, and a sweep interrupted or
+        crashed midway continues from there when run again.
+    '''
+    def __init__(self, properties: np.ndarray|list
+                 , initial_states: np.ndarray|list
+                 , simulation_time: float|int = 10
+                 , timestep: float = 0.01
+                 , integrator=None
+                 , batch_size: int = 256
+                 , workers: int|None = None
+                 , dtype: type = np.float64
+                 , perturbation: float = 1e-8
+                 , renormalize_steps: int = 10
+                 , path: str|None = None):
+        '''
+            Parameters:
+            -------------------------
+            properties:        rows (mass1, mass2, length1, length2), shape
+                               (M, 4), or (4,) for all rows
+            initial_states:    rows (theta1, theta2, w1, w2), shape (M, 4),
+                               or (4,) for all rows
+            simulation_time:   duration of every run
+            timestep:          timestep of propagation
+            integrator:        integrator instance, RungeKuttaIntegrator()
+                               by default
+            batch_size:        rows integrated together
+            workers:           size of the process pool, 0 computes in this
+                               process
+            dtype:             precision of the integration
+            perturbation:      initial separation of the twin runs
+            renormalize_steps: steps between renormalizations of the twins
+            path:              optional .npz file to save progress to
+        '''
+        properties = np.array(properties, dtype=np.float64, ndmin=2)
+        initial_states = np.array(initial_states, dtype=np.float64, ndmin=2)
+        rows = max(len(properties), len(initial_states))
+        self.properties = np.broadcast_to(properties, (rows, 4)).copy()
+        self.initial_states = np.broadcast_to(initial_states, (rows, 4)).copy()
+        self.simulation_time = simulation_time
+        self.timestep = timestep
+        self.integrator = RungeKuttaIntegrator() if integrator is None else integrator
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dtype = dtype
+        self.perturbation = perturbation
+        self.renormalize_steps = renormalize_steps
+        self.path = path
+
+        self.table = np.full((rows, len(COLUMNS)), np.nan)
+        self.done = np.zeros(self._batches(), dtype=bool)
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def grid(cls, mass1: list|tuple = (1,), mass2: list|tuple = (1,)
+             , length1: list|tuple = (1,), length2: list|tuple = (1,)
+             , initial_states: np.ndarray|list = ((np.pi/2, np.pi/2, 0, 0),)
+             , **kwargs):
+        '''
+            A sweep over every combination of the given masses, lengths and
+            initial states, with the initial states varying fastest.
+        '''
+        initial_states = np.array(initial_states, dtype=np.float64, ndmin=2)
+        combinations = list(itertools.product(mass1, mass2, length1, length2
+                                              , range(len(initial_states))))
+        properties = np.array([combination[:4] for combination in combinations])
+        states = initial_states[[combination[4] for combination in combinations]]
+        return cls(properties=properties, initial_states=states, **kwargs)
+
+    def __len__(self):
+        return len(self.table)
+
+    def _batches(self) -> int:
+        return -(-len(self.table) // self.batch_size)
+
+    def _batch_rows(self, batch: int) -> slice:
+        return slice(batch * self.batch_size
+                     , min((batch+1) * self.batch_size, len(self.table)))
+
+    def _settings(self) -> np.ndarray:
+        return np.array([self.simulation_time, self.timestep, self.batch_size
+                         , self.perturbation, self.renormalize_steps])
+
+    def _integrator_settings(self) -> str:
+        '''
+            The integrator with the parameters it was created with and its
+            version, e.g. DormandPrinceIntegrator(rtol=1e-06, ...) version 1.
+        '''
+        parameters = inspect.signature(type(self.integrator).__init__).parameters
+        arguments = [f"{name}={getattr(self.integrator, name, None)!r}"
+                     for name in list(parameters)[1:]]
+        return (f"{type(self.integrator).__name__}({', '.join(arguments)})"
+                f" version {getattr(self.integrator, 'version', None)}")
+
+    def _save(self):
+        save_arrays_atomic(self.path, table=self.table, done=self.done
+                           , properties=self.properties
+                           , initial_states=self.initial_states
+                           , settings=self._settings()
+                           , dtype=np.dtype(self.dtype).str
+                           , integrator=self._integrator_settings())
+
+    def _load(self):
+        '''
+            Restores the progress saved in path, if it belongs to this sweep.
+        '''
+        with np.load(self.path) as saved:
+            if not (np.array_equal(saved['properties'], self.properties)
+                    and np.array_equal(saved['initial_states'], self.initial_states)
+                    and np.array_equal(saved['settings'], self._settings())
+                    and 'dtype' in saved
+                    and str(saved['dtype']) == np.dtype(self.dtype).str
+                    and str(saved['integrator']) == self._integrator_settings()):
+                raise ValueError(f"{self.path} holds a different sweep")
+            self.table[:] = saved['table']
+            self.done[:] = saved['done']
+
+    def run(self):
+        '''
+            Computes the batches not yet done, saving after each one if the
+            sweep has a path. The throughput is stored in self.rows_per_second.
+
+            Returns:
+            ---------
+            dict: column name to array (M,)
+        '''
+        batches = np.flatnonzero(~self.done)
+        batch_kwargs = {}
+        for batch in batches:
+            rows = self._batch_rows(batch)
+            batch_kwargs[batch] = {'rows': rows
+                                   , 'properties': self.properties[rows]
+                                   , 'initial_states': self.initial_states[rows]
+                                   , 'simulation_time': self.simulation_time
+                                   , 'timestep': self.timestep
+                                   , 'integrator': self.integrator
+                                   , 'dtype': self.dtype
+                                   , 'perturbation': self.perturbation
+                                   , 'renormalize_steps': self.renormalize_steps}
+
+        start = timer.perf_counter()
+        computed = 0
+        with SharedBatchPool(shape=self.table.shape, workers=self.workers) as pool:
+            table = pool.array
+            table[:] = self.table
+            for batch, n in pool.run(_sweep_batch, batch_kwargs):
+                computed += n
+                rows = self._batch_rows(batch)
+                self.table[rows] = table[rows]
+                self.done[batch] = True
+                if self.path is not None:
+                    self._save()
+        self.rows_per_second = computed / max(timer.perf_counter() - start, 1e-9)
+        return self.results()
+
+    def results(self) -> dict:
+        '''
+            The statistics computed so far, nan for rows not yet done.
+        '''
+        return dict(zip(COLUMNS, self.table.T))
+
+
+if __name__ == '__main__':
+
+    sweep = ParameterSweep.grid(mass2=np.linspace(0.2, 2, 10)
+                                , length2=np.linspace(0.2, 2, 10)
+                                , initial_states=[(np.pi/2, np.pi/2, 0, 0)
+                                                  , (2, 2, 0, 0)]
+                                , simulation_time=10, batch_size=50)
+    results = sweep.run()
+    print(f"{len(sweep)} runs at {sweep.rows_per_second:.1f} runs/s")
+    for name, values in results.items():
+        print(f"{name:<14s} min {np.min(values):10.3g}  max {np.max(values):10.3g}")
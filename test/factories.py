@@ -0,0 +1,28 @@
+# -----------
+#    Pendula shared by the tests
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import numpy as np
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+
+
+def make_double_pendulum(theta1: float|int = np.pi/2, theta2: float|int = np.pi/2
+                         , w1: float|int = 0, w2: float|int = 0
+                         , mass1: float|int = 1, mass2: float|int = 1
+                         , length1: float|int = 1, length2: float|int = 1
+                         , origin: np.ndarray|list|None = None) -> DoublePendulum:
+    '''
+        Returns a double pendulum in the given state, by default of unit
+        masses and lengths, hanging from the origin and released at rest.
+    '''
+    origin = [0, 0] if origin is None else origin
+    pendulum1 = Pendulum(mass=mass1, length=length1, origin=origin)
+    pendulum2 = Pendulum(mass=mass2, length=length2)
+    double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+    double_pendulum.set_double_pendulum(theta1=theta1, w1=w1
+                                       , theta2=theta2, w2=w2)
+    return double_pendulum
@@ -0,0 +1,205 @@
+# -----------
+#    Tests for the animation classes
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import time
+import unittest
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+from pendulum import DoublePendulumEnsemble
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from animation import BlittedDoublePendulumAnimation
+from animation import EnsembleAnimation
+from animation import LiveDoublePendulumAnimation
+
+
+class BlittedDoublePendulumAnimationTests(unittest.TestCase):
+    '''
+        A test case for the BlittedDoublePendulumAnimation class
+    '''
+    def setUp(self):
+        pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+        pendulum2 = Pendulum(mass=1, length=1)
+        self.double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+        self.double_pendulum.set_double_pendulum(theta1=np.pi/2, w1=0
+                                                , theta2=np.pi/3, w2=0)
+        self.simulation = DoublePendulumSimulation()
+        self.simulation.run_simulation(double_pendulum=self.double_pendulum
+                                       , propagator=RungeKuttaIntegrator().propagate_state
+                                       , simulation_time=2, timestep=0.001)
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_resampling(self):
+        '''
+            Tests that frames follow the frame rate, not the timestep.
+        '''
+        animation = BlittedDoublePendulumAnimation(simulation=self.simulation
+                                                   , double_pendulum=self.double_pendulum
+                                                   , fps=25)
+        self.assertGreaterEqual(len(animation.t), 50)
+        self.assertLessEqual(animation.t[-1], self.simulation.time[-1])
+        np.testing.assert_allclose(np.diff(animation.t), 1/25)
+        step = np.argmin(np.abs(self.simulation.time - animation.t[10]))
+        self.assertAlmostEqual(animation.x2[10], self.simulation.x2[step], 5)
+
+    def test_ring_buffer_tail(self):
+        '''
+            Tests that the tail drawn from the ring buffer is the slice the
+            base class draws, for consecutive and for jumping frames.
+        '''
+        animation = BlittedDoublePendulumAnimation(simulation=self.simulation
+                                                   , double_pendulum=self.double_pendulum
+                                                   , fps=50, tail_fraction=0.1)
+        animation.initialize_animation()
+        artists = animation._init_blit()
+        length = animation.tail_length
+        for frame in list(range(30)) + [5, 6, 90]:
+            with self.subTest(frame=frame):
+                self.assertEqual(len(animation.update_frame(frame)), len(artists))
+                x, y = animation._trace_artist.get_data()
+                start = max(frame - length, 0)
+                np.testing.assert_array_equal(x, animation.x2[start:frame])
+                np.testing.assert_array_equal(y, animation.y2[start:frame])
+
+
+class EnsembleAnimationTests(unittest.TestCase):
+    '''
+        A test case for the EnsembleAnimation class
+    '''
+    def setUp(self):
+        states = np.zeros((500, 4))
+        states[:, 0] = np.pi/2
+        states[:, 1] = np.pi/2 + np.linspace(0, 1e-3, 500)
+        self.ensemble = DoublePendulumEnsembleSimulation()
+        self.ensemble.run_simulation(initial_states=states, properties=[1, 1, 1, 1]
+                                     , propagator=RungeKuttaIntegrator().propagate_state
+                                     , simulation_time=5, timestep=0.01
+                                     , origin=[1, 0])
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_collection_artists(self):
+        '''
+            Tests that all members are drawn by two artists, from the
+            positions of the nearest recorded step.
+        '''
+        animation = EnsembleAnimation(simulation=self.ensemble, fps=10)
+        animation.initialize_animation()
+        frame = 20
+        artists = animation.update_frame(frame)
+
+        self.assertEqual(len(artists), 3)
+        self.assertEqual(len(animation._ax.collections), 2)
+        step = animation.steps[frame]
+        self.assertAlmostEqual(self.ensemble.time[step], 2, 5)
+        segments = animation._lines_artist.get_segments()
+        self.assertEqual(len(segments), 500)
+        np.testing.assert_allclose(segments[7], [[1, 0]
+                                                 , [self.ensemble.x1[step, 7], self.ensemble.y1[step, 7]]
+                                                 , [self.ensemble.x2[step, 7], self.ensemble.y2[step, 7]]]
+                                   , atol=1e-6)
+        self.assertEqual(animation._bobs_artist.get_offsets().shape, (1000, 2))
+
+    def test_divergence_colors(self):
+        '''
+            Tests that members are colored by the distance of their lower bob
+            from member 0, which grows as the ensemble diverges.
+        '''
+        animation = EnsembleAnimation(simulation=self.ensemble, fps=10
+                                      , color_by='divergence')
+        animation.initialize_animation()
+        early = np.array(animation._lines_artist.get_array())
+        animation.update_frame(len(animation.t)-1)
+        late = np.array(animation._lines_artist.get_array())
+
+        self.assertEqual(late[0], 0)
+        self.assertGreater(late.max(), early.max())
+        with self.assertRaises(ValueError):
+            EnsembleAnimation(simulation=self.ensemble, color_by='energy')
+
+    def test_member_origins(self):
+        '''
+            Tests that members of a DoublePendulumEnsemble hang from their
+            own hang-points, and that all of them are in view.
+        '''
+        ensemble = DoublePendulumEnsemble(5, origin=[np.arange(5), np.zeros(5)])
+        ensemble.state[:, 0] = np.pi/2
+        simulation = DoublePendulumEnsembleSimulation()
+        simulation.run_ensemble(ensemble, propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=1, timestep=0.01)
+        animation = EnsembleAnimation(simulation=simulation, fps=10)
+        animation.initialize_animation()
+        animation.update_frame(5)
+
+        segments = animation._lines_artist.get_segments()
+        np.testing.assert_allclose([segment[0] for segment in segments]
+                                   , np.column_stack([np.arange(5), np.zeros(5)]))
+        left, right = animation._ax.get_xlim()
+        self.assertLess(left, -2)
+        self.assertGreater(right, 6)
+
+class LiveDoublePendulumAnimationTests(unittest.TestCase):
+    '''
+        A test case for the LiveDoublePendulumAnimation class
+    '''
+    def setUp(self):
+        pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+        pendulum2 = Pendulum(mass=1, length=1)
+        self.double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+        self.double_pendulum.set_double_pendulum(theta1=np.pi/2, w1=0
+                                                , theta2=np.pi/3, w2=0)
+
+    def tearDown(self):
+        plt.close('all')
+
+    def animation(self, **kwargs):
+        return LiveDoublePendulumAnimation(double_pendulum=self.double_pendulum
+                                           , propagator=RungeKuttaIntegrator().propagate_state
+                                           , timestep=0.01, **kwargs)
+
+    def test_backpressure(self):
+        '''
+            Tests that the worker stops integrating once the queue is full,
+            and that closing the frames stops it.
+        '''
+        live = self.animation(queue_size=10, chunk_size=8)
+        live.initialize_animation()
+        time.sleep(0.5)
+        self.assertLessEqual(live.stats['produced'], 10 + 1)
+        self.assertTrue(live._worker.is_alive())
+        live.update_frame(next(live._frames))
+        live._frames.close()
+        self.assertIsNone(live._worker)
+
+    def test_slow_renderer_drops_frames(self):
+        '''
+            Tests that a renderer slower than the clock drops frames, shows
+            them in order and still reaches the end of the run.
+        '''
+        live = self.animation(simulation_time=2, speed=5)
+        times = []
+        for frame in live.iter_frames():
+            times.append(frame[0])
+            time.sleep(0.02)
+
+        self.assertGreater(live.stats['dropped'], 0)
+        self.assertTrue(np.all(np.diff(times) >= 0))
+        self.assertGreaterEqual(times[-1], 2 - 1/30)
+        self.assertEqual(live.stats['rendered'] + live.stats['dropped']
+                         , live.stats['produced'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
@@ -0,0 +1,53 @@
+# -----------
+#    Tests for the benchmark suite
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import tempfile
+import unittest
+
+from benchmark import SUITE
+from benchmark import run_suite
+from benchmark import compare_to_baseline
+from benchmark import write_results
+from benchmark import read_results
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+    '''
+        A test case for the benchmark suite and its baseline comparison
+    '''
+    def test_round_trip_and_comparison(self):
+        '''
+            Tests that results written to JSON compare against themselves
+            without regressions, and that a slowdown is flagged.
+        '''
+        results = run_suite(names=['rhs'], quick=True, repeat=1)
+        self.assertEqual({result['params']['dtype'] for result in results}
+                         , {'float32', 'float64'})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            write_results(path, results)
+            baseline = read_results(path)
+
+        comparison = compare_to_baseline(results, baseline, threshold=1.5)
+        self.assertEqual(len(comparison), len(results))
+        self.assertFalse(any(entry['regression'] for entry in comparison))
+
+        slower = [dict(result, seconds=2*result['seconds']) for result in results]
+        comparison = compare_to_baseline(slower, baseline, threshold=1.5)
+        self.assertTrue(all(entry['regression'] for entry in comparison))
+        self.assertEqual(compare_to_baseline(results, [], threshold=1.5), [])
+
+    def test_committed_baseline(self):
+        '''
+            Tests that the committed baseline covers every benchmark of the
+            suite, so --baseline compares all of them.
+        '''
+        baseline = read_results(os.path.join(os.path.dirname(__file__), os.path.pardir
+                                             , 'benchmark_baseline.json'))
+        self.assertEqual({result['benchmark'] for result in baseline}, set(SUITE))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
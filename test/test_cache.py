@@ -0,0 +1,125 @@
+# -----------
+#    Tests for the simulation cache
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import tempfile
+import unittest
+import numpy as np
+
+from simulator import DoublePendulumSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import DormandPrinceIntegrator
+from cache import SimulationCache
+from factories import make_double_pendulum
+
+
+class SimulationCacheTests(unittest.TestCase):
+    '''
+        A test case for the SimulationCache class
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SimulationCache(self.directory.name)
+        self.propagator = RungeKuttaIntegrator().propagate_state
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def simulate(self, simulation_time: float, cache: bool = True, theta1: float = np.pi/2):
+        '''
+            Returns the simulation, final pendulum and cache status of a run.
+        '''
+        simulation = DoublePendulumSimulation()
+        double_pendulum = make_double_pendulum(theta1=theta1, theta2=np.pi)
+        kwargs = {'double_pendulum': double_pendulum, 'propagator': self.propagator
+                  , 'simulation_time': simulation_time, 'timestep': 0.01}
+        if cache:
+            status = self.cache.run_simulation(simulation=simulation, **kwargs)
+        else:
+            simulation.run_simulation(vectorized_cartesian=True, **kwargs)
+            status = None
+        return simulation, double_pendulum, status
+
+    def assertSameRun(self, simulation, reference):
+        for name in ['time', 'theta1', 'theta2', 'w1', 'w2', 'x2', 'vy2']:
+            with self.subTest(channel=name):
+                np.testing.assert_array_equal(getattr(simulation, name)
+                                              , getattr(reference, name))
+
+    def test_hit_and_prefix(self):
+        '''
+            Tests that a repeated run and a shorter run are loaded from the
+            cache and equal the uncached runs, final pendulum state included.
+        '''
+        self.assertEqual(self.simulate(2)[2], 'miss')
+        for simulation_time in [2, 1.234, 0.005]:
+            with self.subTest(simulation_time=simulation_time):
+                simulation, double_pendulum, status = self.simulate(simulation_time)
+                reference, reference_pendulum, _ = self.simulate(simulation_time, cache=False)
+                self.assertEqual(status, 'hit')
+                self.assertSameRun(simulation, reference)
+                self.assertEqual(double_pendulum.pendulum2.x
+                                 , reference_pendulum.pendulum2.x)
+
+    def test_extension(self):
+        '''
+            Tests that a longer run continues the cached one, bit for bit
+            with the explicit RK4 integrator, and replaces it in the cache.
+        '''
+        self.simulate(1)
+        simulation, _, status = self.simulate(2.5)
+        reference, _, _ = self.simulate(2.5, cache=False)
+        self.assertEqual(status, 'extended')
+        self.assertSameRun(simulation, reference)
+        self.assertEqual(self.simulate(2)[2], 'hit')
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+    def test_key(self):
+        '''
+            Tests that the key changes with the state, timestep, dtype and
+            integrator parameters, but not with the integrator's counters.
+        '''
+        simulation = DoublePendulumSimulation()
+        double_pendulum = make_double_pendulum(theta2=np.pi)
+        integrator = DormandPrinceIntegrator(rtol=1e-6)
+        key = self.cache.key(simulation, double_pendulum
+                             , integrator.propagate_state, timestep=0.01)
+
+        integrator.accepted_steps = 10
+        self.assertEqual(key, self.cache.key(simulation, double_pendulum
+                                             , integrator.propagate_state, 0.01))
+        different = {
+            'state': (simulation, make_double_pendulum(theta1=1.0, theta2=np.pi)
+                      , integrator.propagate_state, 0.01),
+            'timestep': (simulation, double_pendulum, integrator.propagate_state, 0.02),
+            'dtype': (DoublePendulumSimulation(dtype=np.float32), double_pendulum
+                      , integrator.propagate_state, 0.01),
+            'parameters': (simulation, double_pendulum
+                           , DormandPrinceIntegrator(rtol=1e-8).propagate_state, 0.01),
+            'integrator': (simulation, double_pendulum, self.propagator, 0.01)}
+        for name, args in different.items():
+            with self.subTest(changed=name):
+                self.assertNotEqual(key, self.cache.key(*args))
+
+    def test_eviction(self):
+        '''
+            Tests that the least recently used runs are evicted above the
+            size limit, and that a run read from the cache counts as used.
+        '''
+        self.simulate(1, theta1=1.0)
+        self.cache.max_bytes = 2.5 * self.cache.size()
+        self.simulate(1, theta1=2.0)
+        # age the entries, so the next read decides the order
+        for name in os.listdir(self.directory.name):
+            os.utime(os.path.join(self.directory.name, name), (0, 0))
+        self.assertEqual(self.simulate(1, theta1=1.0)[2], 'hit')
+        self.simulate(1, theta1=3.0)
+
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+        self.assertEqual(self.simulate(1, theta1=1.0)[2], 'hit')
+        self.assertEqual(self.simulate(1, theta1=2.0)[2], 'miss')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
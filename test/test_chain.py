@@ -0,0 +1,128 @@
+# -----------
+#    Tests for N-link pendulum chains
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+from pendulum import PendulumChain
+from pendulum import calculate_chain_positions
+from pendulum import calculate_chain_energy
+from simulator import DoublePendulumSimulation
+from simulator import PendulumChainSimulation
+from simulator import PendulumChainEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import GaussLegendreIntegrator
+from integrations import SplittingIntegrator
+
+
+class PendulumChainTests(unittest.TestCase):
+    '''
+        A test case for PendulumChain and its simulators
+    '''
+    def chain(self, masses: list, lengths: list, theta: list, w: list):
+        pendula = [Pendulum(mass=mass, length=length) for mass, length in zip(masses, lengths)]
+        pendula[0].set_origin([0, 0])
+        chain = PendulumChain(pendula)
+        chain.set_chain(theta=theta, w=w)
+        return chain
+
+    def test_positions(self):
+        '''
+            Tests that the bobs hang one below the other, and that the chain
+            positions match those of its pendula.
+        '''
+        x, y = calculate_chain_positions(np.zeros(3), np.array([1, 2, 3]))
+        np.testing.assert_allclose(x, 0, atol=1e-15)
+        np.testing.assert_allclose(y, [-1, -3, -6])
+
+        chain = self.chain([1, 2, 3], [1, 0.5, 2], [0.3, -1, 2], [0, 0, 0])
+        x, y = calculate_chain_positions(np.array([0.3, -1, 2]), np.array([1, 0.5, 2]))
+        for index, pendulum in enumerate(chain.pendula):
+            with self.subTest(pendulum=index):
+                self.assertAlmostEqual(pendulum.x, x[index])
+                self.assertAlmostEqual(pendulum.y, y[index])
+
+    def test_double_pendulum(self):
+        '''
+            Tests that a chain of two reproduces DoublePendulumSimulation.
+        '''
+        for integrator in [RungeKuttaIntegrator, GaussLegendreIntegrator, SplittingIntegrator]:
+            with self.subTest(integrator=integrator.__name__):
+                pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+                pendulum2 = Pendulum(mass=1.5, length=0.7)
+                double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+                double_pendulum.set_double_pendulum(theta1=1.2, w1=0, theta2=2, w2=0.3)
+                reference = DoublePendulumSimulation()
+                reference.run_simulation(double_pendulum=double_pendulum
+                                         , propagator=integrator().propagate_state
+                                         , simulation_time=3, timestep=0.01
+                                         , vectorized_cartesian=True)
+
+                chain = self.chain([1, 1.5], [1, 0.7], [1.2, 2], [0, 0.3])
+                simulation = PendulumChainSimulation()
+                simulation.run_simulation(chain=chain, propagator=integrator().propagate_state
+                                          , simulation_time=3, timestep=0.01)
+
+                np.testing.assert_allclose(simulation.theta, np.column_stack(
+                    [reference.theta1, reference.theta2]), atol=1e-10)
+                np.testing.assert_allclose(simulation.w, np.column_stack(
+                    [reference.w1, reference.w2]), atol=1e-10)
+                np.testing.assert_allclose(simulation.x[:, 1], reference.x2, atol=1e-10)
+                np.testing.assert_allclose(simulation.y[:, 1], reference.y2, atol=1e-10)
+                self.assertAlmostEqual(chain.pendula[1].theta, double_pendulum.pendulum2.theta, 10)
+
+    def test_energy_conservation(self):
+        '''
+            Tests that the energy error of a triple pendulum falls with the
+            fourth power of the timestep, as for fourth order integrators.
+        '''
+        properties = np.array([1, 2, 0.5, 1, 0.8, 1.2])
+        for integrator in [RungeKuttaIntegrator, GaussLegendreIntegrator]:
+            with self.subTest(integrator=integrator.__name__):
+                errors = []
+                for timestep in [0.01, 0.005]:
+                    chain = self.chain(properties[:3], properties[3:], [2, 1, -1], [0, 0, 0])
+                    energy = chain.calculate_mechanical_energy()
+                    simulation = PendulumChainSimulation()
+                    simulation.run_simulation(chain=chain
+                                              , propagator=integrator().propagate_state
+                                              , simulation_time=5, timestep=timestep)
+                    kinetic, potential = calculate_chain_energy(simulation.theta, simulation.w
+                                                                , properties=properties)
+                    errors.append(np.max(np.abs(kinetic + potential - energy)))
+                    self.assertAlmostEqual(chain.calculate_mechanical_energy()
+                                           , kinetic[-1] + potential[-1])
+                self.assertLess(errors[0], 1e-2)
+                self.assertLess(errors[1], errors[0] / 10)
+
+    def test_ensemble(self):
+        '''
+            Tests that the members of an ensemble move as if run alone.
+        '''
+        rng = np.random.default_rng(seed=0)
+        initial_states = np.zeros((5, 8))
+        initial_states[:, :4] = rng.uniform(-2, 2, (5, 4))
+        properties = rng.uniform(0.5, 2, (5, 8))
+        ensemble = PendulumChainEnsembleSimulation()
+        ensemble.run_simulation(initial_states=initial_states, properties=properties
+                                , propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=1, timestep=0.01)
+        self.assertEqual(ensemble.theta.shape[1:], (5, 4))
+        for member in range(5):
+            with self.subTest(member=member):
+                chain = self.chain(properties[member, :4], properties[member, 4:]
+                                   , initial_states[member, :4], [0]*4)
+                single = PendulumChainSimulation()
+                single.run_simulation(chain=chain
+                                      , propagator=RungeKuttaIntegrator().propagate_state
+                                      , simulation_time=1, timestep=0.01)
+                np.testing.assert_allclose(ensemble.theta[:, member], single.theta, atol=1e-12)
+                np.testing.assert_allclose(ensemble.y[:, member], single.y, atol=1e-12)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
@@ -0,0 +1,130 @@
+# -----------
+#    Tests for checkpointing and resuming simulations
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import tempfile
+import unittest
+import numpy as np
+
+from simulator import DoublePendulumSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import DormandPrinceIntegrator
+from integrations import SplittingIntegrator
+from checkpoint import Checkpoint
+from factories import make_double_pendulum
+
+# the state every run starts from
+STATE = {'theta1': 2, 'theta2': 1, 'w1': 0, 'w2': 0.5}
+
+
+class Crash(Exception):
+    pass
+
+
+class CheckpointTests(unittest.TestCase):
+    '''
+        A test case for Checkpoint and DoublePendulumSimulation.resume_simulation
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'checkpoint.npz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def crash(self, time: float, state: np.ndarray):
+        if time > 1.5:
+            raise Crash
+
+    def test_resume_after_crash(self):
+        '''
+            Tests that a run resumed after a crash equals the uninterrupted
+            run bit for bit, including the internal steps of the adaptive
+            integrator.
+        '''
+        for integrator_type in [RungeKuttaIntegrator, DormandPrinceIntegrator
+                                , SplittingIntegrator]:
+            for vectorized_cartesian in [True, False]:
+                with self.subTest(integrator=integrator_type.__name__
+                                  , vectorized_cartesian=vectorized_cartesian):
+                    kwargs = {'simulation_time': 3, 'timestep': 0.01
+                              , 'vectorized_cartesian': vectorized_cartesian}
+                    reference_integrator = integrator_type()
+                    reference = DoublePendulumSimulation()
+                    reference.run_simulation(double_pendulum=make_double_pendulum(**STATE)
+                                             , propagator=reference_integrator.propagate_state
+                                             , **kwargs)
+
+                    checkpoint = Checkpoint(self.path, every_seconds=None, every_steps=37)
+                    with self.assertRaises(Crash):
+                        DoublePendulumSimulation().run_simulation(
+                            double_pendulum=make_double_pendulum(**STATE)
+                            , propagator=integrator_type().propagate_state
+                            , step_callback=self.crash, checkpoint=checkpoint, **kwargs)
+                    self.assertEqual(checkpoint.saves, 4)
+
+                    integrator = integrator_type()
+                    double_pendulum = make_double_pendulum(**STATE)
+                    simulation = DoublePendulumSimulation()
+                    simulation.resume_simulation(double_pendulum=double_pendulum
+                                                 , propagator=integrator.propagate_state
+                                                 , checkpoint=self.path)
+                    for name in ['time', 'x1', 'y2']:
+                        np.testing.assert_array_equal(getattr(simulation, name)
+                                                      , getattr(reference, name))
+                    self.assertEqual(getattr(integrator, 'accepted_steps', None)
+                                     , getattr(reference_integrator, 'accepted_steps', None))
+
+    def test_extend_finished_run(self):
+        '''
+            Tests that a finished run can be extended from its final
+            checkpoint, as if run for the longer time at once.
+        '''
+        propagator = RungeKuttaIntegrator().propagate_state
+        reference = DoublePendulumSimulation()
+        reference.run_simulation(double_pendulum=make_double_pendulum(**STATE)
+                                 , propagator=propagator, simulation_time=2
+                                 , timestep=0.01, vectorized_cartesian=True)
+
+        checkpoint = Checkpoint(self.path, every_seconds=None)
+        DoublePendulumSimulation().run_simulation(double_pendulum=make_double_pendulum(**STATE)
+                                                  , propagator=propagator
+                                                  , simulation_time=1, timestep=0.01
+                                                  , vectorized_cartesian=True
+                                                  , checkpoint=checkpoint)
+        self.assertEqual(checkpoint.saves, 1)
+        simulation = DoublePendulumSimulation()
+        double_pendulum = make_double_pendulum(**STATE)
+        simulation.resume_simulation(double_pendulum=double_pendulum
+                                     , propagator=propagator
+                                     , checkpoint=checkpoint, simulation_time=2)
+        np.testing.assert_array_equal(simulation.theta2, reference.theta2)
+        np.testing.assert_array_equal(simulation.vx2, reference.vx2)
+        self.assertEqual(double_pendulum.pendulum2.w, reference.w2[-1])
+
+    def test_mismatch(self):
+        '''
+            Tests that resuming with another integrator, dtype or double
+            pendulum is refused.
+        '''
+        DoublePendulumSimulation().run_simulation(double_pendulum=make_double_pendulum(**STATE)
+                                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                                  , simulation_time=0.1, timestep=0.01
+                                                  , checkpoint=Checkpoint(self.path))
+        cases = {'integrator': (DoublePendulumSimulation(), make_double_pendulum(**STATE)
+                                , DormandPrinceIntegrator().propagate_state),
+                 'dtype': (DoublePendulumSimulation(dtype=np.float32), make_double_pendulum(**STATE)
+                           , RungeKuttaIntegrator().propagate_state),
+                 'properties': (DoublePendulumSimulation(), make_double_pendulum(mass2=2, **STATE)
+                                , RungeKuttaIntegrator().propagate_state)}
+        for name, (simulation, double_pendulum, propagator) in cases.items():
+            with self.subTest(mismatch=name):
+                with self.assertRaises(ValueError):
+                    simulation.resume_simulation(double_pendulum=double_pendulum
+                                                 , propagator=propagator
+                                                 , checkpoint=self.path)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
@@ -0,0 +1,91 @@
+# -----------
+#    Tests for the trajectory diagnostics
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from diagnostics import EnergyDiagnostics
+
+
+class EnergyDiagnosticsTests(unittest.TestCase):
+    '''
+        A test case for the EnergyDiagnostics class
+    '''
+    def test_matches_double_pendulum(self):
+        '''
+            Tests that the vectorized energies agree with those of
+            DoublePendulum, including a shifted origin.
+        '''
+        states = np.array([[np.pi/2, np.pi/3, 0.5, -1], [0.1, 2, 3, 0.2]])
+        properties = [1.5, 0.5, 2, 0.7]
+        diagnostics = EnergyDiagnostics(*states.T, properties=properties
+                                        , origin=[1, 2])
+        for i, state in enumerate(states):
+            with self.subTest(state=state):
+                pendulum1 = Pendulum(mass=1.5, length=2, origin=[1, 2])
+                pendulum2 = Pendulum(mass=0.5, length=0.7)
+                double_pendulum = DoublePendulum(pendulum1=pendulum1
+                                                 , pendulum2=pendulum2)
+                double_pendulum.set_double_pendulum(theta1=state[0], w1=state[2]
+                                                   , theta2=state[1], w2=state[3])
+                self.assertAlmostEqual(diagnostics.kinetic[i]
+                                       , double_pendulum.calculate_kinetic_energy())
+                self.assertAlmostEqual(diagnostics.potential[i]
+                                       , double_pendulum.calculate_potential_energy())
+
+    def test_simulation_energy(self):
+        '''
+            Tests that a run exposes its cached energy diagnostics, and that a
+            new run replaces them.
+        '''
+        pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+        pendulum2 = Pendulum(mass=1, length=1)
+        double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+        double_pendulum.set_double_pendulum(theta1=np.pi/2, w1=0
+                                           , theta2=np.pi/2, w2=0)
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=double_pendulum
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=2, timestep=0.01
+                                  , vectorized_cartesian=True)
+
+        energy = simulation.energy
+        self.assertIs(simulation.energy, energy)
+        self.assertEqual(energy.total.shape, simulation.time.shape)
+        self.assertEqual(energy.drift[0], 0)
+        self.assertLess(energy.statistics['max_relative_drift'], 1e-3)
+
+        simulation.run_simulation(double_pendulum=double_pendulum
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=1, timestep=0.01
+                                  , vectorized_cartesian=True)
+        self.assertIsNot(simulation.energy, energy)
+
+    def test_ensemble_energy(self):
+        '''
+            Tests that ensemble statistics are reduced per member, and that
+            a coarse timestep shows a larger drift.
+        '''
+        ensemble = DoublePendulumEnsembleSimulation()
+        ensemble.run_simulation(initial_states=[[np.pi/2, np.pi/2, 0, 0]
+                                                , [0.1, 0, 0, 0]]
+                                , properties=[1, 1, 1, 1]
+                                , propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=2, timestep=0.05)
+
+        statistics = ensemble.energy.statistics
+        self.assertEqual(ensemble.energy.total.shape, ensemble.theta1.shape)
+        self.assertEqual(statistics['max_abs_drift'].shape, (2,))
+        self.assertGreater(statistics['max_abs_drift'][0]
+                           , statistics['max_abs_drift'][1])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
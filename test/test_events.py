@@ -0,0 +1,125 @@
+# -----------
+#    Tests for event detection
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import GaussLegendreIntegrator
+from events import Event
+from events import crossing
+from events import flip
+from events import energy_crossing
+from factories import make_double_pendulum
+
+
+class EventTests(unittest.TestCase):
+    '''
+        A test case for find_events of the simulators
+    '''
+    def test_poincare_section(self):
+        '''
+            Tests that crossings in one direction are located within the
+            step, on the section and in agreement with a much finer step.
+        '''
+        events = [crossing('theta1', 0, direction=1)]
+        fine, = DoublePendulumSimulation().find_events(
+            double_pendulum=make_double_pendulum(theta1=1, theta2=0.5)
+            , propagator=RungeKuttaIntegrator().propagate_state
+            , events=events, simulation_time=5, timestep=0.001)
+        for propagator in [RungeKuttaIntegrator().propagate_state
+                           , GaussLegendreIntegrator().propagate_state]:
+            with self.subTest(propagator=propagator.__qualname__):
+                log, = DoublePendulumSimulation().find_events(
+                    double_pendulum=make_double_pendulum(theta1=1, theta2=0.5)
+                    , propagator=propagator
+                    , events=events, simulation_time=5, timestep=0.01)
+
+                self.assertGreater(len(log.time), 0)
+                self.assertIsNone(log.member)
+                np.testing.assert_allclose(log.state[:, 0], 0, atol=1e-8)
+                self.assertTrue(np.all(log.state[:, 2] > 0))
+                np.testing.assert_allclose(log.time, fine.time, atol=1e-5)
+
+    def test_direction(self):
+        '''
+            Tests that rising and falling crossings make up all crossings.
+        '''
+        events = [crossing('theta2', 0, direction=direction) for direction in [1, -1, 0]]
+        rising, falling, both = DoublePendulumSimulation().find_events(
+            double_pendulum=make_double_pendulum(theta1=1, theta2=0.5)
+            , propagator=RungeKuttaIntegrator().propagate_state
+            , events=events, simulation_time=5, timestep=0.01)
+        np.testing.assert_array_equal(np.sort(np.r_[rising.time, falling.time])
+                                      , both.time)
+
+    def test_terminal(self):
+        '''
+            Tests that a terminal flip ends the run at the step where the
+            recorded run first flips, and leaves the pendulum in the state
+            at the flip.
+        '''
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum(theta1=2.5, theta2=2.5)
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=10, timestep=0.01
+                                  , vectorized_cartesian=True)
+        first = np.argmax(np.abs(simulation.theta2) > np.pi)
+
+        double_pendulum = make_double_pendulum(theta1=2.5, theta2=2.5)
+        log, late = DoublePendulumSimulation().find_events(
+            double_pendulum=double_pendulum
+            , propagator=RungeKuttaIntegrator().propagate_state
+            , events=[flip(2), Event(lambda time, state, properties: time - 9.5)]
+            , simulation_time=10, timestep=0.01)
+        self.assertEqual(len(log.time), 1)
+        self.assertEqual(len(late.time), 0)
+        self.assertTrue(simulation.time[first-1] < log.time[0] <= simulation.time[first])
+        self.assertAlmostEqual(abs(double_pendulum.pendulum2.theta), np.pi, 8)
+
+    def test_ensemble(self):
+        '''
+            Tests that the members of an ensemble stop at their own first
+            flip, as if run alone.
+        '''
+        rng = np.random.default_rng(seed=0)
+        initial_states = np.zeros((20, 4))
+        initial_states[:, :2] = rng.uniform(-3, 3, (20, 2))
+        kwargs = {'propagator': RungeKuttaIntegrator().propagate_state
+                  , 'events': [flip(2)], 'simulation_time': 5, 'timestep': 0.01}
+        ensemble = DoublePendulumEnsembleSimulation()
+        log, = ensemble.find_events(initial_states=initial_states
+                                    , properties=[1, 1, 1, 1], **kwargs)
+
+        self.assertEqual(len(np.unique(log.member)), len(log.member))
+        for member, time in zip(log.member[:5], log.time[:5]):
+            with self.subTest(member=member):
+                single, = DoublePendulumSimulation().find_events(
+                    double_pendulum=make_double_pendulum(*initial_states[member, :2])
+                    , **kwargs)
+                self.assertAlmostEqual(single.time[0], time, 9)
+                np.testing.assert_allclose(ensemble.final_states[member]
+                                           , single.state[0], atol=1e-8)
+
+    def test_energy_threshold(self):
+        '''
+            Tests that energy thresholds just above and below the conserved
+            energy are never crossed.
+        '''
+        double_pendulum = make_double_pendulum(theta1=1, theta2=0.5)
+        energy = double_pendulum.calculate_mechanical_energy()
+        above, below = DoublePendulumSimulation().find_events(
+            double_pendulum=double_pendulum
+            , propagator=RungeKuttaIntegrator().propagate_state
+            , events=[energy_crossing(energy + 1e-3), energy_crossing(energy - 1e-3)]
+            , simulation_time=2, timestep=0.01)
+        self.assertEqual(len(above.time), 0)
+        self.assertEqual(len(below.time), 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
@@ -0,0 +1,59 @@
+# -----------
+#    Tests for the headless export
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from matplotlib import animation
+
+import export
+from export import Clip
+from export import export_clips
+
+
+class ExportTests(unittest.TestCase):
+    '''
+        A test case for the clip export
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_export_gif(self):
+        '''
+            Tests that clips are written at their frame rate, on one reused
+            figure, with statistics per worker.
+        '''
+        clips = [Clip(path=os.path.join(self.directory.name, f'clip{i}.gif')
+                      , state=(np.pi/2, theta2, 0, 0), simulation_time=0.95
+                      , timestep=0.01, fps=10)
+                 for i, theta2 in enumerate([0, 1])]
+        results, per_worker = export_clips(clips, workers=0)
+        figure = export._exporter.figure
+
+        for clip, result in zip(clips, results):
+            with self.subTest(path=clip.path):
+                with Image.open(clip.path) as image:
+                    self.assertEqual(image.n_frames, result['frames'])
+                self.assertEqual(result['frames'], 10)
+        self.assertEqual(per_worker[os.getpid()]['frames'], 20)
+        # the second clip cleared the axes of the first
+        self.assertEqual(len(figure.axes), 1)
+        self.assertEqual(len(figure.axes[0].lines), 2)
+
+    @unittest.skipIf(animation.writers.is_available('ffmpeg'), "ffmpeg is installed")
+    def test_missing_ffmpeg(self):
+        '''
+            Tests that video formats are rejected without ffmpeg.
+        '''
+        with self.assertRaises(ValueError):
+            export.make_writer(os.path.join(self.directory.name, 'clip.mp4'), fps=10)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
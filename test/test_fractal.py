@@ -0,0 +1,56 @@
+# -----------
+#    Tests for the FlipTimeMap class
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from fractal import FlipTimeMap
+
+
+class FlipTimeMapTests(unittest.TestCase):
+    '''
+        A test case for the FlipTimeMap class
+    '''
+    def test_low_energy_never_flips(self):
+        '''
+            Tests that pendula released close to the bottom are never flipped.
+        '''
+        flip_map = FlipTimeMap(resolution=8, theta_range=(-0.5, 0.5)
+                               , max_time=1, timestep=0.01, workers=0)
+        image = flip_map.compute()
+
+        self.assertTrue(np.all(np.isinf(image)))
+
+    def test_progressive_refinement(self):
+        '''
+            Tests that every level fills the whole image, and that the final
+            level agrees with a single-level computation.
+        '''
+        flip_map = FlipTimeMap(resolution=16, max_time=2, timestep=0.01
+                               , tile_size=8, workers=0)
+        strides = []
+        for image, stats in flip_map.refine(levels=3):
+            strides.append(stats['stride'])
+            self.assertFalse(np.isnan(image).any())
+
+        self.assertEqual(strides, [4, 2, 1])
+        np.testing.assert_array_equal(image, flip_map.compute(levels=1))
+        self.assertTrue(np.isfinite(image).any())
+
+    def test_process_pool_matches_serial(self):
+        '''
+            Tests that tiles computed by worker processes into shared memory
+            give the same image as computing them in this process.
+        '''
+        kwargs = {'resolution': 16, 'max_time': 2, 'timestep': 0.01
+                  , 'tile_size': 8}
+        serial = FlipTimeMap(workers=0, **kwargs).compute(levels=2)
+        pooled = FlipTimeMap(workers=2, **kwargs).compute(levels=2)
+
+        np.testing.assert_array_equal(serial, pooled)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
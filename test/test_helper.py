@@ -0,0 +1,90 @@
+# -----------
+#    Tests for the helper functions
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+import helper
+import pendulum
+from pendulum import calculate_double_pendulum_positions
+from pendulum import calculate_double_pendulum_angles
+
+
+def fill_rows(array: np.ndarray, rows: slice, value: float):
+    '''
+        A batch of SharedBatchPool, fills rows of the shared array.
+    '''
+    array[rows] = value
+    return rows.stop - rows.start
+
+
+class CalculateAnglesTests(unittest.TestCase):
+    '''
+        A test case for the vectorized calculate_angles function
+    '''
+    def test_matches_calculate_angle(self):
+        '''
+            Tests that every branch of calculate_angle, including the axes,
+            gives the same angle, with and without the pendulum.py offset.
+        '''
+        points = [(1, 2), (-1, 2), (-1, -2), (1, -2), (0, 3), (0, -3)
+                  , (2, 0), (-2, 0), (1e-9, -1)]
+        x, y = np.array(points, dtype=np.float64).T
+        for module in [helper, pendulum]:
+            with self.subTest(module=module.__name__):
+                angles, undefined = module.calculate_angles(x, y)
+                self.assertFalse(undefined.any())
+                for i, point in enumerate(points):
+                    self.assertAlmostEqual(angles[i], module.calculate_angle(*point), 12)
+
+    def test_undefined_mask(self):
+        '''
+            Tests that (0,0) is masked instead of raising.
+        '''
+        angles, undefined = helper.calculate_angles([0, 1, 0], [0, 1, 0], offset=1)
+        np.testing.assert_array_equal(undefined, [True, False, True])
+        self.assertTrue(np.isnan(angles[undefined]).all())
+        self.assertAlmostEqual(angles[1], np.pi/4 - 1)
+
+    def test_double_pendulum_angles(self):
+        '''
+            Tests that angles are recovered from positions up to 2*pi.
+        '''
+        theta1 = np.linspace(-3, 3, 13)
+        theta2 = np.linspace(3, -3, 13)
+        positions = calculate_double_pendulum_positions(theta1=theta1, theta2=theta2
+                                                        , length1=1, length2=2
+                                                        , origin=(1, 1))
+        angles1, angles2, undefined = calculate_double_pendulum_angles(*positions
+                                                                       , origin=(1, 1))
+        self.assertFalse(undefined.any())
+        np.testing.assert_allclose(np.cos(angles1 - theta1), 1)
+        np.testing.assert_allclose(np.cos(angles2 - theta2), 1)
+
+
+class SharedBatchPoolTests(unittest.TestCase):
+    '''
+        A test case for the SharedBatchPool class
+    '''
+    def test_batches(self):
+        '''
+            Tests that a process pool and this process write the same array,
+            and that every batch reports its result under its key.
+        '''
+        batch_kwargs = {batch: {'rows': slice(2*batch, 2*batch+2), 'value': batch}
+                        for batch in range(3)}
+        for workers in [0, 2]:
+            with self.subTest(workers=workers):
+                with helper.SharedBatchPool(shape=(6, 2), workers=workers
+                                            , fill=np.nan) as pool:
+                    results = dict(pool.run(fill_rows, batch_kwargs))
+                    array = pool.array.copy()
+                self.assertEqual(results, {0: 2, 1: 2, 2: 2})
+                np.testing.assert_array_equal(array[:, 0], [0, 0, 1, 1, 2, 2])
+                self.assertIsNone(pool.shared)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
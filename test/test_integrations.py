@@ -0,0 +1,231 @@
+# -----------
+#    Tests for the integrator classes
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from integrations import RungeKuttaIntegrator
+from integrations import DormandPrinceIntegrator
+from integrations import GaussLegendreIntegrator
+from integrations import ImplicitMidpointIntegrator
+from integrations import SplittingIntegrator
+from simulator import DoublePendulumSimulation
+from diagnostics import EnergyDiagnostics
+
+
+def harmonic_oscillator(state: np.ndarray):
+    '''
+        RHS of a unit harmonic oscillator, with solution (cos t, -sin t).
+    '''
+    return np.array([state[1], -state[0]])
+
+def propagate(propagator, simulation_time: float, timestep: float):
+    '''
+        Propagates the harmonic oscillator from (1, 0) until simulation_time.
+    '''
+    time, state = 0, np.array([1.0, 0.0])
+    while time < simulation_time - timestep/2:
+        time, state = propagator(rhs_func=harmonic_oscillator, time=time
+                                 , state=state, timestep=timestep)
+    return time, state
+
+
+class RungeKuttaIntegratorTests(unittest.TestCase):
+    '''
+        A test case for the RungeKuttaIntegrator class
+    '''
+    def test_harmonic_oscillator(self):
+        '''
+            Tests RK4 against the exact solution of a harmonic oscillator.
+        '''
+        time, state = propagate(RungeKuttaIntegrator().propagate_state
+                                , simulation_time=10, timestep=0.01)
+        np.testing.assert_allclose(state, [np.cos(time), -np.sin(time)]
+                                   , atol=1e-8)
+
+    def test_rhs_type(self):
+        '''
+            Tests that an RHS function not returning an ndarray is rejected.
+        '''
+        with self.assertRaises(TypeError):
+            RungeKuttaIntegrator().propagate_state(rhs_func=lambda state: [0]
+                                                   , time=0, state=np.zeros(1)
+                                                   , timestep=0.1)
+
+
+class DormandPrinceIntegratorTests(unittest.TestCase):
+    '''
+        A test case for the DormandPrinceIntegrator class
+    '''
+    def test_tolerances(self):
+        '''
+            Tests that tightening the tolerances reduces the global error.
+        '''
+        errors = []
+        for rtol in [1e-4, 1e-7, 1e-10]:
+            integrator = DormandPrinceIntegrator(rtol=rtol, atol=rtol*1e-3)
+            time, state = propagate(integrator.propagate_state
+                                    , simulation_time=10, timestep=0.1)
+            errors.append(np.max(np.abs(state - [np.cos(time), -np.sin(time)])))
+
+        self.assertLess(errors[1], errors[0])
+        self.assertLess(errors[2], errors[1])
+        self.assertLess(errors[2], 1e-8)
+
+    def test_fsal_and_continuation(self):
+        '''
+            Tests that consecutive calls continue the internal step, and that
+            each attempted step costs six RHS evaluations thanks to FSAL.
+        '''
+        integrator = DormandPrinceIntegrator(rtol=1e-8)
+        propagate(integrator.propagate_state, simulation_time=5, timestep=0.01)
+
+        steps = integrator.accepted_steps + integrator.rejected_steps
+        # two evaluations choose the first step size
+        self.assertEqual(integrator.rhs_evaluations, 2 + 6*steps)
+        # far fewer internal steps than output intervals
+        self.assertLess(integrator.accepted_steps, 500)
+
+    def test_dense_output(self):
+        '''
+            Tests that the dense output reproduces the ends of the last step.
+        '''
+        integrator = DormandPrinceIntegrator()
+        integrator.propagate_state(rhs_func=harmonic_oscillator, time=0
+                                   , state=np.array([1.0, 0.0]), timestep=1)
+
+        np.testing.assert_allclose(integrator.dense_output(integrator._t_old)
+                                   , integrator._y_old, atol=1e-14)
+        np.testing.assert_allclose(integrator.dense_output(integrator._t)
+                                   , integrator._y, atol=1e-12)
+
+    def test_failures(self):
+        '''
+            Tests that a non-finite RHS and a solution blowing up, y' = y**2
+            from y(0) = 1 up to t = 1, raise instead of looping forever.
+        '''
+        rhs_funcs = {'nan': lambda state: np.full_like(state, np.nan)
+                     , 'singular': lambda state: state**2}
+        for name, rhs_func in rhs_funcs.items():
+            with self.subTest(rhs=name):
+                with self.assertRaises(RuntimeError):
+                    DormandPrinceIntegrator().propagate_state(
+                        rhs_func=rhs_func, time=0, state=np.array([1.0]), timestep=2)
+
+
+def split_harmonic_oscillator(state: np.ndarray, part: str = 'full'):
+    '''
+        Hamilton's equations of a unit harmonic oscillator, by part of H.
+    '''
+    kinetic = np.array([state[1], 0.0])
+    potential = np.array([0.0, -state[0]])
+    return {'full': kinetic + potential, 'kinetic': kinetic
+            , 'potential': potential}[part]
+
+
+class StructurePreservingIntegratorTests(unittest.TestCase):
+    '''
+        A test case for the symplectic integrator classes
+    '''
+    def test_order_of_accuracy(self):
+        '''
+            Tests that halving the timestep reduces the error by 2**order.
+        '''
+        cases = [(ImplicitMidpointIntegrator(), 2)
+                 , (GaussLegendreIntegrator(stages=2), 4)
+                 , (SplittingIntegrator(order=2), 2)
+                 , (SplittingIntegrator(order=4), 4)]
+        for integrator, order in cases:
+            with self.subTest(integrator=type(integrator).__name__, order=order):
+                errors = []
+                for timestep in [0.1, 0.05]:
+                    time, state = 0, np.array([1.0, 0.0])
+                    while time < 2 - timestep/2:
+                        time, state = integrator.propagate_state(
+                            rhs_func=split_harmonic_oscillator, time=time
+                            , state=state, timestep=timestep)
+                    errors.append(np.max(np.abs(state - [np.cos(time), -np.sin(time)])))
+                self.assertAlmostEqual(np.log2(errors[0]/errors[1]), order, 0)
+
+    def test_quadratic_invariant(self):
+        '''
+            Tests that Gauss-Legendre integrators conserve the energy of a
+            harmonic oscillator up to round-off, at a large timestep.
+        '''
+        for stages in [1, 2]:
+            with self.subTest(stages=stages):
+                time, state = propagate(GaussLegendreIntegrator(stages=stages).propagate_state
+                                        , simulation_time=100, timestep=0.5)
+                self.assertAlmostEqual(np.sum(state**2), 1, 10)
+
+    def test_long_double_pendulum_run(self):
+        '''
+            Tests that the stage iteration converges in float64 over a long
+            run of a double pendulum at moderate energy, where the round-off
+            of the RHS lies above a few ulps, and that the energy stays
+            bounded.
+        '''
+        simulation = DoublePendulumSimulation()
+        properties = np.ones(4)
+        cases = [(ImplicitMidpointIntegrator(), 0.02), (GaussLegendreIntegrator(), 0.02)
+                 , (GaussLegendreIntegrator(), 0.01), (SplittingIntegrator(order=2), 0.02)
+                 , (SplittingIntegrator(order=4), 0.02)]
+        for integrator, timestep in cases:
+            with self.subTest(integrator=type(integrator).__name__, timestep=timestep):
+                func, state, _ = simulation.equations_of_motion(
+                    propagator=integrator.propagate_state
+                    , state=np.array([2, 0.5, 0, 0]), properties=properties)
+                time, states = 0, []
+                while time < 20:
+                    time, state = integrator.propagate_state(rhs_func=func, time=time
+                                                             , state=state
+                                                             , timestep=timestep)
+                    self.assertEqual(state.dtype, np.float64)
+                    states.append(simulation.momentum_to_velocity(state, properties))
+                energy = EnergyDiagnostics(*np.transpose(states), properties=properties)
+                self.assertLess(energy.statistics['max_relative_drift'], 0.01)
+
+    def test_canonical(self):
+        '''
+            Tests that the structure-preserving integrators ask for the
+            Hamiltonian form of the equations of motion.
+        '''
+        self.assertFalse(getattr(RungeKuttaIntegrator(), 'canonical', False))
+        for integrator in [ImplicitMidpointIntegrator(), GaussLegendreIntegrator()
+                           , SplittingIntegrator()]:
+            self.assertTrue(integrator.canonical)
+
+
+class PrecisionTests(unittest.TestCase):
+    '''
+        A test case for the dtype of the integrators
+    '''
+    def test_state_dtype_preserved(self):
+        '''
+            Tests that every stage of every integrator stays in the dtype of
+            the state, or in the dtype the integrator is given.
+        '''
+        integrators = [RungeKuttaIntegrator, DormandPrinceIntegrator
+                       , GaussLegendreIntegrator, ImplicitMidpointIntegrator
+                       , SplittingIntegrator]
+        for cls in integrators:
+            for state_dtype, dtype in [(np.float32, None), (np.float64, None)
+                                       , (np.float64, np.float32)]:
+                with self.subTest(integrator=cls.__name__, state=state_dtype, dtype=dtype):
+                    expected = np.dtype(dtype or state_dtype)
+                    def rhs(state, part='full'):
+                        self.assertEqual(state.dtype, expected)
+                        return split_harmonic_oscillator(state, part).astype(state.dtype)
+                    time, state = 0, np.array([1, 0], dtype=state_dtype)
+                    integrator = cls(dtype=dtype)
+                    for _ in range(3):
+                        time, state = integrator.propagate_state(
+                            rhs_func=rhs, time=time, state=state
+                            , timestep=np.float64(0.1))
+                    self.assertEqual(state.dtype, expected)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
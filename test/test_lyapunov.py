@@ -0,0 +1,137 @@
+# -----------
+#    Tests for Lyapunov exponents
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from pendulum import calculate_chain_mass_matrix
+from simulator import DoublePendulumSimulation
+from simulator import PendulumChainSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import GaussLegendreIntegrator
+from sweep import ParameterSweep
+from lyapunov import tangent_rhs
+from lyapunov import LyapunovSpectrum
+from lyapunov import LyapunovMap
+
+
+class LyapunovTests(unittest.TestCase):
+    '''
+        A test case for the variational Lyapunov exponents
+    '''
+    def test_tangent_rhs(self):
+        '''
+            Tests that the complex-step tangents match central differences,
+            and the state moves with the RHS itself.
+        '''
+        rng = np.random.default_rng(seed=0)
+        state = rng.standard_normal((3, 4))
+        tangents = rng.standard_normal((3, 2, 4))
+        for name, simulation, properties in [
+                ('double pendulum', DoublePendulumSimulation(), np.array([1, 2, 1, 0.5]))
+                , ('chain', PendulumChainSimulation(), np.array([1, 2, 1, 0.5]))]:
+            with self.subTest(simulation=name):
+                func, _, _ = simulation.equations_of_motion(
+                    propagator=RungeKuttaIntegrator().propagate_state
+                    , state=state, properties=properties)
+                derivative = tangent_rhs(func)(np.concatenate([state[:, None], tangents]
+                                                              , axis=1))
+                step = 1e-6
+                difference = (func(state[:, None] + step*tangents)
+                              - func(state[:, None] - step*tangents)) / (2*step)
+                np.testing.assert_allclose(derivative[:, 0], func(state), atol=1e-14)
+                np.testing.assert_allclose(derivative[:, 1:], difference, atol=1e-7)
+
+    def test_spectrum(self):
+        '''
+            Tests the full spectrum of a chaotic double pendulum: a large
+            positive exponent, matched by a negative one, and a sum that
+            measures the change of phase space volume. A symplectic
+            integrator of the canonical state conserves the volume, so its
+            exponents sum to zero. In (theta, w) the volume element is that
+            of (theta, p) over det M, which sets the sum for Runge-Kutta.
+            The exponents of small oscillations vanish.
+        '''
+        initial_states = np.array([(2.5, 2.5, 0, 0), (0.1, 0.1, 0, 0)])
+        properties = np.ones(4)
+        def log_volume(state):
+            return np.log(np.linalg.det(calculate_chain_mass_matrix(state[:, :2]
+                                                                    , properties)[0]))
+
+        for integrator, canonical in [(RungeKuttaIntegrator(), False)
+                                      , (GaussLegendreIntegrator(), True)]:
+            with self.subTest(integrator=type(integrator).__name__):
+                spectrum = LyapunovSpectrum(n_exponents=4)
+                chaotic, regular = spectrum.run(initial_states=initial_states
+                                                , properties=properties
+                                                , propagator=integrator.propagate_state
+                                                , simulation_time=30, timestep=0.01)
+                self.assertGreater(chaotic[0], 1)
+                self.assertTrue(np.all(np.diff(chaotic) < 0))
+                self.assertAlmostEqual(chaotic[0], -chaotic[-1], 0)
+                np.testing.assert_allclose(regular, 0, atol=0.05)
+
+                volume = np.sum(spectrum.exponents, axis=-1) * spectrum.time[-1]
+                if canonical:
+                    np.testing.assert_allclose(volume, 0, atol=1e-10)
+                else:
+                    np.testing.assert_allclose(volume, log_volume(initial_states)
+                                               - log_volume(spectrum.final_states)
+                                               , atol=1e-2)
+                self.assertEqual(spectrum.history.shape, (len(spectrum.time), 2, 4))
+                np.testing.assert_array_equal(spectrum.history[-1], spectrum.exponents)
+
+    def test_ensemble(self):
+        '''
+            Tests that the members of an ensemble get the exponents of
+            single runs, for double pendula and triple pendulum chains.
+        '''
+        rng = np.random.default_rng(seed=1)
+        for simulation, n in [(DoublePendulumSimulation(), 2), (PendulumChainSimulation(), 3)]:
+            with self.subTest(simulation=type(simulation).__name__):
+                initial_states = np.zeros((4, 2*n))
+                initial_states[:, :n] = rng.uniform(-2, 2, (4, n))
+                properties = rng.uniform(0.5, 2, (4, 2*n))
+                kwargs = {'propagator': RungeKuttaIntegrator().propagate_state
+                          , 'simulation_time': 2, 'timestep': 0.01}
+                spectrum = LyapunovSpectrum(simulation=simulation, n_exponents=2)
+                exponents = spectrum.run(initial_states=initial_states
+                                         , properties=properties, **kwargs)
+                for member in range(4):
+                    single = LyapunovSpectrum(simulation=simulation, n_exponents=2).run(
+                        initial_states=initial_states[member]
+                        , properties=properties[member], **kwargs)
+                    np.testing.assert_allclose(exponents[member], single, atol=1e-10)
+
+    def test_twin_estimate(self):
+        '''
+            Tests that the largest exponent agrees with the twin-run estimate
+            of ParameterSweep.
+        '''
+        initial_states = [(2.5, 2.5, 0, 0), (2, 1, 0, 0)]
+        twins = ParameterSweep(properties=[1, 1, 1, 1], initial_states=initial_states
+                               , simulation_time=20, workers=0).run()
+        exponents = LyapunovSpectrum().run(initial_states=initial_states
+                                           , properties=[1, 1, 1, 1]
+                                           , propagator=RungeKuttaIntegrator().propagate_state
+                                           , simulation_time=20, timestep=0.01)
+        np.testing.assert_allclose(exponents[:, 0], twins['lyapunov'], atol=0.1)
+
+    def test_map(self):
+        '''
+            Tests that a process pool computes the same map as this process,
+            and that the map is symmetric under (theta1, theta2) -> -(theta1,
+            theta2).
+        '''
+        kwargs = {'resolution': 5, 'simulation_time': 2, 'rows_per_batch': 2}
+        image = LyapunovMap(workers=0, **kwargs).compute()
+        self.assertEqual(image.shape, (5, 5))
+        self.assertFalse(np.isnan(image).any())
+        np.testing.assert_array_equal(LyapunovMap(workers=2, **kwargs).compute(), image)
+        np.testing.assert_allclose(image, image[::-1, ::-1], atol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
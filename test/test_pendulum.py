@@ -9,6 +9,8 @@ import numpy as np
 
 from pendulum import Pendulum
 from pendulum import DoublePendulum
+from pendulum import DoublePendulumEnsemble
+from factories import make_double_pendulum
 
 
 class PendulumTests(unittest.TestCase):
@@ -172,5 +174,63 @@ class DoublePendulumTests(unittest.TestCase):
                 self.assertAlmostEqual(double_pendulum.pendulum2.vy
                                        , expected_output[1][1], 10)
 
+
+class DoublePendulumEnsembleTests(unittest.TestCase):
+    '''
+        A test case for the DoublePendulumEnsemble class and its views
+    '''
+    # properties and state of the double pendula copied into ensembles
+    pendulum_kwargs = {'mass1': 1, 'mass2': 0.7, 'length1': 1.2, 'length2': 0.9
+                       , 'theta1': 1, 'w1': 0.5, 'theta2': -2, 'w2': 0.3}
+
+    def test_views(self):
+        '''
+            Tests that the views of a member read like the double pendulum
+            it was copied from, and hold no attributes of their own.
+        '''
+        double_pendulum = make_double_pendulum(origin=np.array([0.5, -1])
+                                               , **self.pendulum_kwargs)
+        ensemble = DoublePendulumEnsemble.from_double_pendula(
+            [make_double_pendulum(origin=np.zeros(2), **self.pendulum_kwargs)
+             , double_pendulum])
+        member = ensemble[-1]
+        for view, pendulum in [(member.pendulum1, double_pendulum.pendulum1)
+                               , (member.pendulum2, double_pendulum.pendulum2)]:
+            for name in ['theta', 'w', 'x', 'y', 'vx', 'vy', 'mass', 'length']:
+                with self.subTest(arm=view.arm, attribute=name):
+                    self.assertAlmostEqual(getattr(view, name), getattr(pendulum, name), 12)
+            np.testing.assert_allclose(view.origin, pendulum.origin)
+            self.assertAlmostEqual(view.calculate_mechanical_energy()
+                                   , pendulum.calculate_mechanical_energy(), 12)
+            self.assertFalse(hasattr(view, '__dict__'))
+        self.assertAlmostEqual(member.calculate_mechanical_energy()
+                               , double_pendulum.calculate_mechanical_energy(), 12)
+        self.assertFalse(hasattr(member, '__dict__'))
+        with self.assertRaises(IndexError):
+            ensemble[2]
+
+    def test_writes(self):
+        '''
+            Tests that views write through to the arrays of the ensemble,
+            and that the lower pendulum keeps hanging from the upper bob.
+        '''
+        ensemble = DoublePendulumEnsemble(3, properties=[1, 2, 1, 0.5])
+        member = ensemble[1]
+        member.set_double_pendulum(theta1=np.pi/2, w1=1, theta2=0, w2=2)
+        member.pendulum2.set_properties(mass=3, length=2)
+        member.pendulum1.set_origin([1, 1])
+        np.testing.assert_array_equal(ensemble.state[1], [np.pi/2, 0, 1, 2])
+        np.testing.assert_array_equal(ensemble.properties[1], [1, 3, 1, 2])
+        np.testing.assert_array_equal(ensemble.origin[:, 1], [1, 1])
+        np.testing.assert_array_equal(ensemble.state[[0, 2]], 0)
+        np.testing.assert_allclose(member.pendulum2.origin, [2, 1])
+        np.testing.assert_allclose([member.pendulum2.x, member.pendulum2.y], [2, -1])
+        with self.assertRaises(ValueError):
+            member.pendulum2.set_origin([0, 0])
+
+        x1, y1, x2, y2 = ensemble.calculate_positions()
+        np.testing.assert_allclose(y2, [-1.5, -1, -1.5])
+        self.assertEqual(ensemble.calculate_mechanical_energy().shape, (3,))
+
 if __name__ == '__main__':
     unittest.main(verbosity=1)
\ No newline at end of file
@@ -0,0 +1,114 @@
+# -----------
+#    Tests for the SimulationProfiler class
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from pendulum import Pendulum
+from simulator import PendulumSimulator
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from integrations import DormandPrinceIntegrator
+from profiling import SimulationProfiler
+import kernels
+from factories import make_double_pendulum
+
+
+class SimulationProfilerTests(unittest.TestCase):
+    '''
+        A test case for the SimulationProfiler class
+    '''
+    def test_double_pendulum_phases(self):
+        '''
+            Tests the counters of an RK4 run, and that the step callback sees
+            every step.
+        '''
+        profiler = SimulationProfiler()
+        steps = []
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=1, timestep=0.01
+                                  , profiler=profiler
+                                  , step_callback=lambda time, state: steps.append(time))
+        summary = profiler.summary()
+
+        n_steps = len(simulation.time) - 1
+        self.assertEqual(len(steps), n_steps)
+        self.assertEqual(summary['counters']['steps'], n_steps)
+        self.assertEqual(summary['counters']['rhs_calls'], 4*n_steps)
+        self.assertEqual(summary['calls']['set_state'], n_steps)
+        self.assertEqual(summary['counters']['bytes_appended']
+                         , simulation.trajectory.data.nbytes)
+        self.assertGreaterEqual(summary['seconds']['run'], summary['seconds']['propagate'])
+        self.assertGreaterEqual(summary['seconds']['propagator_overhead'], 0)
+        self.assertIn('rhs', profiler.report())
+
+    def test_adaptive_integrator_counters(self):
+        '''
+            Tests that the step counts of an adaptive integrator are reported
+            per run.
+        '''
+        integrator = DormandPrinceIntegrator(rtol=1e-8)
+        for _ in range(2):
+            profiler = SimulationProfiler()
+            simulation = DoublePendulumSimulation()
+            simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                      , propagator=integrator.propagate_state
+                                      , simulation_time=1, timestep=0.1
+                                      , profiler=profiler)
+            counters = profiler.summary()['counters']
+            self.assertLessEqual(counters['accepted_steps'], integrator.accepted_steps)
+            self.assertEqual(counters['steps'], len(simulation.time) - 1)
+        self.assertLess(counters['accepted_steps'], integrator.accepted_steps)
+
+    def test_other_simulators(self):
+        '''
+            Tests that the single pendulum and ensemble simulators report
+            their phases too.
+        '''
+        pendulum = Pendulum(mass=1, length=1, origin=[0,0])
+        pendulum.set_angle(theta=1)
+        pendulum.set_angular_velocity(w=0)
+        profiler = SimulationProfiler()
+        PendulumSimulator().run_simulation(pendulum=pendulum
+                                           , propagator=RungeKuttaIntegrator().propagate_state
+                                           , timestep=0.1, profiler=profiler)
+        self.assertEqual(profiler.summary()['counters']['rhs_calls']
+                         , 4*profiler.summary()['counters']['steps'])
+
+        profiler = SimulationProfiler()
+        ensemble = DoublePendulumEnsembleSimulation()
+        ensemble.run_simulation(initial_states=np.zeros((3, 4)), properties=[1, 1, 1, 1]
+                                , propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=0.1, timestep=0.01
+                                , profiler=profiler)
+        self.assertEqual(profiler.summary()['counters']['bytes_appended']
+                         , ensemble.trajectory.data.nbytes + ensemble.states.data.nbytes)
+
+    @unittest.skipUnless(kernels.jit_available(), "numba is not installed")
+    def test_numba_backend(self):
+        '''
+            Tests that the compiled backend reports its steps, and rejects a
+            step callback.
+        '''
+        profiler = SimulationProfiler()
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=1, timestep=0.01
+                                  , backend='numba', profiler=profiler)
+        self.assertEqual(profiler.summary()['counters']['steps'], len(simulation.time) - 1)
+        with self.assertRaises(ValueError):
+            simulation.run_simulation(double_pendulum=make_double_pendulum()
+                                      , propagator=RungeKuttaIntegrator().propagate_state
+                                      , simulation_time=1, timestep=0.01
+                                      , backend='numba'
+                                      , step_callback=lambda time, state: None)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
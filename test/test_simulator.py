@@ -0,0 +1,370 @@
+# -----------
+#    Tests for the simulator classes
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+from unittest import mock
+import numpy as np
+
+from pendulum import DoublePendulumEnsemble
+from simulator import DoublePendulumDynamics
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from trajectory import TrajectoryBuffer
+import kernels
+from integrations import RungeKuttaIntegrator
+from integrations import DormandPrinceIntegrator
+from integrations import GaussLegendreIntegrator
+from integrations import SplittingIntegrator
+from factories import make_double_pendulum
+
+
+class DoublePendulumSimulationTests(unittest.TestCase):
+    '''
+        A test case for the DoublePendulumSimulation class
+    '''
+    def test_trajectory_length(self):
+        '''
+            Tests that the run records the initial state and every step.
+        '''
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum(0.1, 0.1)
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=1
+                                  , timestep=0.01)
+
+        self.assertGreaterEqual(simulation.time[-1], 1)
+        for channel in [simulation.x1, simulation.y1, simulation.x2, simulation.y2]:
+            self.assertEqual(len(channel), len(simulation.time))
+
+    def test_reference_trajectory(self):
+        '''
+            Tests the equations of motion against a reference trajectory of
+            a double pendulum with unequal arms, integrated independently
+            from the Lagrangian mass matrix with RK4 at dt=5e-5.
+        '''
+        # time, theta1 and theta2 of the reference, for masses (1, 2) and
+        # lengths (1, 0.5), released at rest from (1, -0.5)
+        reference = np.array([[0.5, -0.16362399391, 1.10146776170]
+                              , [1.0, -0.23688681310, -1.59630959137]
+                              , [2.0, 0.12286475294, 1.12698712897]])
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum(1, -0.5, mass2=2
+                                                                       , length2=0.5)
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=2, timestep=0.001)
+        for time, theta1, theta2 in reference:
+            with self.subTest(time=time):
+                step = np.argmin(np.abs(simulation.time - time))
+                x1, y1 = np.sin(theta1), -np.cos(theta1)
+                np.testing.assert_allclose([simulation.x1[step], simulation.y1[step]
+                                            , simulation.x2[step], simulation.y2[step]]
+                                           , [x1, y1, x1 + 0.5*np.sin(theta2)
+                                              , y1 - 0.5*np.cos(theta2)]
+                                           , atol=1e-3)
+
+    def test_energy_conservation(self):
+        '''
+            Tests that fixed-step and adaptive propagators conserve the
+            mechanical energy of a chaotic run.
+        '''
+        propagators = [RungeKuttaIntegrator().propagate_state
+                       , DormandPrinceIntegrator(rtol=1e-7).propagate_state
+                       , GaussLegendreIntegrator().propagate_state
+                       , SplittingIntegrator(order=4).propagate_state]
+        for propagator in propagators:
+            with self.subTest(propagator):
+                double_pendulum = make_double_pendulum(np.pi/2, np.pi/2)
+                initial_energy = double_pendulum.calculate_mechanical_energy()
+                simulation = DoublePendulumSimulation()
+                simulation.run_simulation(double_pendulum=double_pendulum
+                                          , propagator=propagator
+                                          , simulation_time=5
+                                          , timestep=0.01)
+                self.assertAlmostEqual(double_pendulum.calculate_mechanical_energy()
+                                       , initial_energy, 3)
+
+    @unittest.skipUnless(kernels.jit_available(), "numba is not installed")
+    def test_numba_backend(self):
+        '''
+            Tests that the compiled kernel follows the numpy path.
+        '''
+        simulations = {}
+        for backend in ['numpy', 'numba']:
+            simulations[backend] = DoublePendulumSimulation()
+            simulations[backend].run_simulation(
+                double_pendulum=make_double_pendulum(np.pi/2, np.pi/4)
+                , propagator=RungeKuttaIntegrator().propagate_state
+                , simulation_time=2, timestep=0.01, backend=backend)
+
+        np.testing.assert_allclose(simulations['numba'].time
+                                   , simulations['numpy'].time)
+        np.testing.assert_allclose(simulations['numba'].x2
+                                   , simulations['numpy'].x2, atol=1e-4)
+
+    def test_numba_backend_fallback(self):
+        '''
+            Tests that the numba backend warns and runs on numpy when numba
+            is not installed.
+        '''
+        simulation = DoublePendulumSimulation()
+        with mock.patch.object(kernels, 'numba', None):
+            with self.assertWarns(UserWarning):
+                simulation.run_simulation(
+                    double_pendulum=make_double_pendulum(0.1, 0.1)
+                    , propagator=RungeKuttaIntegrator().propagate_state
+                    , simulation_time=0.1, timestep=0.01, backend='numba')
+        self.assertGreaterEqual(simulation.time[-1], 0.1)
+
+    def test_vectorized_cartesian(self):
+        '''
+            Tests that positions and velocities reconstructed after the run
+            match those computed on first access, and the double pendulum
+            the run updated at every step; only the state is recorded.
+        '''
+        rk_solver = RungeKuttaIntegrator()
+        simulations = {}
+        pendula = {}
+        for vectorized in [False, True]:
+            pendula[vectorized] = make_double_pendulum(np.pi/2, np.pi/3)
+            simulations[vectorized] = DoublePendulumSimulation()
+            simulations[vectorized].run_simulation(
+                double_pendulum=pendula[vectorized]
+                , propagator=rk_solver.propagate_state
+                , simulation_time=1, timestep=0.01
+                , vectorized_cartesian=vectorized)
+
+        for vectorized in [False, True]:
+            self.assertEqual(simulations[vectorized].trajectory.channels
+                             , ('time', 'theta1', 'theta2', 'w1', 'w2'))
+        for name in ['time', 'x1', 'y1', 'x2', 'y2']:
+            np.testing.assert_allclose(getattr(simulations[True], name)
+                                       , getattr(simulations[False], name)
+                                       , atol=1e-6)
+        for name in ['vx1', 'vy1', 'vx2', 'vy2']:
+            self.assertAlmostEqual(getattr(simulations[True], name)[-1]
+                                   , getattr(pendula[False].pendulum2, name[:2])
+                                   if name.endswith('2')
+                                   else getattr(pendula[False].pendulum1, name[:2])
+                                   , 5)
+        self.assertAlmostEqual(pendula[True].pendulum2.x, pendula[False].pendulum2.x, 6)
+        for name in ['theta1', 'theta2', 'w1', 'w2', 'vx1', 'vy2']:
+            np.testing.assert_allclose(getattr(simulations[True], name)
+                                       , getattr(simulations[False], name)
+                                       , atol=1e-6)
+
+    def test_default_energy(self):
+        '''
+            Tests that the energy of a run in the default configuration is
+            available, and that a trajectory without the state names the
+            option recording it.
+        '''
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum(np.pi/2, np.pi/2)
+                                  , propagator=RungeKuttaIntegrator().propagate_state
+                                  , simulation_time=1, timestep=0.01)
+        energy = simulation.energy
+        self.assertEqual(energy.total.shape, simulation.time.shape)
+        self.assertLess(energy.statistics['max_relative_drift'], 1e-3)
+
+        simulation.trajectory = TrajectoryBuffer(channels=('time', 'x1', 'y1', 'x2', 'y2'))
+        simulation._reconstructed, simulation._energy = {}, None
+        with self.assertRaisesRegex(AttributeError, 'vectorized_cartesian'):
+            simulation.energy
+
+    def test_dtype_policy(self):
+        '''
+            Tests that the state, the integration and the trajectory follow
+            the dtype of the simulation, and that float64 conserves energy
+            better.
+        '''
+        propagators = [RungeKuttaIntegrator().propagate_state
+                       , DormandPrinceIntegrator().propagate_state
+                       , GaussLegendreIntegrator().propagate_state
+                       , SplittingIntegrator().propagate_state]
+        drift = {}
+        for dtype in [np.float32, np.float64]:
+            for propagator in propagators:
+                with self.subTest(dtype=dtype, propagator=propagator):
+                    double_pendulum = make_double_pendulum(np.pi/2, np.pi/2)
+                    simulation = DoublePendulumSimulation(dtype=dtype)
+                    simulation.run_simulation(double_pendulum=double_pendulum
+                                              , propagator=propagator
+                                              , simulation_time=0.5, timestep=0.01
+                                              , vectorized_cartesian=True)
+                    self.assertEqual(simulation.trajectory.dtype, dtype)
+                    self.assertEqual(simulation.x2.dtype, dtype)
+
+            simulation = DoublePendulumSimulation(dtype=dtype)
+            simulation.run_simulation(double_pendulum=make_double_pendulum(np.pi/2, np.pi/2)
+                                      , propagator=RungeKuttaIntegrator().propagate_state
+                                      , simulation_time=2, timestep=0.001
+                                      , vectorized_cartesian=True)
+            drift[dtype] = simulation.energy.statistics['max_abs_drift']
+        self.assertLess(drift[np.float64], drift[np.float32] / 10)
+
+    def test_iter_simulation(self):
+        '''
+            Tests that the streamed chunks join up to the run_simulation path.
+        '''
+        rk_solver = RungeKuttaIntegrator()
+        simulation = DoublePendulumSimulation()
+        simulation.run_simulation(double_pendulum=make_double_pendulum(np.pi/2, 0)
+                                  , propagator=rk_solver.propagate_state
+                                  , simulation_time=1, timestep=0.01)
+
+        double_pendulum = make_double_pendulum(np.pi/2, 0)
+        chunks = list(DoublePendulumSimulation().iter_simulation(
+            double_pendulum=double_pendulum, propagator=rk_solver.propagate_state
+            , timestep=0.01, simulation_time=1, chunk_size=32))
+
+        self.assertTrue(all(len(chunk.time) == 32 for chunk in chunks[:-1]))
+        np.testing.assert_allclose(np.concatenate([c.time for c in chunks])
+                                   , simulation.time)
+        np.testing.assert_allclose(np.concatenate([c.x[:, 1] for c in chunks])
+                                   , simulation.x2, atol=1e-6)
+        self.assertAlmostEqual(double_pendulum.pendulum2.x, chunks[-1].x[-1, 1], 6)
+
+    def test_unbounded_iter_simulation(self):
+        '''
+            Tests that a run without simulation_time keeps yielding chunks.
+        '''
+        chunks = DoublePendulumSimulation().iter_simulation(
+            double_pendulum=make_double_pendulum(0.1, 0.1)
+            , propagator=RungeKuttaIntegrator().propagate_state
+            , timestep=0.01, chunk_size=10)
+        for _ in range(5):
+            chunk = next(chunks)
+        self.assertAlmostEqual(chunk.time[-1], 0.49, 5)
+
+    def test_hamiltonian_dynamics(self):
+        '''
+            Tests the canonical transformation and Hamilton's equations
+            against the Newtonian equations of motion.
+        '''
+        simulation = DoublePendulumSimulation()
+        state = np.array([0.3, -1.2, 0.7, 2.1], dtype=np.float32)
+        properties = np.array([1, 2, 0.7, 1.3], dtype=np.float32)
+
+        canonical = simulation.velocity_to_momentum(state, properties)
+        np.testing.assert_allclose(simulation.momentum_to_velocity(canonical, properties)
+                                   , state, rtol=1e-6)
+
+        derivative = simulation.double_pendulum_hamiltonian_dynamics(canonical, properties)
+        newtonian = simulation.double_pendulum_dynamics(state, properties)
+        np.testing.assert_allclose(derivative[:2], newtonian[:2], rtol=1e-5)
+        # dp/dt from the chain rule along the Newtonian flow
+        epsilon = 1e-2
+        forward = simulation.velocity_to_momentum(state + epsilon*newtonian, properties)
+        backward = simulation.velocity_to_momentum(state - epsilon*newtonian, properties)
+        np.testing.assert_allclose((forward - backward)[2:] / (2*epsilon)
+                                   , derivative[2:], rtol=1e-3)
+
+        parts = [simulation.double_pendulum_hamiltonian_dynamics(canonical, properties
+                                                                 , part=part)
+                 for part in ['kinetic', 'potential']]
+        np.testing.assert_allclose(parts[0] + parts[1], derivative, rtol=1e-6)
+
+    def test_batched_dynamics(self):
+        '''
+            Tests that the RHS of an (N, 4) state matches N single evaluations.
+        '''
+        simulation = DoublePendulumSimulation()
+        states = np.array([[0.1, 0.2, 0.3, 0.4], [1, -1, 2, 0.5]], dtype=np.float32)
+        properties = np.array([[1, 1, 1, 1], [1, 2, 1, 0.5]], dtype=np.float32)
+
+        batched = simulation.double_pendulum_dynamics(states, properties)
+        for i in range(2):
+            single = simulation.double_pendulum_dynamics(states[i], properties[i])
+            np.testing.assert_allclose(batched[i], single, rtol=1e-6)
+
+
+class DoublePendulumEnsembleSimulationTests(unittest.TestCase):
+    '''
+        A test case for the DoublePendulumEnsembleSimulation class
+    '''
+    def test_ensemble_matches_single_runs(self):
+        '''
+            Tests that each ensemble member follows the path of a single run.
+        '''
+        cases = [(np.pi/4, np.pi/6, 1, 1), (np.pi/2, 0, 2, 0.5)]
+        rk_solver = RungeKuttaIntegrator()
+
+        ensemble = DoublePendulumEnsembleSimulation()
+        ensemble.run_simulation(initial_states=[[c[0], c[1], 0, 0] for c in cases]
+                                , properties=[[1, c[2], 1, c[3]] for c in cases]
+                                , propagator=rk_solver.propagate_state
+                                , simulation_time=1
+                                , timestep=0.01)
+        self.assertEqual(ensemble.x2.shape, (len(ensemble.time), len(cases)))
+
+        for i, case in enumerate(cases):
+            with self.subTest(case):
+                simulation = DoublePendulumSimulation()
+                simulation.run_simulation(
+                    double_pendulum=make_double_pendulum(theta1=case[0], theta2=case[1]
+                                                         , mass2=case[2], length2=case[3])
+                    , propagator=rk_solver.propagate_state
+                    , simulation_time=1
+                    , timestep=0.01)
+                np.testing.assert_allclose(ensemble.x2[:, i], simulation.x2
+                                           , atol=1e-4)
+                np.testing.assert_allclose(ensemble.y2[:, i], simulation.y2
+                                           , atol=1e-4)
+
+    def test_run_ensemble(self):
+        '''
+            Tests that members of a DoublePendulumEnsemble, with their own
+            hang-points, follow single runs of their views, and that the
+            ensemble is left in the final states.
+        '''
+        ensemble = DoublePendulumEnsemble(2, properties=[[1, 1, 1, 1], [1, 2, 1, 0.5]]
+                                          , origin=[[0, 1], [0, -2]])
+        ensemble[0].set_double_pendulum(theta1=np.pi/4, w1=0, theta2=np.pi/6, w2=0)
+        ensemble[1].set_double_pendulum(theta1=np.pi/2, w1=1, theta2=0, w2=0)
+        initial = DoublePendulumEnsemble(2)
+        initial.state[:], initial.properties[:], initial.origin[:] = (
+            ensemble.state, ensemble.properties, ensemble.origin)
+
+        simulation = DoublePendulumEnsembleSimulation()
+        simulation.run_ensemble(ensemble, propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=1, timestep=0.01)
+        for i in range(2):
+            with self.subTest(member=i):
+                single = DoublePendulumSimulation()
+                single.run_simulation(double_pendulum=initial[i]
+                                      , propagator=RungeKuttaIntegrator().propagate_state
+                                      , simulation_time=1, timestep=0.01
+                                      , vectorized_cartesian=True)
+                np.testing.assert_allclose(simulation.x2[:, i], single.x2, atol=1e-12)
+                np.testing.assert_allclose(simulation.y2[:, i], single.y2, atol=1e-12)
+                np.testing.assert_array_equal(ensemble.state[i], initial.state[i])
+
+    def test_single_pendulum_methods(self):
+        '''
+            Tests that the ensemble simulator shares the dynamics of the
+            single one, without the methods of single double pendulum runs.
+        '''
+        simulation = DoublePendulumEnsembleSimulation()
+        self.assertIsInstance(simulation, DoublePendulumDynamics)
+        self.assertNotIsInstance(simulation, DoublePendulumSimulation)
+        for name in ['resume_simulation', 'iter_simulation', 'set_trajectory']:
+            with self.subTest(method=name):
+                self.assertFalse(hasattr(simulation, name))
+
+    def test_invalid_shapes(self):
+        '''
+            Tests that mismatched state and property shapes are rejected.
+        '''
+        ensemble = DoublePendulumEnsembleSimulation()
+        with self.assertRaises(ValueError):
+            ensemble.run_simulation(initial_states=np.zeros((3, 4))
+                                    , properties=np.ones((2, 4))
+                                    , propagator=RungeKuttaIntegrator().propagate_state
+                                    , simulation_time=1
+                                    , timestep=0.1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
@@ -0,0 +1,155 @@
+# -----------
+#    Tests for the trajectory file format
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import tempfile
+import unittest
+import numpy as np
+
+from pendulum import Pendulum
+from pendulum import DoublePendulum
+from pendulum import DoublePendulumEnsemble
+from simulator import DoublePendulumSimulation
+from simulator import DoublePendulumEnsembleSimulation
+from integrations import RungeKuttaIntegrator
+from storage import TrajectoryWriter
+from storage import TrajectoryFile
+
+
+class TrajectoryFileTests(unittest.TestCase):
+    '''
+        A test case for the TrajectoryWriter and TrajectoryFile classes
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trajectory.dpt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        '''
+            Tests that slices by time range and member, across chunk
+            boundaries and in a partial last chunk, read back what was written.
+        '''
+        rng = np.random.default_rng(seed=0)
+        times = np.arange(25, dtype=np.float32)
+        values = rng.standard_normal((2, 25, 3)).astype(np.float32)
+        with TrajectoryWriter(self.path, n_members=3, properties=[1, 1, 1, 1]
+                              , timestep=1, channels=('a', 'b')
+                              , chunk_steps=8, integrator='test') as writer:
+            writer.append(times[0], values[0, 0], values[1, 0])
+            writer.extend(times[1:], values[0, 1:], values[1, 1:])
+
+        trajectory = TrajectoryFile(self.path)
+        self.assertEqual(len(trajectory), 25)
+        self.assertEqual(trajectory.integrator, 'test')
+        np.testing.assert_array_equal(trajectory.time(), times)
+        np.testing.assert_array_equal(trajectory.read('b'), values[1])
+        np.testing.assert_array_equal(trajectory.read('a', slice(5, 20), 2)
+                                      , values[0, 5:20, 2])
+        np.testing.assert_array_equal(trajectory.read('a', slice(6, 7), [0, 2])
+                                      , values[0, 6:7][:, [0, 2]])
+        self.assertEqual(trajectory.read('a', slice(30, 40)).shape, (0, 3))
+
+    def test_ensemble_writer(self):
+        '''
+            Tests that an ensemble written to disk matches the in-memory run,
+            including the lazily computed positions of a member.
+        '''
+        kwargs = {'initial_states': [[np.pi/2, 0, 0, 0], [1, 1, 0, 0]]
+                  , 'properties': [[1, 1, 1, 1], [1, 2, 1, 0.5]]
+                  , 'propagator': RungeKuttaIntegrator().propagate_state
+                  , 'simulation_time': 1, 'timestep': 0.01}
+        ensemble = DoublePendulumEnsembleSimulation()
+        ensemble.run_simulation(**kwargs)
+        with TrajectoryWriter(self.path, n_members=2, properties=kwargs['properties']
+                              , timestep=0.01, chunk_steps=16
+                              , dtype=ensemble.dtype) as writer:
+            DoublePendulumEnsembleSimulation().run_simulation(writer=writer, **kwargs)
+
+        self.assertEqual(TrajectoryFile(self.path).integrator, 'RungeKuttaIntegrator')
+        member = TrajectoryFile(self.path).member(1)
+        self.assertEqual(len(member.x2), len(ensemble.time))
+        np.testing.assert_array_equal(member.theta1[:], ensemble.theta1[:, 1])
+        np.testing.assert_allclose(member.x2[10:50], ensemble.x2[10:50, 1], atol=1e-6)
+        self.assertAlmostEqual(member.y2[-1], ensemble.y2[-1, 1], 6)
+
+        # the results of the in-memory run are not mistaken for the written one
+        with TrajectoryWriter(self.path, n_members=2, properties=kwargs['properties']
+                              , timestep=0.01, dtype=ensemble.dtype) as writer:
+            ensemble.run_simulation(writer=writer, **kwargs)
+        for name in ['time', 'theta1', 'x2', 'vy1']:
+            with self.subTest(channel=name):
+                with self.assertRaisesRegex(AttributeError, 'written to'):
+                    getattr(ensemble, name)
+        ensemble.run_simulation(**kwargs)
+        self.assertEqual(len(ensemble.x2), len(member.x2))
+
+        # a header not describing the run is refused
+        headers = {'timestep': {'n_members': 2, 'timestep': 0.02}
+                   , 'members': {'n_members': 3, 'timestep': 0.01}
+                   , 'integrator': {'n_members': 2, 'timestep': 0.01
+                                    , 'integrator': 'GaussLegendreIntegrator'}}
+        for name, header in headers.items():
+            with self.subTest(header=name):
+                with TrajectoryWriter(self.path, properties=[1, 1, 1, 1]
+                                      , **header) as writer:
+                    with self.assertRaises(ValueError):
+                        ensemble.run_simulation(writer=writer, **kwargs)
+
+    def test_member_origins(self):
+        '''
+            Tests that a DoublePendulumEnsemble run with its own hang-points
+            is written with them, and read back at the right positions.
+        '''
+        ensemble = DoublePendulumEnsemble(3, properties=[1, 2, 1, 0.5]
+                                          , origin=[[0, 1, 2], [0, -1, 0]])
+        ensemble.state[:, :2] = [[np.pi/2, 0], [1, 1], [0.5, -1]]
+        simulation = DoublePendulumEnsembleSimulation()
+        simulation.run_ensemble(DoublePendulumEnsemble.from_double_pendula(list(ensemble))
+                                , propagator=RungeKuttaIntegrator().propagate_state
+                                , simulation_time=1, timestep=0.01)
+        with TrajectoryWriter(self.path, n_members=3, properties=ensemble.properties
+                              , timestep=0.01, dtype=simulation.dtype
+                              , origin=ensemble.origin) as writer:
+            DoublePendulumEnsembleSimulation().run_ensemble(
+                ensemble, propagator=RungeKuttaIntegrator().propagate_state
+                , simulation_time=1, timestep=0.01, writer=writer)
+
+        trajectory = TrajectoryFile(self.path)
+        np.testing.assert_array_equal(trajectory.origin, ensemble.origin)
+        for index in range(3):
+            with self.subTest(member=index):
+                member = trajectory.member(index)
+                np.testing.assert_allclose(member.x2[:], simulation.x2[:, index], atol=1e-12)
+                np.testing.assert_allclose(member.y1[:], simulation.y1[:, index], atol=1e-12)
+        with self.assertRaises(ValueError):
+            TrajectoryWriter(self.path, n_members=2, properties=[1, 1, 1, 1]
+                             , timestep=0.01, origin=ensemble.origin)
+
+    def test_single_run_chunks(self):
+        '''
+            Tests that streamed chunks of a single run can be written.
+        '''
+        pendulum1 = Pendulum(mass=1, length=1, origin=[0,0])
+        pendulum2 = Pendulum(mass=1, length=1)
+        double_pendulum = DoublePendulum(pendulum1=pendulum1, pendulum2=pendulum2)
+        double_pendulum.set_double_pendulum(theta1=1, w1=0, theta2=0, w2=0)
+        with TrajectoryWriter(self.path, n_members=1, properties=[1, 1, 1, 1]
+                              , timestep=0.01, chunk_steps=40) as writer:
+            for chunk in DoublePendulumSimulation().iter_simulation(
+                    double_pendulum=double_pendulum
+                    , propagator=RungeKuttaIntegrator().propagate_state
+                    , timestep=0.01, simulation_time=1, chunk_size=32):
+                writer.append_chunk(chunk)
+
+        trajectory = TrajectoryFile(self.path)
+        self.assertEqual(len(trajectory), 101)
+        self.assertAlmostEqual(trajectory.read('theta1', members=0)[-1]
+                               , double_pendulum.pendulum1.theta, 6)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
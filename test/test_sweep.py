@@ -0,0 +1,107 @@
+# -----------
+#    Tests for parameter sweeps
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import tempfile
+import unittest
+import numpy as np
+
+from sweep import ParameterSweep
+from integrations import DormandPrinceIntegrator
+
+
+class ParameterSweepTests(unittest.TestCase):
+    '''
+        A test case for the ParameterSweep class
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sweep.npz')
+        self.kwargs = {'mass2': [0.5, 1, 2], 'length2': [0.5, 1]
+                       , 'initial_states': [(0.1, 0.1, 0, 0), (2.5, 2.5, 0, 0)]
+                       , 'simulation_time': 2, 'batch_size': 5}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_grid(self):
+        '''
+            Tests that a grid holds every combination, initial states fastest.
+        '''
+        sweep = ParameterSweep.grid(**self.kwargs)
+        self.assertEqual(len(sweep), 12)
+        np.testing.assert_array_equal(sweep.properties[:4]
+                                      , [[1, 0.5, 1, 0.5]]*2 + [[1, 0.5, 1, 1]]*2)
+        np.testing.assert_array_equal(sweep.initial_states[:, 0], [0.1, 2.5]*6)
+
+    def test_statistics(self):
+        '''
+            Tests that small oscillations never flip, while wide swings flip
+            and diverge faster on average, and that a process pool computes
+            the same table as this process.
+        '''
+        results = ParameterSweep.grid(workers=0, **self.kwargs).run()
+        small, wide = slice(0, None, 2), slice(1, None, 2)
+        np.testing.assert_array_equal(results['flips'][small], 0)
+        np.testing.assert_allclose(results['max_angle1'][small], 0.1, rtol=0.5)
+        self.assertGreater(np.sum(results['flips'][wide] > 0), 2)
+        self.assertGreater(np.mean(results['lyapunov'][wide])
+                           , 2 * np.mean(results['lyapunov'][small]))
+        self.assertLess(np.max(results['energy_drift']), 1e-3)
+
+        pooled = ParameterSweep.grid(workers=2, **self.kwargs).run()
+        for name in results:
+            with self.subTest(column=name):
+                np.testing.assert_array_equal(pooled[name], results[name])
+
+    def test_resume(self):
+        '''
+            Tests that a sweep saved after its first batch continues with the
+            remaining batches only, and that the file of a sweep with other
+            settings or precision is refused.
+        '''
+        reference = ParameterSweep.grid(workers=0, path=self.path, **self.kwargs)
+        reference.run()
+        # roll the saved progress back to the first batch
+        reference.table[5:] = np.nan
+        reference.done[1:] = False
+        reference._save()
+
+        sweep = ParameterSweep.grid(workers=0, path=self.path, **self.kwargs)
+        self.assertEqual(list(sweep.done), [True, False, False])
+        np.testing.assert_array_equal(sweep.table[:5], reference.table[:5])
+        results = sweep.run()
+        self.assertTrue(np.all(sweep.done))
+        self.assertFalse(np.isnan(results['lyapunov']).any())
+        np.testing.assert_array_equal(ParameterSweep.grid(path=self.path
+                                                          , **self.kwargs).table
+                                      , sweep.table)
+
+        with self.assertRaises(ValueError):
+            ParameterSweep.grid(path=self.path, dtype=np.float32, **self.kwargs)
+        self.kwargs['simulation_time'] = 3
+        with self.assertRaises(ValueError):
+            ParameterSweep.grid(path=self.path, **self.kwargs)
+
+    def test_integrator_settings(self):
+        '''
+            Tests that a saved sweep is refused when the integrator has other
+            parameters, and continued when it has the same ones.
+        '''
+        self.kwargs['simulation_time'] = 0.5
+        ParameterSweep.grid(workers=0, path=self.path
+                            , integrator=DormandPrinceIntegrator(rtol=1e-6)
+                            , **self.kwargs).run()
+        sweep = ParameterSweep.grid(path=self.path
+                                    , integrator=DormandPrinceIntegrator(rtol=1e-6)
+                                    , **self.kwargs)
+        self.assertTrue(np.all(sweep.done))
+        with self.assertRaises(ValueError):
+            ParameterSweep.grid(path=self.path
+                                , integrator=DormandPrinceIntegrator(rtol=1e-8)
+                                , **self.kwargs)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
@@ -0,0 +1,73 @@
+# -----------
+#    Tests for the TrajectoryBuffer class
+# -----------
+import os, sys
+# add parent directory to path, to import classes
+sys.path.append(os.path.join(os.path.dirname(__file__), os.path.pardir))
+import unittest
+import numpy as np
+
+from trajectory import TrajectoryBuffer
+
+
+class TrajectoryBufferTests(unittest.TestCase):
+    '''
+        A test case for the TrajectoryBuffer class
+    '''
+    def test_append_and_channels(self):
+        '''
+            Tests that appended values are returned per channel, in order.
+        '''
+        buffer = TrajectoryBuffer(channels=('time', 'x'), capacity=4)
+        for i in range(3):
+            buffer.append(i, 10*i)
+
+        self.assertEqual(len(buffer), 3)
+        np.testing.assert_array_equal(buffer.channel('time'), [0, 1, 2])
+        np.testing.assert_array_equal(buffer['x'], [0, 10, 20])
+
+    def test_growth_by_doubling(self):
+        '''
+            Tests that a full buffer doubles its capacity and keeps its data.
+        '''
+        buffer = TrajectoryBuffer(channels=('time',), capacity=2)
+        for i in range(5):
+            buffer.append(i)
+
+        self.assertEqual(buffer.capacity, 8)
+        np.testing.assert_array_equal(buffer['time'], np.arange(5))
+
+    def test_extend(self):
+        '''
+            Tests that several steps can be recorded at once, growing the
+            buffer as needed.
+        '''
+        buffer = TrajectoryBuffer(channels=('time', 'x'), capacity=2)
+        buffer.append(0, 0)
+        buffer.extend(np.arange(1, 6), 10*np.arange(1, 6))
+
+        np.testing.assert_array_equal(buffer['time'], np.arange(6))
+        np.testing.assert_array_equal(buffer['x'], 10*np.arange(6))
+
+    def test_sized_for_duration(self):
+        '''
+            Tests that a run of known length never needs to grow the buffer.
+        '''
+        buffer = TrajectoryBuffer.for_duration(channels=('time',)
+                                               , simulation_time=1
+                                               , timestep=0.01)
+        capacity = buffer.capacity
+        for i in range(101):
+            buffer.append(i)
+
+        self.assertEqual(buffer.capacity, capacity)
+
+    def test_unique_channels(self):
+        '''
+            Tests that duplicate channel names are rejected.
+        '''
+        with self.assertRaises(ValueError):
+            TrajectoryBuffer(channels=('x', 'x'))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=1)
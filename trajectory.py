@@ -0,0 +1,128 @@
+# --------------
+# A module defining the trajectory store used by the simulators
+# --------------
+import numpy as np
+from typing import NamedTuple
+
+
+class TrajectoryChunk(NamedTuple):
+    '''
+        A contiguous piece of a double pendulum path, as yielded by
+        DoublePendulumSimulation.iter_simulation. Per-pendulum arrays have
+        shape (steps, 2), for the upper and lower pendulum.
+    '''
+    time: np.ndarray
+    theta: np.ndarray
+    omega: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+
+
+class TrajectoryBuffer():
+    '''
+        A growable store for simulation results. All channels live in one
+        contiguous array of shape (channels, capacity, *member_shape), so
+        recording a step is a single write instead of a copy of the whole
+        history.
+    '''
+    def __init__(self, channels: list|tuple
+                 , capacity: int = 1024
+                 , dtype: type = np.float32
+                 , member_shape: tuple = ()):
+        '''
+            Parameters:
+            -------------------------
+            channels:     names of the recorded quantities, e.g. ('time', 'x', 'y')
+            capacity:     number of steps to allocate up front
+            dtype:        data type of the stored values
+            member_shape: shape of one value of a channel, e.g. (N,) for an
+                          ensemble of N members
+        '''
+        if len(set(channels)) != len(channels):
+            raise ValueError("channel names must be unique")
+
+        self.channels = tuple(channels)
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self._data = np.empty((len(self.channels), max(int(capacity), 1)
+                               , *member_shape)
+                              , dtype=dtype)
+        self._size = 0
+
+    @classmethod
+    def for_duration(cls, channels: list|tuple
+                     , simulation_time: float|int
+                     , timestep: float
+                     , dtype: type = np.float32
+                     , member_shape: tuple = ()):
+        '''
+            Creates a buffer sized for a run of known length, including the
+            initial state and one step of slack for floating point round-off.
+        '''
+        capacity = int(np.ceil(simulation_time / timestep)) + 2
+        return cls(channels=channels, capacity=capacity, dtype=dtype
+                   , member_shape=member_shape)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def data(self):
+        '''
+            View of the recorded steps, shape (channels, steps, *member_shape).
+        '''
+        return self._data[:, :self._size]
+
+    def append(self, *values):
+        '''
+            Records one step, values given in channel order. The buffer
+            doubles its capacity when full.
+        '''
+        if self._size == self._data.shape[1]:
+            self._grow(2 * self._data.shape[1])
+        self._data[:, self._size] = values
+        self._size += 1
+
+    def extend(self, *values):
+        '''
+            Records several steps at once, values given in channel order as
+            arrays of equal length.
+        '''
+        n = len(values[0])
+        if self._size + n > self._data.shape[1]:
+            self._grow(max(2 * self._data.shape[1], self._size + n))
+        for i, value in enumerate(values):
+            self._data[i, self._size:self._size+n] = value
+        self._size += n
+
+    def _grow(self, capacity: int):
+        '''
+            Reallocates the buffer with the given capacity, keeping the
+            recorded steps.
+        '''
+        data = np.empty((self._data.shape[0], capacity, *self._data.shape[2:])
+                        , dtype=self._data.dtype)
+        data[:, :self._size] = self._data[:, :self._size]
+        self._data = data
+
+    def trim(self):
+        '''
+            Releases unused capacity.
+        '''
+        self._grow(max(self._size, 1))
+
+    def channel(self, name: str) -> np.ndarray:
+        '''
+            Returns a view of the recorded values of a single channel.
+        '''
+        return self._data[self._index[name], :self._size]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.channel(name)